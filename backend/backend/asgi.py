@@ -13,4 +13,6 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# Same middleware as WSGI: WhiteNoise keeps serving the compressed, cache-busted
+# static files, Django adapts its sync middleware to the async chain
 application = get_asgi_application()
@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 
     # Third-party apps
     'rest_framework_simplejwt', 
+    'rest_framework_simplejwt.token_blacklist',
     'rest_framework',
     'corsheaders',
 
@@ -69,6 +70,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole middleware stack
+    'transactions.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -129,6 +132,33 @@ if os.environ.get('DATABASE_URL'):
             conn_max_age=600,
         )
     }
+
+# SQLite profile for small deployments: WAL so readers never block the writer, a busy
+# timeout instead of instant "database is locked", write transactions that take the
+# write lock up front (BEGIN IMMEDIATE) and connections kept across requests. With
+# IMMEDIATE every atomic() block holds the database-wide write lock until it ends, so
+# keep slow work such as password hashing outside of them, and split long writes
+# (see JOB_IMPORT_COMMIT_ROWS). SQLITE_TRANSACTION_MODE=DEFERRED takes the lock at the
+# first write instead. Set SQLITE_TUNING=False to get Django's defaults back.
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True') == 'True'
+SQLITE_OPTIONS = {
+    'init_command': ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+        # Negative: KiB of page cache per connection
+        f"PRAGMA cache_size=-{int(os.environ.get('SQLITE_CACHE_KIB', 20000))}",
+        'PRAGMA temp_store=MEMORY',
+    ]),
+    'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+}
+SQLITE_CONN_MAX_AGE = int(os.environ.get('SQLITE_CONN_MAX_AGE', 600))
+for database in DATABASES.values():
+    if SQLITE_TUNING and database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['OPTIONS'] = {**SQLITE_OPTIONS, **database.get('OPTIONS', {})}
+        database['CONN_MAX_AGE'] = SQLITE_CONN_MAX_AGE
+        database['CONN_HEALTH_CHECKS'] = True
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -190,4 +220,63 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-}
\ No newline at end of file
+}
+# Rows per bulk_create batch for POST /api/transactions/import/ (?batch_size= overrides, capped at 5000)
+TRANSACTION_IMPORT_BATCH_SIZE = int(os.environ.get('TRANSACTION_IMPORT_BATCH_SIZE', 1000))
+
+# Per-user response cache for the transaction list and summary endpoints.
+# Any Django cache backend works, e.g. TRANSACTIONS_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'transactions': {
+        'BACKEND': os.environ.get(
+            'TRANSACTIONS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('TRANSACTIONS_CACHE_LOCATION', 'transactions'),
+        'TIMEOUT': int(os.environ.get('TRANSACTIONS_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            # Bounded: the oldest third is culled once this many entries exist
+            'MAX_ENTRIES': int(os.environ.get('TRANSACTIONS_CACHE_MAX_ENTRIES', 10000)),
+            'CULL_FREQUENCY': 3,
+        },
+    },
+}
+TRANSACTIONS_CACHE_ENABLED = os.environ.get('TRANSACTIONS_CACHE_ENABLED', 'True') == 'True'
+
+# Deleted-row markers served by GET /api/transactions/changes/ are kept this long;
+# older sync tokens get 410 Gone and must resync (pruned by `manage.py prune_tombstones`)
+TRANSACTION_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TRANSACTION_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Google ID tokens are verified locally against these certificates, which are
+# cached for the max-age Google sends
+GOOGLE_CERTS_URL = os.environ.get('GOOGLE_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+
+# StatelessJWTAuthentication (used by the transactions API) re-reads a user's
+# active flag at most this often per process instead of on every request
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', 60))
+
+# Per-request timings (Server-Timing header) and Prometheus metrics at /metrics.
+# Scrapes must send "Authorization: Bearer <METRICS_TOKEN>"; without a token
+# /metrics answers 403 unless DEBUG is on.
+PERFORMANCE_METRICS_ENABLED = os.environ.get('PERFORMANCE_METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Background export/import jobs, run by `manage.py run_jobs`. A job is started only while
+# fewer than JOB_MAX_RUNNING jobs run in total and fewer than JOB_MAX_RUNNING_PER_USER for its owner
+JOB_FILES_ROOT = os.environ.get('JOB_FILES_ROOT', str(BASE_DIR / 'job_files'))
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', 2))
+JOB_MAX_RUNNING = int(os.environ.get('JOB_MAX_RUNNING', 4))
+JOB_MAX_RUNNING_PER_USER = int(os.environ.get('JOB_MAX_RUNNING_PER_USER', 1))
+JOB_MAX_QUEUED_PER_USER = int(os.environ.get('JOB_MAX_QUEUED_PER_USER', 10))
+# A running job whose worker has not checked in for this long is requeued (or failed after JOB_MAX_ATTEMPTS)
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+# Import jobs commit every this many rows, so heartbeats and other writers get the lock in between
+JOB_IMPORT_COMMIT_ROWS = int(os.environ.get('JOB_IMPORT_COMMIT_ROWS', 5000))
+
+# Transactions dated more than this many days ago are moved to the archive
+# table by `manage.py archive_transactions`; reads include it only when the
+# requested date range reaches that far back.
+TRANSACTIONS_ARCHIVE_AFTER_DAYS = int(os.environ.get('TRANSACTIONS_ARCHIVE_AFTER_DAYS', 730))
@@ -5,17 +5,28 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from transactions.views import TransactionViewSet, register, login, google_login
+from transactions.async_views import transaction_export_csv, transaction_list, transaction_summary
+from transactions.instrumentation import metrics
+from transactions.views import BudgetViewSet, JobViewSet, RecurringTransactionViewSet, TransactionViewSet, register, login, google_login, cache_stats
 
 
 router = DefaultRouter()
 router.register(r'transactions', TransactionViewSet, basename='transaction')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'budgets', BudgetViewSet, basename='budget')
+router.register(r'recurring', RecurringTransactionViewSet, basename='recurring')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    # Async read path for ASGI servers (uvicorn backend.asgi:application)
+    path('api/async/transactions/', transaction_list, name='async-transaction-list'),
+    path('api/async/transactions/summary/', transaction_summary, name='async-transaction-summary'),
+    path('api/async/transactions/export_csv/', transaction_export_csv, name='async-transaction-export-csv'),
     path('api/register/', register, name='register'),
     path('api/login/', login, name='login'),
     path('api/google-login/', google_login, name='google-login'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/cache-stats/', cache_stats, name='cache-stats'),
+    path('metrics', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,84 @@
+# backend/transactions/aggregation.py
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+
+# Supported values for ?group_by= and the expression each one groups on
+GROUP_BY_EXPRESSIONS = {
+    'category': F('category'),
+    'type': F('type'),
+    'month': TruncMonth('date'),
+    'week': TruncWeek('date'),
+    'day': F('date'),
+}
+
+ZERO = Decimal('0.00')
+
+
+def _totals():
+    """Conditional aggregates that compute income, expense and count in one pass"""
+    money = DecimalField(max_digits=14, decimal_places=2)
+    return {
+        'total_income': Coalesce(
+            Sum('amount', filter=Q(type='income')), Value(ZERO), output_field=money
+        ),
+        'total_expense': Coalesce(
+            Sum('amount', filter=Q(type='expense')), Value(ZERO), output_field=money
+        ),
+        'count': Count('id'),
+    }
+
+
+def _with_balance(row):
+    row['balance'] = row['total_income'] - row['total_expense']
+    return row
+
+
+def summarize(queryset):
+    """Return income/expense/balance/count totals for a queryset in a single query"""
+    # Drop Meta.ordering, it only adds a useless sort to the aggregate
+    totals = queryset.order_by().aggregate(**_totals())
+    return _with_balance(totals)
+
+
+def _breakdown_queryset(queryset, group_by):
+    if group_by not in GROUP_BY_EXPRESSIONS:
+        raise ValueError(
+            f"group_by must be one of: {', '.join(GROUP_BY_EXPRESSIONS)}"
+        )
+
+    return (
+        queryset.order_by()
+        .annotate(_group=GROUP_BY_EXPRESSIONS[group_by])
+        .values('_group')
+        .annotate(**_totals())
+        .order_by('_group')
+    )
+
+
+def _breakdown_row(group_by, row):
+    return _with_balance({
+        group_by: row['_group'],
+        'total_income': row['total_income'],
+        'total_expense': row['total_expense'],
+        'count': row['count'],
+    })
+
+
+def breakdown(queryset, group_by):
+    """Return per-group totals, ordered by group key"""
+    rows = _breakdown_queryset(queryset, group_by)
+    return [_breakdown_row(group_by, row) for row in rows]
+
+
+async def asummarize(queryset):
+    """summarize() through the async ORM"""
+    totals = await queryset.order_by().aaggregate(**_totals())
+    return _with_balance(totals)
+
+
+async def abreakdown(queryset, group_by):
+    """breakdown() through the async ORM"""
+    rows = _breakdown_queryset(queryset, group_by)
+    return [_breakdown_row(group_by, row) async for row in rows]
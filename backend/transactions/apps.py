@@ -1,6 +1,43 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transactions'
+
+    def ready(self):
+        # Connect the transactions_changed, user cache and query recorder receivers
+        from . import authentication, budgets, caching, instrumentation, rollups, sync  # noqa: F401
+        
+        post_migrate.connect(ensure_search_index, sender=self)
+        post_migrate.connect(ensure_archive_view, sender=self)
+
+
+def ensure_search_index(using, **kwargs):
+    """Re-create the SQLite FTS triggers if a migration remade an indexed table"""
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from . import search
+
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    migrations = {
+        'transactions_transaction': '0005_description_search_index',
+        'transactions_archivedtransaction': '0013_archived_search_index',
+    }
+    tables = [table for table in search.TABLES if ('transactions', migrations[table]) in applied]
+    if tables:
+        search.install(connection, tables)
+
+
+def ensure_archive_view(using, **kwargs):
+    """Re-create the archive view so it lists the columns of the current tables"""
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from . import archive
+
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('transactions', '0012_transaction_archive') in applied:
+        archive.install_view(connection)
@@ -0,0 +1,146 @@
+# backend/transactions/archive.py
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .filters import filter_transactions
+from .models import AllTransaction, ArchivedTransaction, Transaction
+
+VIEW = AllTransaction._meta.db_table
+# Rows moved per DB transaction
+BATCH_SIZE = 5000
+# Ids per IN (...) list when restoring, well under SQLite's bound parameter limit
+RESTORE_CHUNK_SIZE = 500
+
+
+def _columns():
+    return [field.column for field in Transaction._meta.concrete_fields]
+
+
+def install_view(connection):
+    """(Re)create the AllTransaction view over the current columns of both tables"""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in _columns())
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP VIEW IF EXISTS {quote(VIEW)}')
+        cursor.execute(
+            f'CREATE VIEW {quote(VIEW)} ({columns}) AS '
+            f'SELECT {columns} FROM {quote(Transaction._meta.db_table)} '
+            f'UNION ALL SELECT {columns} FROM {quote(ArchivedTransaction._meta.db_table)}'
+        )
+
+
+def uninstall_view(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP VIEW IF EXISTS {connection.ops.quote_name(VIEW)}')
+
+
+def default_cutoff(today=None):
+    """Rows dated before this are archived, TRANSACTIONS_ARCHIVE_AFTER_DAYS before today"""
+    return (today or timezone.localdate()) - timedelta(days=settings.TRANSACTIONS_ARCHIVE_AFTER_DAYS)
+
+
+# --- Reads -------------------------------------------------------------------
+
+def archived_through(user_id):
+    """Date of the user's newest archived row, or None when nothing is archived"""
+    return ArchivedTransaction.objects.filter(user_id=user_id).aggregate(last=Max('date'))['last']
+
+
+def reaches(start_date, through):
+    """Whether rows from `start_date` (a date, an ISO string or None) on include archived ones"""
+    if through is None:
+        return False
+    if not start_date:
+        return True
+    try:
+        start = start_date if isinstance(start_date, date) else date.fromisoformat(start_date)
+    except ValueError:
+        # Let the date filter report the malformed value
+        return True
+    return start <= through
+
+
+def model_for(user_id, start_date=None, through=False, end_date=None):
+    """
+    Transaction, or the AllTransaction view when the date range explicitly
+    reaches into the archive: it starts, or without a start ends, on or
+    before the user's newest archived date. Open-ended ranges stay on the
+    hot table; keyset pages continue into the archive on their own, see
+    TransactionPagination. Pass `through` when the caller already knows
+    archived_through(user_id).
+    """
+    if not start_date and not end_date:
+        return Transaction
+    if through is False:
+        through = archived_through(user_id)
+    return AllTransaction if reaches(start_date or end_date, through) else Transaction
+
+
+def continuation(user_id, model, params, through, columns):
+    """
+    TransactionPagination.archive for the user's listing of `columns` read
+    from `model`: (through, the same listing over the view), or None when
+    the listing has a start_date, already reads the view or nothing is
+    archived
+    """
+    if through is None or params.get('start_date') or model is not Transaction:
+        return None
+    archived = filter_transactions(AllTransaction.objects.filter(user_id=user_id), params)
+    return through, archived.values(*columns)
+
+
+# --- Moving rows -------------------------------------------------------------
+
+def _move(source, target, where, params):
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in _columns())
+    source, target = quote(source._meta.db_table), quote(target._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {target} ({columns}) SELECT {columns} FROM {source} WHERE {where}', params)
+        cursor.execute(f'DELETE FROM {source} WHERE {where}', params)
+        return cursor.rowcount
+
+
+def archive(before, batch_size=BATCH_SIZE, progress=None):
+    """
+    Move every transaction dated before `before` into the archive, in id
+    order, `batch_size` rows per DB transaction. Each batch is moved whole
+    or not at all, so an interrupted run is resumed by running it again.
+    `progress`, if given, is called with the rows moved by each batch.
+    Returns the number of rows moved.
+    """
+    quote = connection.ops.quote_name
+    where = f'{quote("id")} > %s AND {quote("id")} <= %s AND {quote("date")} < %s'
+    old = Transaction.objects.filter(date__lt=before).order_by('id')
+    moved, last_id = 0, 0
+    while True:
+        with transaction.atomic():
+            # Locks the batch, so no write lands between the copy and the delete
+            ids = list(old.filter(id__gt=last_id).select_for_update().values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            count = _move(
+                Transaction, ArchivedTransaction, where,
+                [last_id, ids[-1], connection.ops.adapt_datefield_value(before)],
+            )
+        moved += count
+        last_id = ids[-1]
+        if progress:
+            progress(count)
+    return moved
+
+
+def restore(queryset):
+    """Move the ArchivedTransaction rows of `queryset` back to the hot table, returns how many"""
+    ids = list(queryset.values_list('id', flat=True))
+    restored = 0
+    with transaction.atomic():
+        for offset in range(0, len(ids), RESTORE_CHUNK_SIZE):
+            chunk = ids[offset:offset + RESTORE_CHUNK_SIZE]
+            where = f'{connection.ops.quote_name("id")} IN ({", ".join(["%s"] * len(chunk))})'
+            restored += _move(ArchivedTransaction, Transaction, where, chunk)
+    return restored
@@ -0,0 +1,141 @@
+# backend/transactions/async_views.py
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseBase, HttpResponseNotAllowed
+from django.utils.http import parse_etags
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import archive, rollups, search
+from .aggregation import abreakdown, asummarize
+from .authentication import StatelessJWTAuthentication
+from .conditional import make_etag, set_validators, user_version
+from .exports import csv_export_response
+from .filters import filter_transactions
+from .pagination import TransactionPagination
+from .serializers import TransactionRowSerializer
+
+authentication = StatelessJWTAuthentication()
+
+
+def _json(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _error(exc, request):
+    """The response DRF's default exception handler would give for `exc`"""
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = _json(detail, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+    return response
+
+
+def async_api_view(endpoint=None):
+    """
+    Async counterpart of the TransactionViewSet read actions: GET only, the
+    same JWT authentication, errors and ETag / 304 handling (when `endpoint`
+    is given). The view gets a DRF Request and returns data or a response.
+    The per-user response cache is not used here, every request reads the DB.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(http_request, *args, **kwargs):
+            if http_request.method not in ('GET', 'HEAD'):
+                return HttpResponseNotAllowed(['GET', 'HEAD'])
+            request = Request(http_request)
+            try:
+                authenticated = await authentication.aauthenticate(http_request)
+                if authenticated is None:
+                    raise exceptions.NotAuthenticated()
+                request.user, request.auth = authenticated
+
+                etag = last_modified = None
+                if endpoint:
+                    version = await sync_to_async(user_version)(request)
+                    etag, last_modified = make_etag(request, endpoint, version), version[0]
+                    etags = parse_etags(http_request.headers.get('If-None-Match', ''))
+                    if '*' in etags or etag in etags:
+                        response = HttpResponse(status=304)
+                        set_validators(response, etag, last_modified)
+                        return response
+
+                response = await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return _error(exc, http_request)
+
+            if not isinstance(response, HttpResponseBase):
+                response = _json(response)
+            if etag and response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+async def _archived_through(request):
+    # Memoised with the conditional GET version, so list and summary pay nothing extra
+    return (await sync_to_async(user_version)(request))[2]
+
+
+async def _filtered(request):
+    params = request.query_params
+    model = archive.model_for(
+        request.user.id, params.get('start_date'), await _archived_through(request), params.get('end_date')
+    )
+    queryset = model.objects.filter(user_id=request.user.id)
+    if request.query_params.get('search'):
+        # The search backend is detected with one query per process, keep it off the event loop
+        await sync_to_async(search.get_backend)(queryset.db)
+    return filter_transactions(queryset, request.query_params)
+
+
+@async_api_view('list')
+async def transaction_list(request):
+    """GET /api/async/transactions/, same parameters and pages as the sync list"""
+    try:
+        rows = TransactionRowSerializer.from_params(request.query_params)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+    paginator = TransactionPagination()
+    queryset = await _filtered(request)
+    paginator.archive = archive.continuation(
+        request.user.id, queryset.model, request.query_params, await _archived_through(request), rows.columns
+    )
+    page = await paginator.apaginate_queryset(queryset.values(*rows.columns), request)
+    return paginator.get_paginated_response(rows.serialize(page)).data
+
+
+@async_api_view('summary')
+async def transaction_summary(request):
+    """GET /api/async/transactions/summary/, same parameters and totals as the sync summary"""
+    params = request.query_params
+    group_by = params.get('group_by', None)
+
+    if rollups.can_serve(params, group_by):
+        # A few small queries on the rollup table, run in one thread hop
+        through = await _archived_through(request)
+        data = await sync_to_async(rollups.summarize_user)(request.user.id, params, archived_through=through)
+        if group_by:
+            data['breakdown'] = await sync_to_async(rollups.summarize_user)(
+                request.user.id, params, group_by, archived_through=through
+            )
+        return data
+
+    transactions = await _filtered(request)
+    data = await asummarize(transactions)
+    if group_by:
+        try:
+            data['breakdown'] = await abreakdown(transactions, group_by)
+        except ValueError as e:
+            return _json({'error': str(e)}, status=400)
+    return data
+
+
+@async_api_view()
+async def transaction_export_csv(request):
+    """GET /api/async/transactions/export_csv/, streamed from the async ORM"""
+    compress = request.query_params.get('compress', None) == 'gzip'
+    return csv_export_response(await _filtered(request), compress=compress, asynchronous=True)
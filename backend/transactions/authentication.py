@@ -0,0 +1,132 @@
+# backend/transactions/authentication.py
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+_MISSING = object()
+
+
+class UserCache:
+    """Short-lived, process-local cache of User rows keyed by id"""
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self._lock = threading.Lock()
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id):
+        with self._lock:
+            user = self._users.get(user_id, _MISSING)
+        if user is _MISSING:
+            # A deleted user is cached as None so it is rejected without a query too
+            user = User.objects.filter(pk=user_id).first()
+            with self._lock:
+                self._users[user_id] = user
+        return user
+
+    async def aget(self, user_id):
+        """get() for async code, the cache miss goes through the async ORM"""
+        with self._lock:
+            user = self._users.get(user_id, _MISSING)
+        if user is _MISSING:
+            user = await User.objects.filter(pk=user_id).afirst()
+            with self._lock:
+                self._users[user_id] = user
+        return user
+
+    def discard(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 60))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    user_cache.discard(instance.pk)
+
+
+class CachedTokenUser(TokenUser):
+    """
+    Token-backed user: id comes from the token claims, anything else (is_staff,
+    username, ...) is read from the user cache on first use.
+    """
+
+    @cached_property
+    def id(self):
+        # simplejwt stores the id claim as a string
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def user(self):
+        return user_cache.get(self.id)
+
+    @cached_property
+    def is_staff(self):
+        return bool(self.user and self.user.is_staff)
+
+    @cached_property
+    def is_superuser(self):
+        return bool(self.user and self.user.is_superuser)
+
+    @cached_property
+    def username(self):
+        return self.user.username if self.user else ''
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the User SELECT per request.
+
+    request.user is a CachedTokenUser built from the token. Deactivated and
+    deleted users are still rejected, checked against the user cache, so a
+    revocation takes effect within JWT_USER_CACHE_TTL seconds in every process
+    and immediately in the one that made the change. Rotated refresh tokens
+    are rejected by the token_blacklist app.
+    """
+
+    def get_user(self, validated_token):
+        token_user = self._token_user(validated_token)
+        self._check_user(token_user.user)
+        return token_user
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views: (user, token) or None without credentials"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        token_user = self._token_user(validated_token)
+        # Fill the cached_property so nothing touches the sync ORM later
+        token_user.user = await user_cache.aget(token_user.id)
+        self._check_user(token_user.user)
+        return token_user, validated_token
+
+    def _token_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        return CachedTokenUser(validated_token)
+
+    def _check_user(self, user):
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
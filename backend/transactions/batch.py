@@ -0,0 +1,184 @@
+# backend/transactions/batch.py
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import archive
+from .filters import filter_transactions
+from .models import ArchivedTransaction, Transaction
+from .serializers import TransactionSerializer
+from .signals import SNAPSHOT_FIELDS, TransactionSnapshot, send_changes
+
+OPERATIONS = ('update', 'delete')
+EDITABLE_FIELDS = ('type', 'category', 'amount', 'description', 'date')
+FILTER_PARAMS = ('search', 'type', 'category', 'start_date', 'end_date')
+MAX_OPERATIONS = 1000
+# Rows one batch may touch, larger jobs should narrow their filters
+MAX_ROWS = 50000
+# Ids per IN (...) list, well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+class BatchError(ValueError):
+    """Invalid operations, `errors` is a list of {'index': n, 'errors': {...}}"""
+
+    def __init__(self, errors):
+        super().__init__('Invalid batch')
+        self.errors = errors
+
+
+def _validate_operation(operation):
+    if not isinstance(operation, dict):
+        return None, {'non_field_errors': ['Expected an object.']}
+    errors = {}
+    op = operation.get('op')
+    if op not in OPERATIONS:
+        errors['op'] = [f"Must be one of: {', '.join(OPERATIONS)}."]
+
+    has_id, has_filter = 'id' in operation, 'filter' in operation
+    if has_id == has_filter:
+        errors['non_field_errors'] = ['Give either "id" or "filter".']
+    elif has_id and (not isinstance(operation['id'], int) or isinstance(operation['id'], bool)):
+        errors['id'] = ['Must be an integer.']
+    elif has_filter:
+        filters = operation['filter']
+        if not isinstance(filters, dict) or not filters:
+            errors['filter'] = ['Must be a non-empty object.']
+        elif set(filters) - set(FILTER_PARAMS):
+            errors['filter'] = [f"Unknown key(s): {', '.join(sorted(set(filters) - set(FILTER_PARAMS)))}."]
+        else:
+            for name in ('start_date', 'end_date'):
+                try:
+                    if filters.get(name):
+                        date.fromisoformat(str(filters[name]))
+                except ValueError:
+                    errors['filter'] = [f'{name} must be a date (YYYY-MM-DD).']
+
+    values = {}
+    if op == 'update':
+        data = operation.get('data')
+        if not isinstance(data, dict) or not data:
+            errors['data'] = ['Must be a non-empty object.']
+        elif set(data) - set(EDITABLE_FIELDS):
+            errors['data'] = [f"Unknown field(s): {', '.join(sorted(set(data) - set(EDITABLE_FIELDS)))}."]
+        else:
+            # Same field rules as PATCH /api/transactions/<id>/
+            serializer = TransactionSerializer(data=data, partial=True)
+            if serializer.is_valid():
+                values = serializer.validated_data
+            else:
+                errors['data'] = serializer.errors
+    return values, errors
+
+
+def validate(operations):
+    """Check every operation before anything runs. Returns [(operation, values)] or raises BatchError."""
+    if not isinstance(operations, list) or not operations:
+        raise BatchError([{'index': None, 'errors': {'operations': ['Send a non-empty list of operations.']}}])
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError([{'index': None, 'errors': {'operations': [f'At most {MAX_OPERATIONS} operations per batch.']}}])
+    validated, errors = [], []
+    for index, operation in enumerate(operations):
+        values, operation_errors = _validate_operation(operation)
+        if operation_errors:
+            errors.append({'index': index, 'errors': operation_errors})
+        validated.append((operation, values))
+    if errors:
+        raise BatchError(errors)
+    return validated
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _snapshots(queryset):
+    # select_for_update keeps concurrent writers off these rows until the batch commits
+    rows = queryset.select_for_update().order_by().values_list(*SNAPSHOT_FIELDS)
+    return {row[0]: TransactionSnapshot(*row) for row in rows}
+
+
+def _restore_archived(user_id, operations):
+    """Move the archived rows the operations target back to the hot table, batches only write there"""
+    through = archive.archived_through(user_id)
+    if through is None:
+        return
+    archived = ArchivedTransaction.objects.filter(user_id=user_id)
+    ids = [operation['id'] for operation, _ in operations if 'id' in operation]
+    for chunk in _chunks(set(ids)):
+        archive.restore(archived.filter(id__in=chunk))
+    for operation, _ in operations:
+        if 'filter' in operation and archive.reaches(operation['filter'].get('start_date'), through):
+            archive.restore(filter_transactions(archived, operation['filter']))
+
+
+def apply(user_id, operations):
+    """
+    Apply validated operations for one user in one DB transaction.
+
+    Operations run in order against the rows as they were when the batch
+    started: filters match stored values, a row deleted by an earlier
+    operation is skipped by later ones, and updates to one row accumulate.
+    The accumulated changes are then written with one UPDATE per distinct
+    set of new values and one DELETE, and transactions_changed is sent once
+    for the whole batch. Archived rows are restored first, so they are
+    matched like any other. Returns (results, updated_count, deleted_count).
+    """
+    owned = Transaction.objects.filter(user_id=user_id)
+    with transaction.atomic():
+        _restore_archived(user_id, operations)
+        ids = [operation['id'] for operation, _ in operations if 'id' in operation]
+        stored = {}
+        for chunk in _chunks(set(ids)):
+            stored.update(_snapshots(owned.filter(id__in=chunk)))
+
+        targets = []
+        for operation, _ in operations:
+            if 'id' in operation:
+                targets.append([operation['id']] if operation['id'] in stored else [])
+                continue
+            matched = _snapshots(filter_transactions(owned, operation['filter']))
+            stored.update(matched)
+            targets.append(sorted(matched))
+            if len(stored) > MAX_ROWS:
+                raise BatchError([{'index': len(targets) - 1, 'errors': {
+                    'filter': [f'The batch touches more than {MAX_ROWS} transactions, narrow the filters.'],
+                }}])
+
+        assignments, deleted, results = {}, set(), []
+        for index, ((operation, values), row_ids) in enumerate(zip(operations, targets)):
+            live = [row_id for row_id in row_ids if row_id not in deleted]
+            if 'id' in operation and not live:
+                results.append({'index': index, 'op': operation['op'], 'status': 'not_found', 'count': 0})
+                continue
+            if operation['op'] == 'delete':
+                deleted.update(live)
+            else:
+                for row_id in live:
+                    assignments.setdefault(row_id, {}).update(values)
+            status = 'deleted' if operation['op'] == 'delete' else 'updated'
+            results.append({'index': index, 'op': operation['op'], 'status': status, 'count': len(live)})
+
+        now = timezone.now()
+        groups = {}
+        for row_id, values in assignments.items():
+            if row_id not in deleted:
+                groups.setdefault(tuple(sorted(values.items())), []).append(row_id)
+        for values, row_ids in groups.items():
+            for chunk in _chunks(row_ids):
+                owned.filter(id__in=chunk).update(**dict(values), updated_at=now)
+        for chunk in _chunks(deleted):
+            # A queryset delete skips Transaction.delete(), the batch reports the changes below
+            owned.filter(id__in=chunk).delete()
+
+        changes = [(stored[row_id], None) for row_id in sorted(deleted)]
+        for values, row_ids in groups.items():
+            changed = {name: value for name, value in values if name in SNAPSHOT_FIELDS}
+            changes.extend((stored[row_id], stored[row_id]._replace(**changed)) for row_id in row_ids)
+        send_changes(changes)
+
+    updated = sum(len(row_ids) for row_ids in groups.values())
+    return results, updated, len(deleted)
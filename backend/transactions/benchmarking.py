@@ -0,0 +1,213 @@
+# backend/transactions/benchmarking.py
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from . import budgets, rollups
+from .models import Transaction
+
+# Expense categories with their share of expense rows and (median, spread) of
+# a log-normal amount, roughly shaped like a personal budget
+EXPENSE_PROFILE = {
+    'food': (0.34, 12, 0.7),
+    'transport': (0.20, 8, 0.6),
+    'shopping': (0.14, 35, 0.9),
+    'entertainment': (0.10, 25, 0.8),
+    'bills': (0.08, 90, 0.5),
+    'health': (0.05, 40, 1.0),
+    'education': (0.03, 120, 0.8),
+    'other': (0.06, 20, 1.0),
+}
+DESCRIPTIONS = {
+    'food': ['Groceries at Naivas', 'Lunch', 'Coffee', 'Dinner out', 'Carrefour groceries', 'Bakery'],
+    'transport': ['Uber ride home', 'Matatu fare', 'Fuel', 'Bolt to office', 'Parking'],
+    'shopping': ['Shoes', 'Amazon order', 'Phone case', 'Clothes', 'Household items'],
+    'entertainment': ['Cinema tickets', 'Netflix subscription', 'Concert', 'Spotify', 'Game night'],
+    'bills': ['Electricity token', 'Water bill', 'Internet', 'Rent', 'Phone airtime'],
+    'health': ['Pharmacy', 'Doctor visit', 'Gym membership', 'Dentist'],
+    'education': ['Course fee', 'Books', 'Online class'],
+    'other': ['Gift', 'Donation', 'Misc', ''],
+    'salary': ['Monthly salary'],
+}
+
+
+def _amount(rng, median, spread):
+    return Decimal(str(round(max(rng.lognormvariate(0, spread) * median, 0.5), 2)))
+
+
+def generate_transactions(user_id, count, rng, end=None, days=730):
+    """
+    Yield `count` unsaved transactions for one user over the `days` before
+    `end`: a salary around the 25th of each month, occasional side income,
+    and expenses drawn from EXPENSE_PROFILE with more spending on weekends.
+    """
+    end = end or date.today()
+    start = end - timedelta(days=days)
+    months = max(days // 30, 1)
+    salaries = min(months, max(count // 20, 1))
+    categories = list(EXPENSE_PROFILE)
+    weights = [EXPENSE_PROFILE[name][0] for name in categories]
+    base_salary = rng.choice([800, 1200, 2500, 4000])
+
+    month = end.replace(day=1)
+    for _ in range(salaries):
+        payday = month.replace(day=25)
+        yield Transaction(
+            user_id=user_id, type='income', category='salary', description='Monthly salary',
+            amount=Decimal(base_salary + rng.randint(0, 50)), date=min(payday, end),
+        )
+        month = (month - timedelta(days=1)).replace(day=1)
+    for _ in range(count - salaries):
+        day = start + timedelta(days=rng.randrange(days))
+        if day.weekday() < 5 and rng.random() < 0.25:
+            # Move a quarter of weekday spending to the following weekend
+            day += timedelta(days=5 - day.weekday())
+            day = min(day, end)
+        if rng.random() < 0.03:
+            yield Transaction(
+                user_id=user_id, type='income', category='other', description='Side project',
+                amount=_amount(rng, 150, 0.8), date=day,
+            )
+            continue
+        category = rng.choices(categories, weights)[0]
+        _, median, spread = EXPENSE_PROFILE[category]
+        yield Transaction(
+            user_id=user_id, type='expense', category=category,
+            description=rng.choice(DESCRIPTIONS[category]),
+            amount=_amount(rng, median, spread), date=day,
+        )
+
+
+def seed(users, per_user, prefix='bench', password='bench-pass', batch_size=5000, seed=42, stdout=None):
+    """
+    Create (or reuse) `users` users named <prefix><n> and give each one
+    `per_user` new transactions, then rebuild their rollups and spend counters. Returns the user ids.
+    """
+    rng = random.Random(seed)
+    names = [f'{prefix}{n}' for n in range(users)]
+    existing = set(User.objects.filter(username__in=names).values_list('username', flat=True))
+    hashed = make_password(password)
+    User.objects.bulk_create([
+        User(username=name, email=f'{name}@example.com', password=hashed)
+        for name in names if name not in existing
+    ], batch_size=batch_size)
+    user_ids = list(User.objects.filter(username__in=names).order_by('id').values_list('id', flat=True))
+
+    for user_id in user_ids:
+        started = time.perf_counter()
+        with transaction.atomic():
+            # bulk_create skips Transaction.save(), derived tables are rebuilt below
+            Transaction.objects.bulk_create(
+                generate_transactions(user_id, per_user, rng), batch_size=batch_size
+            )
+            rollups.rebuild([user_id])
+            budgets.rebuild([user_id])
+        if stdout is not None:
+            stdout.write(f'user {user_id}: {per_user} rows in {time.perf_counter() - started:.2f}s')
+    return user_ids
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize_latencies(samples, errors, elapsed):
+    ordered = sorted(samples)
+    to_ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'min': to_ms(ordered[0] if ordered else None),
+            'mean': to_ms(sum(ordered) / len(ordered) if ordered else None),
+            'p50': to_ms(percentile(ordered, 0.50)),
+            'p90': to_ms(percentile(ordered, 0.90)),
+            'p95': to_ms(percentile(ordered, 0.95)),
+            'p99': to_ms(percentile(ordered, 0.99)),
+            'max': to_ms(ordered[-1] if ordered else None),
+        },
+    }
+
+
+def run_scenario(send, requests, concurrency=1, warmup=0):
+    """
+    Call `send()` `requests` times over `concurrency` threads after `warmup`
+    untimed calls. `send` returns True on success. Returns the summary dict.
+    """
+    for _ in range(warmup):
+        send()
+
+    def timed_calls(count):
+        results = []
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                try:
+                    ok = send()
+                except Exception:
+                    ok = False
+                results.append((time.perf_counter() - start, ok))
+        finally:
+            if concurrency > 1:
+                # Worker threads own their DB connections
+                connections.close_all()
+        return results
+
+    shares = [requests // concurrency + (1 if index < requests % concurrency else 0) for index in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = [result for chunk in pool.map(timed_calls, shares) for result in chunk]
+    else:
+        results = timed_calls(requests)
+    elapsed = time.perf_counter() - started
+
+    return summarize_latencies(
+        [duration for duration, _ in results], sum(1 for _, ok in results if not ok), elapsed
+    )
+
+
+def environment():
+    """What a result was measured on, so runs can be compared across commits"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'cache_enabled': getattr(settings, 'TRANSACTIONS_CACHE_ENABLED', True),
+    }
+
+
+def write_report(report, path=None, stdout=None):
+    text = json.dumps(report, indent=2, sort_keys=True, default=str)
+    if path:
+        with open(path, 'w') as handle:
+            handle.write(text + '\n')
+    if stdout is not None:
+        stdout.write(text)
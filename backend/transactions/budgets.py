@@ -0,0 +1,176 @@
+# backend/transactions/budgets.py
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import rollups
+from .aggregation import ZERO
+from .models import AllTransaction, Budget, BudgetSpend
+from .signals import transactions_changed
+
+# Budget periods and the expression raw dates are truncated with when recomputing counters
+PERIODS = {
+    'week': TruncWeek('date'),
+    'month': TruncMonth('date'),
+}
+
+
+def period_start(day, period):
+    if period == 'month':
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())
+
+
+def period_end(start, period):
+    """Last day of the period starting at `start`"""
+    if period == 'month':
+        return (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start + timedelta(days=6)
+
+
+# --- Incremental maintenance -------------------------------------------------
+
+def collect_deltas(changes):
+    """Fold (old, new) snapshot pairs into {(user_id, period, start, category): [amount, count]}"""
+    deltas = defaultdict(lambda: [ZERO, 0])
+    for old, new in changes:
+        for txn, sign in ((old, -1), (new, 1)):
+            # Only expenses count against a budget
+            if txn is None or txn.type != 'expense':
+                continue
+            for period in PERIODS:
+                delta = deltas[(txn.user_id, period, period_start(txn.date, period), txn.category)]
+                delta[0] += sign * Decimal(txn.amount)
+                delta[1] += sign
+    return {key: value for key, value in deltas.items() if value != [ZERO, 0]}
+
+
+def apply_deltas(deltas):
+    rollups.increment(BudgetSpend, ('user', 'period', 'start', 'category'), deltas)
+
+
+@receiver(transactions_changed)
+def update_spend(sender, changes, **kwargs):
+    apply_deltas(collect_deltas(changes))
+
+
+# --- Reconcile ---------------------------------------------------------------
+
+def computed_spend(user_ids=None):
+    """Counters recomputed from raw transactions, archived ones included, keyed like collect_deltas()"""
+    queryset = AllTransaction.objects.order_by().filter(type='expense')
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    counters = {}
+    for period, truncate in PERIODS.items():
+        rows = (
+            queryset.annotate(start=truncate)
+            .values('user_id', 'start', 'category')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        )
+        for row in rows:
+            # Rounded to cents like rollups.computed_rollups()
+            total = round(row['total'], 2)
+            counters[(row['user_id'], period, row['start'], row['category'])] = [total, row['count']]
+    return counters
+
+
+def stored_spend(user_ids=None):
+    queryset = BudgetSpend.objects.exclude(count=0)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return {
+        (row.user_id, row.period, row.start, row.category): [row.total, row.count]
+        for row in queryset
+    }
+
+
+def rebuild(user_ids):
+    """Replace the spend counters of the given users with freshly computed ones"""
+    with transaction.atomic():
+        BudgetSpend.objects.filter(user_id__in=user_ids).delete()
+        BudgetSpend.objects.bulk_create([
+            BudgetSpend(
+                user_id=user_id, period=period, start=start, category=category,
+                total=total, count=count,
+            )
+            for (user_id, period, start, category), (total, count) in computed_spend(user_ids).items()
+        ], batch_size=1000)
+
+
+def verify(user_ids):
+    """Return {key: (stored, expected)} for every counter that disagrees"""
+    expected = computed_spend(user_ids)
+    stored = stored_spend(user_ids)
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) != expected.get(key)
+    }
+
+
+# --- Evaluation --------------------------------------------------------------
+
+def evaluate(budget, spent):
+    if spent > budget.amount:
+        state = 'exceeded'
+    elif budget.amount and spent * 100 >= budget.amount * budget.alert_threshold:
+        state = 'warning'
+    else:
+        state = 'ok'
+    return {
+        'state': state,
+        'spent': spent,
+        'remaining': budget.amount - spent,
+        'percent_used': round(spent * 100 / budget.amount, 1) if budget.amount else None,
+    }
+
+
+def status(user_id, day=None):
+    """
+    Every budget of the user with its spend in the period holding `day`
+    (default today). Two queries however long the user's history is: the
+    budgets, then one counter per budgeted category and period.
+    """
+    day = day or timezone.localdate()
+    budgets = list(Budget.objects.filter(user_id=user_id))
+    starts = {period: period_start(day, period) for period in PERIODS}
+    spent = {}
+    if budgets:
+        counters = BudgetSpend.objects.filter(
+            user_id=user_id,
+            start__in={starts[budget.period] for budget in budgets},
+            category__in={budget.category for budget in budgets},
+        ).values_list('period', 'start', 'category', 'total')
+        spent = {(period, start, category): total for period, start, category, total in counters}
+
+    result = []
+    for budget in budgets:
+        start = starts[budget.period]
+        result.append({
+            'id': budget.id,
+            'category': budget.category,
+            'period': budget.period,
+            'amount': budget.amount,
+            'alert_threshold': budget.alert_threshold,
+            'period_start': start,
+            'period_end': period_end(start, budget.period),
+            **evaluate(budget, spent.get((budget.period, start, budget.category), ZERO)),
+        })
+    return result
+
+
+def parse_day(value):
+    """?date= for status(), or None for today. Raises ValueError for a malformed date."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError('date must be a date (YYYY-MM-DD)')
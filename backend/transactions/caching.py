@@ -0,0 +1,114 @@
+# backend/transactions/caching.py
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import receiver
+from rest_framework.response import Response
+
+from .conditional import normalized_params, user_version
+from .signals import transactions_changed
+
+CACHE_ALIAS = 'transactions'
+
+
+class CacheStats:
+    """Process-local hit/miss counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _generation_key(user_id):
+    return f'txn:gen:{user_id}'
+
+
+def get_generation(user_id):
+    cache = get_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the clock so a generation evicted from the cache can
+        # never come back with a value that old entries were stored under
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id):
+    """Invalidate every cached response of a user in O(1)"""
+    cache = get_cache()
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+    stats.record('invalidations')
+
+
+def cache_key(request, endpoint):
+    """Key by user, generation, endpoint, data version and the normalised query string"""
+    # Paginated responses embed absolute links, so the host is part of the key.
+    # The DB version keeps entries correct across processes sharing one cache
+    # even when a generation bump only reached a process-local cache.
+    version = '|'.join(str(part) for part in user_version(request))
+    raw = f'{request.get_host()}?{normalized_params(request)}#{version}'
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    user_id = request.user.id
+    return f'txn:{user_id}:{get_generation(user_id)}:{endpoint}:{digest}'
+
+
+def cached_response(request, endpoint, build):
+    """Serve `endpoint` from the cache, or call `build()` and cache its 200 response data"""
+    if not getattr(settings, 'TRANSACTIONS_CACHE_ENABLED', True):
+        return build()
+
+    cache = get_cache()
+    key = cache_key(request, endpoint)
+    data = cache.get(key)
+    if data is not None:
+        stats.record('hits')
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    stats.record('misses')
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+@receiver(transactions_changed)
+def invalidate_cached_responses(sender, changes, **kwargs):
+    user_ids = {row.user_id for pair in changes for row in pair if row is not None}
+    for user_id in user_ids:
+        bump_generation(user_id)
+        # Bump again once the write is visible, so a reader that filled the
+        # cache from the pre-commit state in between doesn't keep stale data
+        transaction.on_commit(lambda user_id=user_id: bump_generation(user_id))
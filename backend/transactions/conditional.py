@@ -0,0 +1,106 @@
+# backend/transactions/conditional.py
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.db.models import Max, Subquery, Sum
+from django.utils.http import http_date, parse_etags
+from rest_framework.response import Response
+
+from .models import ArchivedTransaction, MonthlyRollup, Transaction
+
+
+def user_version(request):
+    """
+    (last modification, row count, archived through) of the requesting
+    user's transactions.
+
+    max(updated_at) moves on every insert and edit, the rollup row count moves
+    on every delete and the newest archived date on every archive run, so
+    together they change whenever any response could. All three come from
+    indexes in one query and are memoised on the request; the last one also
+    tells readers whether a date range reaches into the archive.
+    """
+    if not hasattr(request, '_transactions_version'):
+        user_id = request.user.id
+        last_modified = (
+            Transaction.objects.filter(user_id=user_id).order_by()
+            .values('user_id').annotate(last=Max('updated_at')).values('last')
+        )
+        count = (
+            MonthlyRollup.objects.filter(user_id=user_id).order_by()
+            .values('user_id').annotate(count=Sum('count')).values('count')
+        )
+        archived = (
+            ArchivedTransaction.objects.filter(user_id=user_id).order_by()
+            .values('user_id').annotate(last=Max('date')).values('last')
+        )
+        row = User.objects.filter(pk=user_id).values_list(
+            Subquery(last_modified), Subquery(count), Subquery(archived)
+        ).first()
+        request._transactions_version = row or (None, None, None)
+    return request._transactions_version
+
+
+def normalized_params(request):
+    return urlencode(sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    ))
+
+
+def make_etag(request, endpoint, version, **kwargs):
+    raw = ':'.join([
+        endpoint,
+        str(request.user.id),
+        '|'.join(str(part) for part in version),
+        request.get_host(),
+        normalized_params(request),
+        urlencode(sorted(kwargs.items())),
+        request.accepted_renderer.format if hasattr(request, 'accepted_renderer') else '',
+    ])
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional_get(endpoint):
+    """
+    Add strong ETag / Last-Modified headers to a viewset GET method and answer
+    304 Not Modified when If-None-Match matches.
+
+    If-Modified-Since is deliberately ignored: a delete leaves max(updated_at)
+    unchanged, so only the ETag is a safe validator.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            version = user_version(request)
+            etag = make_etag(request, endpoint, version, **kwargs)
+            last_modified = version[0]
+
+            etags = parse_etags(request.headers.get('If-None-Match', ''))
+            if '*' in etags or etag in etags:
+                return _not_modified(etag, last_modified)
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Let browsers keep the body but revalidate it on every use
+    response['Cache-Control'] = 'private, no-cache'
+
+
+def _not_modified(etag, last_modified):
+    response = Response(status=304)
+    set_validators(response, etag, last_modified)
+    return response
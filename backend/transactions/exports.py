@@ -0,0 +1,115 @@
+# backend/transactions/exports.py
+import csv
+import zlib
+
+from django.http import StreamingHttpResponse
+
+EXPORT_HEADER = ['Date', 'Type', 'Category', 'Amount', 'Description']
+EXPORT_FIELDS = ('date', 'type', 'category', 'amount', 'description')
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+# Rows are grouped into blocks of roughly this many bytes before being sent
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+
+class Echo:
+    """File-like object whose write() hands the line back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_line(writer, row):
+    txn_date, txn_type, category, amount, description = row
+    return writer.writerow([
+        txn_date,
+        txn_type.capitalize(),
+        category.capitalize(),
+        amount,
+        description or ''
+    ])
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """
+    Yield the export as encoded CSV blocks without materialising the queryset.
+    `progress`, if given, is called with the number of rows in each block.
+    """
+    writer = csv.writer(Echo())
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+    block = [writer.writerow(EXPORT_HEADER)]
+    size = len(block[0])
+    count = 0
+    for row in rows:
+        line = _csv_line(writer, row)
+        block.append(line)
+        size += len(line)
+        count += 1
+        if size >= EXPORT_BLOCK_SIZE:
+            yield ''.join(block).encode('utf-8')
+            if progress:
+                progress(count)
+            block, size, count = [], 0, 0
+    if block:
+        yield ''.join(block).encode('utf-8')
+        if progress:
+            progress(count)
+
+
+async def aiter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """iter_csv() through the async ORM, for ASGI streaming responses"""
+    writer = csv.writer(Echo())
+    # values() rather than values_list(): Django's values_list iterable runs its
+    # query as soon as the iterator is created, which aiterator() does on the event loop
+    rows = queryset.values(*EXPORT_FIELDS).aiterator(chunk_size=chunk_size)
+
+    block = [writer.writerow(EXPORT_HEADER)]
+    size = len(block[0])
+    async for row in rows:
+        line = _csv_line(writer, [row[field] for field in EXPORT_FIELDS])
+        block.append(line)
+        size += len(line)
+        if size >= EXPORT_BLOCK_SIZE:
+            yield ''.join(block).encode('utf-8')
+            block, size = [], 0
+    if block:
+        yield ''.join(block).encode('utf-8')
+
+
+def gzip_stream(blocks):
+    """Compress a stream of byte blocks into a single gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def agzip_stream(blocks):
+    """gzip_stream() for an async stream of byte blocks"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def csv_export_response(queryset, compress=False, asynchronous=False):
+    """Streaming CSV download of a transaction queryset, optionally gzipped"""
+    if asynchronous:
+        blocks = aiter_csv(queryset)
+        content = agzip_stream(blocks) if compress else blocks
+    else:
+        blocks = iter_csv(queryset)
+        content = gzip_stream(blocks) if compress else blocks
+    if compress:
+        response = StreamingHttpResponse(content, content_type='application/gzip')
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv.gz"'
+    else:
+        response = StreamingHttpResponse(content, content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+    return response
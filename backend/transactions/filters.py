@@ -0,0 +1,30 @@
+# backend/transactions/filters.py
+from .search import apply_search
+
+
+def filter_transactions(queryset, params):
+    """Apply the list query parameters (search/type/category/date range) to a queryset"""
+    # Search by category or description, ?ordering=relevance ranks the matches
+    search = params.get('search', None)
+    if search:
+        queryset = apply_search(queryset, search, ranked=params.get('ordering') == 'relevance')
+    
+    # Filter by type (income/expense)
+    transaction_type = params.get('type', None)
+    if transaction_type:
+        queryset = queryset.filter(type=transaction_type)
+    
+    # Filter by category
+    category = params.get('category', None)
+    if category:
+        queryset = queryset.filter(category=category)
+    
+    # Filter by date range
+    start_date = params.get('start_date', None)
+    end_date = params.get('end_date', None)
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    
+    return queryset
@@ -0,0 +1,148 @@
+# backend/transactions/google_auth.py
+import base64
+import json
+import logging
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from google.auth import crypt
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+# Used when the certs response carries no usable Cache-Control max-age
+DEFAULT_CERTS_TTL = 300
+# Never refetch more often than this, even for tokens with unknown key ids
+MIN_REFRESH_INTERVAL = 30
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def _max_age(cache_control):
+    match = re.search(r'max-age=(\d+)', cache_control or '')
+    return int(match.group(1)) if match else None
+
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google ID tokens locally against cached signing certificates.
+
+    Certificates are fetched through a pooled HTTP session, parsed once, and
+    kept for the max-age Google sends (about six hours), so a login normally
+    costs one RSA signature check and no network round trip. An unknown key id
+    triggers one early refresh to pick up key rotation.
+    """
+
+    def __init__(self, certs_url=GOOGLE_CERTS_URL, session=None, clock_skew=10, timeout=5):
+        self.certs_url = certs_url
+        self.clock_skew = clock_skew
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+        self.session = session
+        self._lock = threading.Lock()
+        self._verifiers = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+
+    def _fetch(self):
+        response = self.session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        certs = response.json()
+        ttl = _max_age(response.headers.get('Cache-Control'))
+        now = time.monotonic()
+        self._verifiers = {
+            key_id: crypt.RSAVerifier.from_string(pem) for key_id, pem in certs.items()
+        }
+        self._fetched_at = now
+        self._expires_at = now + (ttl if ttl is not None else DEFAULT_CERTS_TTL)
+        logger.info('Fetched %d Google signing certificates, cached for %ss', len(certs), ttl)
+
+    def _get_verifier(self, key_id):
+        now = time.monotonic()
+        if now < self._expires_at and key_id in self._verifiers:
+            return self._verifiers[key_id]
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            now = time.monotonic()
+            stale = now >= self._expires_at
+            unknown_key = key_id not in self._verifiers
+            if stale or (unknown_key and now - self._fetched_at >= MIN_REFRESH_INTERVAL):
+                try:
+                    self._fetch()
+                except (requests.RequestException, ValueError):
+                    if not self._verifiers:
+                        raise
+                    # Keep serving logins with the certificates we have and retry shortly
+                    logger.warning('Refreshing Google certificates failed, reusing cached ones', exc_info=True)
+                    self._fetched_at = now
+                    self._expires_at = now + MIN_REFRESH_INTERVAL
+        verifier = self._verifiers.get(key_id)
+        if verifier is None:
+            raise ValueError(f'Unknown signing key id: {key_id}')
+        return verifier
+
+    def verify(self, token, audience):
+        """Return the token claims, raising ValueError if the token is not valid"""
+        if isinstance(token, str):
+            token = token.encode('utf-8')
+        try:
+            signed_section, signature = token.rsplit(b'.', 1)
+            header_segment, payload_segment = signed_section.split(b'.')
+            header = json.loads(_b64decode(header_segment.decode()))
+            claims = json.loads(_b64decode(payload_segment.decode()))
+            signature = _b64decode(signature.decode())
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError(f'Malformed token: {e}')
+        # Well-formed base64 can still carry any JSON, check the shapes before using them
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise ValueError('Malformed token: header and claims must be JSON objects')
+        if not isinstance(header.get('kid'), str):
+            raise ValueError('Malformed token: missing signing key id')
+
+        if header.get('alg') != 'RS256':
+            raise ValueError(f"Unsupported signing algorithm: {header.get('alg')}")
+        if not self._get_verifier(header.get('kid')).verify(signed_section, signature):
+            raise ValueError('Token signature could not be verified')
+
+        now = time.time()
+        if 'exp' not in claims or 'iat' not in claims:
+            raise ValueError('Token is missing exp or iat')
+        if not all(isinstance(claims[name], (int, float)) and not isinstance(claims[name], bool)
+                   for name in ('exp', 'iat')):
+            raise ValueError('Token exp and iat must be numbers')
+        if now > claims['exp'] + self.clock_skew:
+            raise ValueError('Token expired')
+        if now < claims['iat'] - self.clock_skew:
+            raise ValueError('Token used too early')
+        if claims.get('aud') != audience:
+            raise ValueError('Token has the wrong audience')
+        if claims.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError('Token has the wrong issuer')
+        return claims
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    """Process-wide verifier, so the certificate cache and HTTP pool are shared"""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = GoogleTokenVerifier(
+                    certs_url=getattr(settings, 'GOOGLE_CERTS_URL', GOOGLE_CERTS_URL)
+                )
+    return _verifier
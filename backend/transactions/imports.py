@@ -0,0 +1,217 @@
+# backend/transactions/imports.py
+import codecs
+import csv
+import io
+import re
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.parsers import BaseParser
+
+from .models import Transaction
+from .serializers import TransactionSerializer
+from .signals import send_changes, snapshot
+
+IMPORT_FIELDS = ('date', 'type', 'category', 'amount', 'description')
+# Only the first errors are returned, the rest are counted
+MAX_REPORTED_ERRORS = 100
+MAX_BATCH_SIZE = 5000
+# A lone \r ends a line too, as it does for text files opened with newline=''
+BARE_CR = re.compile(r'(?<=\r)(?!\n)')
+
+
+class UnreadableCSV(ValueError):
+    """The upload stopped decoding or parsing partway through, at data row `row`"""
+
+    def __init__(self, row, error):
+        super().__init__(f'Could not read row {row}: {error}')
+        self.row = row
+
+
+def default_batch_size():
+    return getattr(settings, 'TRANSACTION_IMPORT_BATCH_SIZE', 1000)
+
+
+class DecodedLines:
+    """
+    The text lines of a binary stream, decoded one line at a time, so a byte
+    that does not decode fails on the CSV row holding it rather than on
+    whichever row a read-ahead buffer happened to reach.
+    """
+
+    def __init__(self, stream, encoding):
+        self.stream = stream
+        self.encoding = encoding
+
+    def __iter__(self):
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        for line in iter(self.stream.readline, b''):
+            yield from filter(None, BARE_CR.split(decoder.decode(line)))
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+
+class CSVParser(BaseParser):
+    """Hands the raw text/csv request body on as lazily decoded DecodedLines"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if stream is None:
+            stream = io.BytesIO(b'')
+        # utf-8-sig drops the BOM spreadsheet apps like to prepend
+        if encoding.lower().replace('_', '-') == 'utf-8':
+            encoding = 'utf-8-sig'
+        return DecodedLines(stream, encoding)
+
+
+def iter_csv_rows(text_stream):
+    """Yield dicts keyed by model field name from the columns export_csv emits"""
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    for values in reader:
+        if not any(values):
+            continue
+        row = dict(zip(columns, values))
+        # export_csv capitalises the choice values, the model stores them lower case
+        for name in ('type', 'category'):
+            if row.get(name):
+                row[name] = row[name].strip().lower()
+        yield row
+
+
+def iter_uploaded_csv(uploaded_file):
+    return iter_csv_rows(DecodedLines(uploaded_file.file, 'utf-8-sig'))
+
+
+class RowValidator:
+    """Validates import rows with the same field rules as TransactionSerializer"""
+
+    def __init__(self):
+        fields = TransactionSerializer().fields
+        self.fields = [(name, fields[name]) for name in IMPORT_FIELDS]
+
+    def validate(self, row):
+        values, errors = {}, {}
+        if not isinstance(row, dict):
+            return values, {'non_field_errors': ['Expected an object.']}
+        for name, field in self.fields:
+            raw = row.get(name, empty)
+            if raw == '' and not field.required:
+                raw = empty
+            try:
+                values[name] = field.run_validation(raw)
+            except SkipField:
+                pass
+            except serializers.ValidationError as e:
+                errors[name] = e.detail
+        return values, errors
+
+
+def _read(rows):
+    """Yield rows, turning decode and CSV errors into UnreadableCSV for the row they hit"""
+    iterator = iter(rows)
+    number = 0
+    while True:
+        try:
+            row = next(iterator)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise UnreadableCSV(number + 1, e) from e
+        number += 1
+        yield row
+
+
+def _insert(batch, progress=None):
+    Transaction.objects.bulk_create(batch)
+    # bulk_create skips save(), so report the new rows explicitly
+    send_changes([(None, snapshot(txn)) for txn in batch])
+    if progress:
+        progress(len(batch))
+    return len(batch)
+
+
+def import_rows(user, rows, batch_size=None, allow_partial=False, progress=None, commit_every=None,
+                checkpoint=None, resume=None):
+    """
+    Validate and insert rows for `user` with batched bulk_create in one DB transaction.
+
+    Rows are consumed lazily, so only one batch is held in memory at a time.
+    `progress`, if given, is called with the number of rows each batch inserts.
+    Unless `allow_partial` is set, any invalid row rolls the whole import back.
+
+    With `commit_every`, which needs `allow_partial` (check the rows first
+    with check_rows() for all-or-nothing), a transaction is committed every
+    that many input rows so other writers get the lock in between, and
+    `checkpoint`, if given, is called inside each one with the state so
+    far: {'row', 'created', 'error_count', 'errors'}. Passing that state
+    back as `resume` skips the rows already committed.
+
+    Returns (created_count, error_count, reported_errors). Raises
+    UnreadableCSV, after rolling back what is not committed yet, when the
+    input cannot be read.
+    """
+    if commit_every and not allow_partial:
+        raise ValueError('commit_every needs allow_partial, an invalid row cannot roll back committed rows')
+    batch_size = batch_size or default_batch_size()
+    validator = RowValidator()
+    state = {'row': 0, 'created': 0, 'error_count': 0, 'errors': [], **(resume or {})}
+    numbered = enumerate(_read(rows), start=1)
+    done = False
+
+    while not done:
+        with transaction.atomic():
+            batch = []
+            done = True
+            for number, row in numbered:
+                if number <= state['row']:
+                    continue
+                state['row'] = number
+                values, row_errors = validator.validate(row)
+                if row_errors:
+                    state['error_count'] += 1
+                    if len(state['errors']) < MAX_REPORTED_ERRORS:
+                        state['errors'].append({'row': number, 'errors': row_errors})
+                elif not state['error_count'] or allow_partial:
+                    # Once a row failed an all-or-nothing import is rolled back, keep validating only
+                    batch.append(Transaction(user_id=user.id, **values))
+                    if len(batch) >= batch_size:
+                        state['created'] += _insert(batch, progress)
+                        batch = []
+                if commit_every and number % commit_every == 0:
+                    done = False
+                    break
+            if batch and (allow_partial or not state['error_count']):
+                state['created'] += _insert(batch, progress)
+
+            if state['error_count'] and not allow_partial:
+                transaction.set_rollback(True)
+                state['created'] = 0
+            elif checkpoint is not None:
+                checkpoint(dict(state))
+
+    return state['created'], state['error_count'], state['errors']
+
+
+def check_rows(rows):
+    """
+    Validate rows without inserting anything, for a first pass before
+    import_rows(commit_every=...). Returns (error_count, reported_errors).
+    Raises UnreadableCSV when the input cannot be read.
+    """
+    validator = RowValidator()
+    error_count, errors = 0, []
+    for number, row in enumerate(_read(rows), start=1):
+        row_errors = validator.validate(row)[1]
+        if row_errors:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': number, 'errors': row_errors})
+    return error_count, errors
@@ -0,0 +1,287 @@
+# backend/transactions/instrumentation.py
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from . import caching
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+# Other methods are counted as OTHER, clients must not be able to grow the label set
+METHODS = frozenset({'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'})
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Counters for the request being handled, filled in by the DB wrapper and timers"""
+
+    __slots__ = ('queries', 'sql_seconds', 'serializer_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """DB execute wrapper, installed on every connection, counting queries of the current request"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_seconds += time.perf_counter() - start
+        stats.queries += 1
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Runs on every (re)connect of a wrapper, which keeps its execute_wrappers
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timer():
+    """Add the time spent in the block to the current request's serializer time"""
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.serializer_seconds += time.perf_counter() - start
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class MetricsRegistry:
+    """Process-local request metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.latency = {}
+            self.queries = {}
+            self.totals = {}
+
+    def observe(self, view, method, status, duration, stats, response_bytes):
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(view, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.queries.setdefault(view, Histogram(QUERY_BUCKETS)).observe(stats.queries)
+            totals = self.totals.setdefault(view, [0.0, 0.0, 0])
+            totals[0] += stats.sql_seconds
+            totals[1] += stats.serializer_seconds
+            totals[2] += response_bytes
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP http_requests_total Requests handled, by view, method and status.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+            lines += [
+                '# HELP http_request_duration_seconds Wall time from middleware entry to the last response byte.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for view, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.samples('http_request_duration_seconds', f'view="{view}"'))
+            lines += [
+                '# HELP http_request_queries SQL queries per request.',
+                '# TYPE http_request_queries histogram',
+            ]
+            for view, histogram in sorted(self.queries.items()):
+                lines.extend(histogram.samples('http_request_queries', f'view="{view}"'))
+            for index, (name, help_text) in enumerate([
+                ('http_request_db_seconds_total', 'Time spent executing SQL.'),
+                ('http_request_serializer_seconds_total', 'Time spent in serializers.'),
+                ('http_response_bytes_total', 'Response body bytes sent.'),
+            ]):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for view, totals in sorted(self.totals.items()):
+                    lines.append(f'{name}{{view="{view}"}} {totals[index]}')
+
+        cache = caching.stats.as_dict()
+        for name in ('hits', 'misses', 'invalidations'):
+            lines += [
+                f'# TYPE transactions_cache_{name}_total counter',
+                f'transactions_cache_{name}_total {cache[name]}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def method_label(method):
+    return method if method in METHODS else 'OTHER'
+
+
+def view_name(request):
+    """`TransactionViewSet.list`, `login`, ... for the view that handled the request"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match.view_name
+    actions = getattr(match.func, 'actions', None)
+    if actions:
+        method = method_label(request.method).lower()
+        return f'{cls.__name__}.{actions.get(method, method)}'
+    return cls.__name__
+
+
+def server_timing(duration, stats):
+    return ', '.join([
+        f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries"',
+        f'serialize;dur={stats.serializer_seconds * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ])
+
+
+class PerformanceMiddleware:
+    """
+    Time each request and record its query count, SQL time, serializer time
+    and response size, tagged by the resolved view. Adds a Server-Timing
+    header and feeds the /metrics endpoint.
+
+    Streaming responses are observed once their last chunk is sent. Their
+    Server-Timing header can only cover the time before the first chunk.
+    Works in sync (WSGI) and async (ASGI) middleware chains.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERFORMANCE_METRICS_ENABLED', True)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._observe(request, response, start, stats)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._observe(request, response, start, stats)
+
+    def _observe(self, request, response, start, stats):
+        view = view_name(request)
+        response['Server-Timing'] = server_timing(time.perf_counter() - start, stats)
+        origin = request.headers.get('Origin')
+        if origin and origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', ()):
+            # Browsers hide Server-Timing from cross-origin callers otherwise
+            response['Timing-Allow-Origin'] = origin
+
+        def finish(size):
+            registry.observe(
+                view, method_label(request.method), response.status_code, time.perf_counter() - start, stats, size
+            )
+
+        if response.streaming:
+            observe = self._aobserve_stream if response.is_async else self._observe_stream
+            response.streaming_content = observe(response.streaming_content, stats, finish)
+        else:
+            finish(len(response.content))
+        return response
+
+    @staticmethod
+    def _observe_stream(content, stats, finish):
+        size = 0
+        # Queries issued while the body is produced still belong to this request
+        previous = _current.get()
+        _current.set(stats)
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            _current.set(previous)
+            finish(size)
+
+    @staticmethod
+    async def _aobserve_stream(content, stats, finish):
+        size = 0
+        previous = _current.get()
+        _current.set(stats)
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            _current.set(previous)
+            finish(size)
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, guarded by METRICS_TOKEN; without one it only answers under DEBUG"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse(status=403)
+    elif not settings.DEBUG:
+        # Per-view latencies and query counts are not for the public
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
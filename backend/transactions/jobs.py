@@ -0,0 +1,256 @@
+# backend/transactions/jobs.py
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, close_old_connections, connection, connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from . import archive
+from .exports import gzip_stream, iter_csv
+from .filters import filter_transactions
+from .imports import MAX_BATCH_SIZE, DecodedLines, check_rows, import_rows, iter_csv_rows
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Query parameters each kind of job accepts, same meaning as on the request endpoints
+EXPORT_PARAMS = ('search', 'type', 'category', 'start_date', 'end_date', 'compress')
+IMPORT_PARAMS = ('batch_size', 'partial')
+# Progress and the heartbeat of a running job are written this often (seconds)
+PROGRESS_INTERVAL = 1.0
+# Any key works as long as every worker uses the same one
+_CLAIM_LOCK_KEY = 0x6a6f6273
+
+# --- Queue -------------------------------------------------------------------
+
+def enqueue(user_id, kind, params, input_file=None):
+    job = Job(user_id=user_id, kind=kind, params=params)
+    if input_file is not None:
+        job.input.save(input_file.name, input_file, save=False)
+    job.save()
+    return job
+
+
+def active_count(user_id):
+    return Job.objects.filter(user_id=user_id, status__in=['queued', 'running']).count()
+
+
+def _running_count(per_user=False):
+    running = Job.objects.filter(status='running')
+    if per_user:
+        running = running.filter(user_id=OuterRef('user_id'))
+    counts = running.order_by().values('status').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+@contextmanager
+def _claim_lock():
+    if connection.vendor == 'postgresql':
+        # Serialise claims so two workers can't both take the last free slot
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_CLAIM_LOCK_KEY])
+            yield
+    else:
+        # SQLite runs the claim UPDATE, counts included, under its single write lock
+        yield
+
+
+def claim_next(worker):
+    """
+    Mark the oldest startable queued job as running by `worker` and return
+    its id, or None. A job is startable while fewer than JOB_MAX_RUNNING
+    jobs run in total and fewer than JOB_MAX_RUNNING_PER_USER for its owner.
+    """
+    per_user = settings.JOB_MAX_RUNNING_PER_USER
+    with _claim_lock():
+        candidate = (
+            Job.objects.filter(status='queued')
+            .alias(user_running=_running_count(per_user=True))
+            .filter(user_running__lt=per_user)
+            .order_by('created_at', 'id')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        now = timezone.now()
+        # The limits are checked again in the UPDATE itself, another worker may have claimed since
+        claimed = Job.objects.filter(
+            LessThan(_running_count(), settings.JOB_MAX_RUNNING),
+            LessThan(_running_count(per_user=True), per_user),
+            pk=candidate, status='queued',
+        ).update(
+            status='running', worker=worker, attempts=F('attempts') + 1,
+            started_at=now, heartbeat_at=now,
+        )
+    return candidate if claimed else None
+
+
+def heartbeat(job_ids):
+    """Record that the worker running these jobs is still alive"""
+    if job_ids:
+        Job.objects.filter(pk__in=job_ids, status='running').update(heartbeat_at=timezone.now())
+
+
+def requeue_stale():
+    """
+    Requeue running jobs whose worker stopped checking in for JOB_STALE_SECONDS,
+    or fail them after JOB_MAX_ATTEMPTS. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status='running', heartbeat_at__lt=now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    )
+    failed = stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status='failed', error='The worker running this job stopped responding', finished_at=now
+    )
+    requeued = stale.update(status='queued', worker='', processed=0, total=None)
+    return requeued, failed
+
+
+# --- Running -----------------------------------------------------------------
+
+class Progress:
+    """Counts processed rows, which beating() writes to the job row with its heartbeat"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.processed = 0
+
+    def add(self, count):
+        self.processed += count
+
+    def write(self):
+        Job.objects.filter(pk=self.job_id, status='running').update(
+            processed=self.processed, heartbeat_at=timezone.now()
+        )
+
+
+@contextmanager
+def beating(progress):
+    """
+    Write `progress` and a fresh heartbeat every PROGRESS_INTERVAL while the
+    body runs, from a thread with its own DB connection. Heartbeats then keep
+    coming through steps that report nothing for a long time, such as an
+    import's first pass over the file, so the job is not requeued as stale
+    and run twice. Imports commit every JOB_IMPORT_COMMIT_ROWS rows, which
+    lets these writes through on SQLite too.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(PROGRESS_INTERVAL):
+                try:
+                    progress.write()
+                except DatabaseError:
+                    # e.g. SQLite busy past busy_timeout, the next beat tries again
+                    logger.warning('Heartbeat for job %s failed', progress.job_id, exc_info=True)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, name=f'job-{progress.job_id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield progress
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _finish(job, status, **fields):
+    Job.objects.filter(pk=job.pk).update(status=status, finished_at=timezone.now(), **fields)
+
+
+def run_export(job, progress):
+    model = archive.model_for(job.user_id, job.params.get('start_date'), end_date=job.params.get('end_date'))
+    transactions = filter_transactions(model.objects.filter(user_id=job.user_id), job.params)
+    Job.objects.filter(pk=job.pk).update(total=transactions.count())
+
+    compress = job.params.get('compress') == 'gzip'
+    blocks = iter_csv(transactions, progress=progress.add)
+    with tempfile.TemporaryFile() as handle:
+        for block in gzip_stream(blocks) if compress else blocks:
+            handle.write(block)
+        handle.seek(0)
+        name = f'transactions-{job.pk}.csv.gz' if compress else f'transactions-{job.pk}.csv'
+        job.artifact.save(name, File(handle), save=False)
+    _finish(job, 'succeeded', artifact=job.artifact.name, processed=progress.processed,
+            result={'rows': progress.processed})
+    return True
+
+
+def run_import(job, progress):
+    params = job.params
+    try:
+        batch_size = min(int(params.get('batch_size') or 0), MAX_BATCH_SIZE)
+    except (TypeError, ValueError):
+        batch_size = 0
+    allow_partial = params.get('partial') in ('1', 'true', True)
+    # A requeued import carries on after the rows its previous attempt committed
+    resume = job.result if job.result and 'row' in job.result else None
+
+    def checkpoint(state):
+        Job.objects.filter(pk=job.pk).update(result=state)
+
+    with job.input.open('rb') as handle:
+        if resume is None:
+            # Rows are committed as they go, so a bad or unreadable row must be found before any is
+            error_count, errors = check_rows(iter_csv_rows(DecodedLines(handle, 'utf-8-sig')))
+            if error_count and not allow_partial:
+                return _finish_import(job, 0, error_count, errors)
+            handle.seek(0)
+        else:
+            progress.processed = resume['created']
+        created, error_count, errors = import_rows(
+            job.user, iter_csv_rows(DecodedLines(handle, 'utf-8-sig')),
+            batch_size=batch_size if batch_size > 0 else None, allow_partial=True, progress=progress.add,
+            commit_every=settings.JOB_IMPORT_COMMIT_ROWS, checkpoint=checkpoint, resume=resume,
+        )
+    return _finish_import(job, created, error_count, errors)
+
+
+def _finish_import(job, created, error_count, errors):
+    job.input.delete(save=False)
+    # Same outcome as POST /api/transactions/import/ answering 201 or 400
+    status = 'succeeded' if created or not error_count else 'failed'
+    _finish(job, status, input='', processed=created + error_count, result={
+        'created': created, 'error_count': error_count, 'errors': errors,
+    })
+    return status == 'succeeded'
+
+
+RUNNERS = {
+    'export': run_export,
+    'import': run_import,
+}
+
+
+def run_job(job_id):
+    """Run a claimed job to completion, recording failures on the job. Returns True on success."""
+    job = Job.objects.select_related('user').get(pk=job_id)
+    try:
+        with beating(Progress(job.pk)) as progress:
+            return RUNNERS[job.kind](job, progress)
+    except Exception as e:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        _finish(job, 'failed', error=str(e) or e.__class__.__name__)
+        return False
+
+
+def run_job_in_process(job_id):
+    """run_job() for pool processes, which keep their connections between jobs"""
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,46 @@
+# backend/transactions/management/commands/archive_transactions.py
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import archive
+from transactions.models import ArchivedTransaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Move transactions older than TRANSACTIONS_ARCHIVE_AFTER_DAYS into the archive table, '
+        'in batches that each commit on their own. Safe to interrupt and rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive rows dated before this date (YYYY-MM-DD) instead')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE, help='Rows per DB transaction')
+        parser.add_argument(
+            '--restore', action='store_true', help='Move archived rows dated on or after --before back instead'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            before = date.fromisoformat(options['before']) if options['before'] else archive.default_cutoff()
+        except ValueError:
+            raise CommandError('--before must be a date (YYYY-MM-DD)')
+        started = time.perf_counter()
+
+        if options['restore']:
+            restored = archive.restore(ArchivedTransaction.objects.filter(date__gte=before))
+            self.stdout.write(self.style.SUCCESS(
+                f'Restored {restored} transaction(s) dated from {before} in {time.perf_counter() - started:.1f}s'
+            ))
+            return
+
+        def progress(count):
+            progress.moved += count
+            self.stdout.write(f'  {progress.moved} moved')
+        progress.moved = 0
+
+        moved = archive.archive(before, options['batch_size'], progress=progress if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} transaction(s) dated before {before} in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,149 @@
+# backend/transactions/management/commands/benchmark_api.py
+import json
+import threading
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from transactions import benchmarking
+from transactions.models import Transaction
+from transactions.pagination import TransactionPagination
+
+PAGE_SIZE = 50
+
+
+class InProcessClient:
+    """Drives the full middleware and view stack through Django's test client"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, data=None, token=None):
+        if not hasattr(self._local, 'client'):
+            self._local.client = Client(HTTP_HOST='localhost')
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        if method == 'get':
+            response = self._local.client.get(path, **headers)
+        else:
+            response = self._local.client.post(
+                path, json.dumps(data), content_type='application/json', **headers
+            )
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, body
+
+
+class HTTPClient:
+    """Drives a running server (gunicorn, runserver) over keep-alive connections"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, data=None, token=None):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self._local.session.request(method, self.base_url + path, json=data, headers=headers)
+        return response.status_code, response.content
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the transactions API and print throughput and latency percentiles as JSON. '
+        'Seed data first with `manage.py seed_data`; point DATABASE_URL at SQLite or Postgres '
+        'to compare backends, and pass --url to drive a running server instead of the in-process client.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--username', default='bench0')
+        parser.add_argument('--password', default='bench-pass')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=1, help='Client threads per scenario')
+        parser.add_argument('--scenario', action='append', help='Only run this scenario (repeatable)')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache (in-process only)')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        client = HTTPClient(options['url']) if options['url'] else InProcessClient()
+        with override_settings(TRANSACTIONS_CACHE_ENABLED=not options['no_cache']):
+            report = self.run(client, options)
+        benchmarking.write_report(report, options['output'], self.stdout)
+
+    def login(self, client, options):
+        status, body = client.request(
+            'post', '/api/login/', {'username': options['username'], 'password': options['password']}
+        )
+        if status != 200:
+            raise CommandError(f"Login as {options['username']} failed ({status}), run seed_data first")
+        return json.loads(body)
+
+    def scenarios(self, client, options):
+        tokens = self.login(client, options)
+        access = tokens['access']
+        status, body = client.request('get', f'/api/transactions/?page_size={PAGE_SIZE}', token=access)
+        count = json.loads(body)['count']
+        last_page = max((count + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+
+        # Keyset cursor halfway through the user's rows (needs the server's database)
+        middle = (
+            Transaction.objects.filter(user__username=options['username'])
+            .order_by(*TransactionPagination.ordering)[count // 2:count // 2 + 1].first()
+        )
+        cursor = TransactionPagination().encode_cursor(middle) if middle else ''
+
+        def get(path):
+            return lambda: client.request('get', path, token=access)[0] == 200
+
+        def refresh():
+            # Rotation blacklists the old refresh token, so keep the newest one
+            status, body = client.request('post', '/api/token/refresh/', {'refresh': tokens['refresh']})
+            if status == 200:
+                tokens['refresh'] = json.loads(body).get('refresh', tokens['refresh'])
+            return status == 200
+
+        base = '/api/transactions/'
+        return {
+            'list_first_page': get(f'{base}?page_size={PAGE_SIZE}'),
+            'list_deep_page': get(f'{base}?page_size={PAGE_SIZE}&page={last_page}'),
+            'list_cursor_first_page': get(f'{base}?pagination=cursor&page_size={PAGE_SIZE}'),
+            'list_cursor_deep_page': get(f'{base}?page_size={PAGE_SIZE}&cursor={cursor}'),
+            'list_filter_type': get(f'{base}?page_size={PAGE_SIZE}&type=expense'),
+            'list_filter_category': get(f'{base}?page_size={PAGE_SIZE}&category=food'),
+            'list_filter_dates': get(f'{base}?page_size={PAGE_SIZE}&start_date=2024-01-01&end_date=2024-03-31'),
+            'search': get(f'{base}?page_size={PAGE_SIZE}&search=groceries'),
+            'summary': get(f'{base}summary/'),
+            'summary_by_category': get(f'{base}summary/?group_by=category'),
+            'summary_by_month_filtered': get(f'{base}summary/?group_by=month&start_date=2024-01-15'),
+            'export_csv': get(f'{base}export_csv/'),
+            'login': lambda: self.login(client, options) is not None,
+            'token_refresh': refresh,
+        }
+
+    def run(self, client, options):
+        scenarios = self.scenarios(client, options)
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+        results = {}
+        for name in selected:
+            concurrency = 1 if name == 'token_refresh' else options['concurrency']
+            results[name] = benchmarking.run_scenario(
+                scenarios[name], options['requests'], concurrency=concurrency, warmup=options['warmup']
+            )
+            if options['verbosity'] > 1:
+                self.stderr.write(f"{name}: p50 {results[name]['latency_ms']['p50']} ms")
+        return {
+            'environment': {
+                **benchmarking.environment(),
+                'target': options['url'] or 'in-process',
+                'user': options['username'],
+                'concurrency': options['concurrency'],
+            },
+            'scenarios': results,
+        }
@@ -0,0 +1,109 @@
+# backend/transactions/management/commands/benchmark_archive.py
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.test.utils import override_settings
+
+from transactions import archive, benchmarking
+from transactions.models import ArchivedTransaction, Transaction
+
+from .benchmark_api import InProcessClient, PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark hot-path requests (open-ended and recent date ranges) before and after archiving old rows, '
+        'then restore them. Seed data first with `manage.py seed_data`; the response cache is '
+        'disabled so every request reaches the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='bench0')
+        parser.add_argument('--password', default='bench-pass')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario')
+        parser.add_argument(
+            '--keep-days', type=int, default=180, help="Archive rows older than this many days before the newest one"
+        )
+        parser.add_argument('--recent-days', type=int, default=45, help='Length of the hot date range requested')
+        parser.add_argument('--keep-archived', action='store_true', help='Leave the rows archived afterwards')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if ArchivedTransaction.objects.exists():
+            raise CommandError('The archive is not empty, run `archive_transactions --restore --before 0001-01-01`')
+        newest = Transaction.objects.filter(user__username=options['username']).aggregate(newest=Max('date'))['newest']
+        if newest is None:
+            raise CommandError(f"{options['username']} has no transactions, run seed_data first")
+        before = newest - timedelta(days=options['keep_days'])
+        recent = newest - timedelta(days=options['recent_days'])
+
+        client = InProcessClient()
+        with override_settings(TRANSACTIONS_CACHE_ENABLED=False):
+            access = self.login(client, options)
+            scenarios = self.scenarios(client, access, recent, newest, before)
+            hot = Transaction.objects.count()
+            results = {'before': self.run(scenarios, options)}
+            moved = archive.archive(before)
+            try:
+                results['after'] = self.run(scenarios, options)
+            finally:
+                if not options['keep_archived']:
+                    archive.restore(ArchivedTransaction.objects.all())
+
+        report = {
+            'environment': {
+                **benchmarking.environment(),
+                'user': options['username'],
+                'archived_before': before,
+                'recent_from': recent,
+                'rows': hot,
+                'archived_rows': moved,
+            },
+            'scenarios': {
+                name: {phase: results[phase][name] for phase in results}
+                for name in scenarios
+            },
+        }
+        benchmarking.write_report(report, options['output'], self.stdout)
+
+    def login(self, client, options):
+        status, body = client.request(
+            'post', '/api/login/', {'username': options['username'], 'password': options['password']}
+        )
+        if status != 200:
+            raise CommandError(f"Login as {options['username']} failed ({status}), run seed_data first")
+        return json.loads(body)['access']
+
+    def scenarios(self, client, access, recent, newest, before):
+        def get(path):
+            return lambda: client.request('get', path, token=access)[0] == 200
+
+        base = '/api/transactions/'
+        hot = f'start_date={recent}'
+        # Reaches a month back into the archive, for the cost of a cold read
+        cold = f'start_date={before - timedelta(days=30)}&end_date={before + timedelta(days=30)}'
+        return {
+            # Open-ended, as most clients ask for their newest rows
+            'list_first_page': get(f'{base}?page_size={PAGE_SIZE}'),
+            'list_first_page_cursor': get(f'{base}?page_size={PAGE_SIZE}&pagination=cursor'),
+            'list_recent': get(f'{base}?page_size={PAGE_SIZE}&{hot}'),
+            'list_recent_filter_type': get(f'{base}?page_size={PAGE_SIZE}&type=expense&{hot}'),
+            'search_recent': get(f'{base}?page_size={PAGE_SIZE}&search=groceries&{hot}'),
+            'summary_recent': get(f'{base}summary/?{hot}'),
+            'summary_recent_by_category': get(f'{base}summary/?group_by=category&{hot}'),
+            'timeseries_recent_daily': get(f'{base}timeseries/?interval=day&{hot}&end_date={newest}'),
+            'export_csv_recent': get(f'{base}export_csv/?{hot}'),
+            'list_reaching_archive': get(f'{base}?page_size={PAGE_SIZE}&{cold}'),
+            'summary_reaching_archive': get(f'{base}summary/?group_by=category&{cold}'),
+        }
+
+    def run(self, scenarios, options):
+        results = {}
+        for name, send in scenarios.items():
+            results[name] = benchmarking.run_scenario(send, options['requests'], warmup=options['warmup'])
+            if options['verbosity'] > 1:
+                self.stderr.write(f"{name}: p50 {results[name]['latency_ms']['p50']} ms")
+        return results
@@ -0,0 +1,80 @@
+# backend/transactions/management/commands/benchmark_serializers.py
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from transactions import benchmarking
+from transactions.models import Transaction
+from transactions.serializers import TransactionRowSerializer, TransactionSerializer
+
+
+def model_path(queryset, size):
+    """The previous list path: model instances through TransactionSerializer"""
+    return TransactionSerializer(list(queryset[:size]), many=True).data
+
+
+def values_path(queryset, size, rows=None):
+    """The fast list path: values() dicts through TransactionRowSerializer"""
+    rows = rows or TransactionRowSerializer()
+    return rows.serialize(list(queryset.values(*rows.columns)[:size]))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of the model-instance serializer and the values() fast path for one '
+        "user's transaction pages, and check both render the same JSON. Seed data first with "
+        '`manage.py seed_data`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='bench0')
+        parser.add_argument('--page-size', type=int, action='append', help='Default: 10, 100 and 1000')
+        parser.add_argument('--rows', type=int, default=50000, help='Rows serialized per measurement')
+        parser.add_argument('--fields', help='Sparse fieldset for an extra fast-path run, e.g. id,amount,date')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user {options['username']}, run seed_data first")
+        queryset = Transaction.objects.filter(user_id=user.id).order_by('-date', '-created_at', '-id')
+        available = queryset.count()
+        sizes = options['page_size'] or [10, 100, 1000]
+        if max(sizes) > available:
+            raise CommandError(f"{options['username']} has {available} transactions, fewer than a page of {max(sizes)}")
+
+        renderer = JSONRenderer()
+        sparse = TransactionRowSerializer(options['fields'].split(',')) if options['fields'] else None
+        results = {}
+        for size in sizes:
+            identical = renderer.render(model_path(queryset, size)) == renderer.render(values_path(queryset, size))
+            repeats = max(options['rows'] // size, 1)
+            runs = {
+                'model_serializer': lambda: model_path(queryset, size),
+                'values_fast_path': lambda: values_path(queryset, size),
+            }
+            if sparse:
+                runs['values_sparse_fields'] = lambda: values_path(queryset, size, sparse)
+            result = {'identical_json': identical}
+            for name, run in runs.items():
+                run()  # warm up
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    run()
+                elapsed = time.perf_counter() - started
+                result[name] = {
+                    'rows_per_second': round(size * repeats / elapsed),
+                    'ms_per_page': round(elapsed / repeats * 1000, 3),
+                }
+            result['speedup'] = round(
+                result['values_fast_path']['rows_per_second'] / result['model_serializer']['rows_per_second'], 2
+            )
+            results[str(size)] = result
+
+        report = {
+            'environment': {**benchmarking.environment(), 'rows_per_measurement': options['rows']},
+            'page_sizes': results,
+        }
+        benchmarking.write_report(report, options['output'], self.stdout)
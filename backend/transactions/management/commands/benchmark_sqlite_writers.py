@@ -0,0 +1,155 @@
+# backend/transactions/management/commands/benchmark_sqlite_writers.py
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from transactions import benchmarking
+
+SCHEMA = [
+    'CREATE TABLE txn (id INTEGER PRIMARY KEY, user_id INTEGER, amount NUMERIC, date TEXT, description TEXT)',
+    'CREATE INDEX txn_user_idx ON txn (user_id, date)',
+    'CREATE TABLE rollup (user_id INTEGER, month TEXT, total NUMERIC, count INTEGER, PRIMARY KEY (user_id, month))',
+]
+
+
+def profiles():
+    """Django's SQLite defaults against the tuned settings.SQLITE_OPTIONS profile"""
+    return {
+        'default': {'OPTIONS': {}, 'CONN_MAX_AGE': 0},
+        'tuned': {'OPTIONS': settings.SQLITE_OPTIONS, 'CONN_MAX_AGE': settings.SQLITE_CONN_MAX_AGE},
+    }
+
+
+def write_transaction(alias, rng):
+    """One create request: read the month's rollup, insert the row and bump the rollup, atomically"""
+    user_id = rng.randrange(20)
+    day = date(2024, 1, 1) + timedelta(days=rng.randrange(365))
+    month = day.replace(day=1).isoformat()
+    amount = round(rng.uniform(1, 100), 2)
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT total, count FROM rollup WHERE user_id = %s AND month = %s', [user_id, month])
+            cursor.fetchone()
+            cursor.execute(
+                'INSERT INTO txn (user_id, amount, date, description) VALUES (%s, %s, %s, %s)',
+                [user_id, amount, day.isoformat(), 'benchmark'],
+            )
+            cursor.execute(
+                'INSERT INTO rollup (user_id, month, total, count) VALUES (%s, %s, %s, 1) '
+                'ON CONFLICT (user_id, month) DO UPDATE SET total = total + excluded.total, count = count + 1',
+                [user_id, month, amount],
+            )
+
+
+def read_summary(alias, rng):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT COUNT(*), SUM(amount) FROM txn WHERE user_id = %s', [rng.randrange(20)])
+        cursor.fetchone()
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent writer and reader threads against a scratch SQLite file, once with '
+        "Django's defaults and once with the SQLITE_OPTIONS profile, and report throughput, "
+        'latency and "database is locked" errors as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=300, help='Operations per thread')
+        parser.add_argument('--profile', choices=sorted(profiles()), action='append', help='Only this profile (repeatable)')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['profile'] or sorted(profiles()):
+                alias = f'sqlite_benchmark_{name}'
+                database = {
+                    'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': os.path.join(directory, f'{name}.sqlite3'),
+                    **profiles()[name],
+                }
+                configured = connections.configure_settings(
+                    {DEFAULT_DB_ALIAS: settings.DATABASES[DEFAULT_DB_ALIAS], alias: database}
+                )
+                connections.settings[alias] = configured[alias]
+                try:
+                    results[name] = self.run(alias, options)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+
+        report = {
+            'environment': {
+                **benchmarking.environment(),
+                'writers': options['writers'],
+                'readers': options['readers'],
+                'operations_per_thread': options['operations'],
+            },
+            'profiles': results,
+        }
+        benchmarking.write_report(report, options['output'], self.stdout)
+
+    def run(self, alias, options):
+        with connections[alias].cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+        connections[alias].close()
+
+        samples = {'write': [], 'read': []}
+        errors = {'write': 0, 'read': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['writers'] + options['readers'])
+
+        def worker(kind, operation, seed):
+            rng = random.Random(seed)
+            timings, failed = [], 0
+            barrier.wait()
+            try:
+                for _ in range(options['operations']):
+                    start = time.perf_counter()
+                    try:
+                        operation(alias, rng)
+                        timings.append(time.perf_counter() - start)
+                    except OperationalError:
+                        failed += 1
+                    # End of a request: CONN_MAX_AGE decides whether the connection survives
+                    connections[alias].close_if_unusable_or_obsolete()
+            finally:
+                connections[alias].close()
+                with lock:
+                    samples[kind].extend(timings)
+                    errors[kind] += failed
+
+        threads = [
+            threading.Thread(target=worker, args=('write', write_transaction, index))
+            for index in range(options['writers'])
+        ] + [
+            threading.Thread(target=worker, args=('read', read_summary, 1000 + index))
+            for index in range(options['readers'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM txn')
+            rows = cursor.fetchone()[0]
+        return {
+            'writes': benchmarking.summarize_latencies(samples['write'], errors['write'], elapsed),
+            'reads': benchmarking.summarize_latencies(samples['read'], errors['read'], elapsed),
+            'rows_written': rows,
+            'wall_seconds': round(elapsed, 3),
+        }
@@ -0,0 +1,79 @@
+# backend/transactions/management/commands/explain_transactions.py
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from transactions.aggregation import summarize
+from transactions.filters import filter_transactions
+from transactions.models import Transaction
+
+# The filter combinations the frontend sends to /api/transactions/
+FILTER_COMBINATIONS = [
+    ('list', {}),
+    ('type', {'type': 'expense'}),
+    ('category', {'category': 'food'}),
+    ('date range', {'start_date': '2024-01-01', 'end_date': '2024-12-31'}),
+    ('type + date range', {'type': 'expense', 'start_date': '2024-01-01', 'end_date': '2024-12-31'}),
+    ('category + date range', {'category': 'food', 'start_date': '2024-01-01', 'end_date': '2024-12-31'}),
+    ('search', {'search': 'uber'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the standard transaction list filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User id to explain for (defaults to the first user)')
+        parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE (PostgreSQL only)')
+
+    def handle(self, *args, **options):
+        user_id = options['user']
+        if user_id is None:
+            user_id = User.objects.order_by('id').values_list('id', flat=True).first()
+        if user_id is None:
+            raise CommandError('No users found, pass --user')
+
+        if options['analyze'] and connection.vendor != 'postgresql':
+            raise CommandError('--analyze is only supported on PostgreSQL')
+        self.analyze = options['analyze']
+
+        self.stdout.write(f'Database vendor: {connection.vendor}')
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+
+        for label, params in FILTER_COMBINATIONS:
+            queryset = filter_transactions(Transaction.objects.filter(user_id=user_id), params)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {label} {params or ""}'))
+            self.stdout.write('-- first page')
+            self.stdout.write(self._explain(lambda: list(queryset[:page_size])))
+            self.stdout.write('-- count')
+            self.stdout.write(self._explain(queryset.count))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\n== summary'))
+        queryset = Transaction.objects.filter(user_id=user_id)
+        self.stdout.write(self._explain(lambda: summarize(queryset)))
+
+    def _explain(self, run):
+        """Run a query-producing callable and explain the last SQL it executed"""
+        # count() and aggregate() execute immediately, so capture their SQL instead
+        # of relying on QuerySet.explain()
+        captured = []
+
+        def capture(execute, sql, params, many, context):
+            captured.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            run()
+        sql, params = captured[-1]
+
+        if connection.vendor == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN '
+        elif self.analyze:
+            prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+        else:
+            prefix = 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
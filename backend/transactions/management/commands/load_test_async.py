@@ -0,0 +1,165 @@
+# backend/transactions/management/commands/load_test_async.py
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import benchmarking
+
+SERVERS = {
+    # What build.sh deploys: gunicorn's default single sync worker
+    'sync': (['-m', 'gunicorn', 'backend.wsgi:application', '--bind'], '/api/transactions/'),
+    'async': (['-m', 'uvicorn', 'backend.asgi:application', '--workers', '1', '--no-access-log', '--port'], '/api/async/transactions/'),
+}
+SCENARIOS = {
+    'export': 'export_csv/',
+    'summary': 'summary/?group_by=day&search=a',
+    'list': '?page_size=100&search=a',
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def slow_get(port, path, token, read_delay, timeout, receive_buffer=8192):
+    """
+    GET `path` like a client on a slow link: a small receive window and a
+    pause after every read. Returns (ok, started, first_byte, finished).
+    """
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+    sock.settimeout(timeout)
+    started = time.perf_counter()
+    first_byte = None
+    head = b''
+    try:
+        sock.connect(('127.0.0.1', port))
+        sock.sendall(
+            f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n'
+            f'Connection: close\r\n\r\n'.encode()
+        )
+        while True:
+            data = sock.recv(receive_buffer)
+            if not data:
+                break
+            if first_byte is None:
+                first_byte = time.perf_counter()
+                head = data[:12]
+            time.sleep(read_delay)
+    except OSError:
+        return False, started, first_byte, time.perf_counter()
+    finally:
+        sock.close()
+    return head.startswith(b'HTTP/1.1 200'), started, first_byte, time.perf_counter()
+
+
+def peak_overlap(intervals):
+    """Largest number of (start, end) intervals open at the same moment"""
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    open_now = peak = 0
+    for _, change in events:
+        open_now += change
+        peak = max(peak, open_now)
+    return peak
+
+
+class Command(BaseCommand):
+    help = (
+        'Start a sync gunicorn worker (as deployed by build.sh) and a single uvicorn worker serving '
+        '/api/async/, fire concurrent slow requests at both and report, as JSON, how long each client '
+        'waited for its first byte and how many responses each process kept in flight at once. '
+        'Seed data first with `manage.py seed_data`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help='Simultaneous slow clients')
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='export')
+        parser.add_argument('--read-delay', type=float, default=0.02, help='Seconds a client waits after each read')
+        parser.add_argument('--server', choices=sorted(SERVERS), action='append', help='Only this server (repeatable)')
+        parser.add_argument('--username', default='bench0')
+        parser.add_argument('--password', default='bench-pass')
+        parser.add_argument('--timeout', type=float, default=300)
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name in options['server'] or sorted(SERVERS):
+            arguments, prefix = SERVERS[name]
+            port = _free_port()
+            bind = f'127.0.0.1:{port}' if name == 'sync' else str(port)
+            process = subprocess.Popen(
+                [sys.executable, *arguments, bind], cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                token = self.wait_and_login(port, options)
+                results[name] = self.run(port, prefix + SCENARIOS[options['scenario']], token, options)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+        report = {
+            'environment': {
+                **benchmarking.environment(),
+                'scenario': options['scenario'],
+                'concurrency': options['concurrency'],
+                'read_delay': options['read_delay'],
+            },
+            'servers': results,
+        }
+        benchmarking.write_report(report, options['output'], self.stdout)
+
+    def wait_and_login(self, port, options):
+        credentials = {'username': options['username'], 'password': options['password']}
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                response = requests.post(f'http://127.0.0.1:{port}/api/login/', json=credentials, timeout=10)
+            except requests.ConnectionError:
+                if time.monotonic() > deadline:
+                    raise CommandError(f'Server on port {port} did not start')
+                time.sleep(0.2)
+                continue
+            if response.status_code != 200:
+                raise CommandError(f"Login as {options['username']} failed ({response.status_code}), run seed_data first")
+            return response.json()['access']
+
+    def run(self, port, path, token, options):
+        concurrency = options['concurrency']
+        barrier = threading.Barrier(concurrency)
+        results = [None] * concurrency
+
+        def client(index):
+            barrier.wait()
+            results[index] = slow_get(port, path, token, options['read_delay'], options['timeout'])
+
+        threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        answered = [(start, first, end) for ok, start, first, end in results if ok and first is not None]
+        summary = benchmarking.summarize_latencies(
+            [end - start for start, _, end in answered], concurrency - len(answered), elapsed
+        )
+        # A sync worker starts a request only after the previous one is handed to the socket
+        first_bytes = sorted(first - start for start, first, _ in answered)
+        summary['time_to_first_byte_ms'] = {
+            'p50': round(benchmarking.percentile(first_bytes, 0.5) * 1000, 3) if first_bytes else None,
+            'max': round(first_bytes[-1] * 1000, 3) if first_bytes else None,
+        }
+        # Responses being sent at the same time by this one process
+        summary['peak_concurrent_responses'] = peak_overlap([(first, end) for _, first, end in answered])
+        summary['wall_seconds'] = round(elapsed, 3)
+        return summary
@@ -0,0 +1,74 @@
+# backend/transactions/management/commands/materialize_recurring.py
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from transactions import recurring
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the transactions recurring templates owe up to today, in chunked bulk inserts. '
+        'Safe to rerun or run after a crash; with --processes the users are split into id ranges '
+        'materialized in parallel.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Materialize up to this date (YYYY-MM-DD) instead of today')
+        parser.add_argument(
+            '--processes', type=int, default=0, help='Worker processes (PostgreSQL); 0 runs in this process'
+        )
+        parser.add_argument(
+            '--ranges', type=int, default=None, help='User id ranges handed to the pool (default 4 per process)'
+        )
+        parser.add_argument('--first-user', type=int, help='Only users with id >= this')
+        parser.add_argument('--last-user', type=int, help='Only users with id <= this')
+        parser.add_argument('--chunk-size', type=int, default=recurring.CHUNK_SIZE, help='Templates per DB transaction')
+        parser.add_argument('--batch-size', type=int, default=recurring.BATCH_SIZE, help='Rows per INSERT')
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('--date must be a date (YYYY-MM-DD)')
+        sizes = (options['chunk_size'], options['batch_size'])
+        started = time.perf_counter()
+
+        processes = options['processes']
+        if processes and connection.vendor == 'sqlite':
+            # One writer at a time: parallel workers only queue up on the lock and time out
+            self.stderr.write('SQLite has a single writer, materializing in this process instead of a pool')
+            processes = 0
+
+        if processes == 0:
+            templates, created = recurring.materialize(today, options['first_user'], options['last_user'], *sizes)
+        else:
+            ranges = recurring.user_ranges(today, options['ranges'] or processes * 4)
+            ranges = [
+                (max(first, options['first_user'] or first), min(last, options['last_user'] or last))
+                for first, last in ranges
+            ]
+            ranges = [(first, last) for first, last in ranges if first <= last]
+            # Spawned children set Django up themselves and open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+            ) as pool:
+                futures = [
+                    pool.submit(recurring.materialize_in_process, today, first, last, *sizes)
+                    for first, last in ranges
+                ]
+                results = [future.result() for future in futures]
+            templates = sum(result[0] for result in results)
+            created = sum(result[1] for result in results)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Materialized {created} transaction(s) from {templates} template(s) up to {today} '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,12 @@
+# backend/transactions/management/commands/prune_tombstones.py
+from django.core.management.base import BaseCommand
+
+from transactions.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than TRANSACTION_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} tombstone(s)'))
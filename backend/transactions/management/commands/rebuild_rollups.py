@@ -0,0 +1,39 @@
+# backend/transactions/management/commands/rebuild_rollups.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the MonthlyRollup table from raw transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Only this user id (repeatable)')
+        parser.add_argument('--verify', action='store_true', help='Report mismatches instead of rebuilding')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users processed per batch')
+
+    def handle(self, *args, **options):
+        user_ids = options['user'] or list(User.objects.order_by('id').values_list('id', flat=True))
+        chunk_size = options['chunk_size']
+        mismatches = 0
+
+        for offset in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[offset:offset + chunk_size]
+            if options['verify']:
+                for key, (stored, expected) in sorted(rollups.verify(chunk).items(), key=str):
+                    mismatches += 1
+                    user_id, month, category, txn_type = key
+                    self.stdout.write(
+                        f'user={user_id} month={month:%Y-%m} {category}/{txn_type}: '
+                        f'stored={stored} expected={expected}'
+                    )
+            else:
+                rollups.rebuild(chunk)
+
+        if options['verify']:
+            if mismatches:
+                raise CommandError(f'{mismatches} rollup bucket(s) out of sync')
+            self.stdout.write(self.style.SUCCESS(f'Rollups in sync for {len(user_ids)} user(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {len(user_ids)} user(s)'))
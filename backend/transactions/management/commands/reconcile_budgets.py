@@ -0,0 +1,38 @@
+# backend/transactions/management/commands/reconcile_budgets.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import budgets
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the BudgetSpend counters from raw transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Only this user id (repeatable)')
+        parser.add_argument('--verify', action='store_true', help='Report mismatches instead of rebuilding')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users processed per batch')
+
+    def handle(self, *args, **options):
+        user_ids = options['user'] or list(User.objects.order_by('id').values_list('id', flat=True))
+        chunk_size = options['chunk_size']
+        mismatches = 0
+
+        for offset in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[offset:offset + chunk_size]
+            if options['verify']:
+                for key, (stored, expected) in sorted(budgets.verify(chunk).items(), key=str):
+                    mismatches += 1
+                    user_id, period, start, category = key
+                    self.stdout.write(
+                        f'user={user_id} {period}={start} {category}: stored={stored} expected={expected}'
+                    )
+            else:
+                budgets.rebuild(chunk)
+
+        if options['verify']:
+            if mismatches:
+                raise CommandError(f'{mismatches} spend counter(s) out of sync')
+            self.stdout.write(self.style.SUCCESS(f'Spend counters in sync for {len(user_ids)} user(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt spend counters for {len(user_ids)} user(s)'))
@@ -0,0 +1,116 @@
+# backend/transactions/management/commands/run_jobs.py
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from transactions import jobs
+from transactions.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued export/import jobs in a pool of worker processes, starting a job only while '
+        'JOB_MAX_RUNNING and JOB_MAX_RUNNING_PER_USER allow it. Several of these workers may share a database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='Pool size (default JOB_WORKER_PROCESSES); 0 runs jobs one at a time in this process',
+        )
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between checks for new jobs')
+        parser.add_argument('--once', action='store_true', help='Exit once no job can be started or is running')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes is None:
+            processes = settings.JOB_WORKER_PROCESSES
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+
+        requeued, failed = jobs.requeue_stale()
+        if requeued or failed:
+            self.stdout.write(f'Requeued {requeued} and failed {failed} abandoned job(s)')
+        if processes == 0:
+            self.run_inline(options)
+        else:
+            self.run_pool(processes, options)
+
+    def run_inline(self, options):
+        while True:
+            job_id = self.claim()
+            if job_id is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                self.check_in([])
+                continue
+            self.report(job_id, jobs.run_job(job_id))
+
+    def run_pool(self, processes, options):
+        # Spawned children set Django up themselves and open their own connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+        )
+        running = {}
+        try:
+            while True:
+                self.check_in(list(running.values()))
+                while len(running) < processes:
+                    job_id = self.claim()
+                    if job_id is None:
+                        break
+                    running[pool.submit(jobs.run_job_in_process, job_id)] = job_id
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        # The child died (or could not report back) before marking the job
+                        Job.objects.filter(pk=job_id, status='running').update(
+                            status='failed', error=f'Worker process failed: {e!r}'
+                        )
+                        ok = False
+                    self.report(job_id, ok)
+        finally:
+            # Let started jobs finish; queued ones stay for the next worker
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def check_in(self, job_ids):
+        """Heartbeat the running jobs and requeue abandoned ones, or wait for the next round"""
+        try:
+            jobs.heartbeat(job_ids)
+            jobs.requeue_stale()
+        except DatabaseError:
+            # e.g. SQLite busy past busy_timeout; the running jobs keep beating on their own
+            logger.warning('Worker check-in failed, retrying after the next poll', exc_info=True)
+
+    def claim(self):
+        try:
+            return jobs.claim_next(self.worker)
+        except DatabaseError:
+            logger.warning('Claiming a job failed, retrying after the next poll', exc_info=True)
+            return None
+
+    def report(self, job_id, ok):
+        if ok:
+            self.stdout.write(self.style.SUCCESS(f'Job {job_id} succeeded'))
+        else:
+            self.stdout.write(self.style.ERROR(f'Job {job_id} failed'))
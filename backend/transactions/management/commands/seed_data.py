@@ -0,0 +1,31 @@
+# backend/transactions/management/commands/seed_data.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from transactions import benchmarking
+
+
+class Command(BaseCommand):
+    help = 'Generate users with realistic transactions for benchmarks (bulk_create, rollups and spend counters rebuilt)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to create or reuse')
+        parser.add_argument('--transactions', type=int, default=1000, help='New transactions per user')
+        parser.add_argument('--prefix', default='bench', help='Usernames are <prefix>0, <prefix>1, ...')
+        parser.add_argument('--password', default='bench-pass', help='Password of the generated users')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = benchmarking.seed(
+            options['users'], options['transactions'],
+            prefix=options['prefix'], password=options['password'],
+            batch_size=options['batch_size'], seed=options['seed'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        total = len(user_ids) * options['transactions']
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {total} transactions for {len(user_ids)} user(s) in {time.perf_counter() - started:.1f}s'
+        ))
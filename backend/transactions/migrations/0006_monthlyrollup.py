@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlyRollup = apps.get_model('transactions', 'MonthlyRollup')
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('user_id', 'month', 'category', 'type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    MonthlyRollup.objects.bulk_create((MonthlyRollup(**row) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_description_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('type', models.CharField(max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month', 'category', 'type'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'category', 'type'), name='unique_monthly_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+
+def backfill_spend(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    BudgetSpend = apps.get_model('transactions', 'BudgetSpend')
+    expenses = Transaction.objects.order_by().filter(type='expense')
+    for period, truncate in (('week', TruncWeek('date')), ('month', TruncMonth('date'))):
+        rows = (
+            expenses.annotate(start=truncate)
+            .values('user_id', 'start', 'category')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        )
+        BudgetSpend.objects.bulk_create((BudgetSpend(period=period, **row) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('food', 'Food'), ('transport', 'Transport'), ('bills', 'Bills'), ('entertainment', 'Entertainment'), ('shopping', 'Shopping'), ('health', 'Health'), ('education', 'Education'), ('salary', 'Salary'), ('other', 'Other')], max_length=50)),
+                ('period', models.CharField(choices=[('week', 'Weekly'), ('month', 'Monthly')], default='month', max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('alert_threshold', models.PositiveSmallIntegerField(default=80)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['category', 'period'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'category', 'period'), name='unique_budget')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BudgetSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=10)),
+                ('start', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start', 'period', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'start', 'category'), name='unique_budget_spend')],
+            },
+        ),
+        migrations.RunPython(backfill_spend, migrations.RunPython.noop),
+    ]
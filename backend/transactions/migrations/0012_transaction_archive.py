@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from transactions import archive
+
+
+def install_view(apps, schema_editor):
+    archive.install_view(schema_editor.connection)
+
+
+def uninstall_view(apps, schema_editor):
+    archive.uninstall_view(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0011_recurring_transactions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllTransaction',
+            fields=[
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], default='expense', max_length=10)),
+                ('category', models.CharField(choices=[('food', 'Food'), ('transport', 'Transport'), ('bills', 'Bills'), ('entertainment', 'Entertainment'), ('shopping', 'Shopping'), ('health', 'Health'), ('education', 'Education'), ('salary', 'Salary'), ('other', 'Other')], default='other', max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.TextField(blank=True)),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'transactions_alltransaction',
+                'ordering': ['-date', '-created_at'],
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], default='expense', max_length=10)),
+                ('category', models.CharField(choices=[('food', 'Food'), ('transport', 'Transport'), ('bills', 'Bills'), ('entertainment', 'Entertainment'), ('shopping', 'Shopping'), ('health', 'Health'), ('education', 'Education'), ('salary', 'Salary'), ('other', 'Other')], default='other', max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.TextField(blank=True)),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('recurrence', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_occurrences', to='transactions.recurringtransaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date', '-created_at'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['user', 'date'], name='archived_user_date_idx')],
+            },
+        ),
+        migrations.RunPython(install_view, uninstall_view),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from transactions import search
+
+ARCHIVE = ('transactions_archivedtransaction',)
+
+
+def install_search_index(apps, schema_editor):
+    search.install(schema_editor.connection, ARCHIVE)
+
+
+def uninstall_search_index(apps, schema_editor):
+    search.uninstall(schema_editor.connection, ARCHIVE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0012_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
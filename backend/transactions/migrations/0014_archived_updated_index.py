@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0013_archived_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['user', 'updated_at'], name='archived_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from transactions import archive
+
+
+def install_view(apps, schema_editor):
+    archive.install_view(schema_editor.connection)
+
+
+def uninstall_view(apps, schema_editor):
+    archive.uninstall_view(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('transactions', '0014_archived_updated_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # SQLite remakes the tables to add the columns, the view is recreated over them below
+        migrations.RunPython(uninstall_view, install_view),
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='archivedtransaction',
+            name='archived_user_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transactiontombstone',
+            name='tombstone_user_deleted_idx',
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='transactiontombstone',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['user', 'change_seq'], name='archived_user_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'change_seq'], name='txn_user_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactiontombstone',
+            index=models.Index(fields=['user', 'change_seq'], name='tombstone_user_seq_idx'),
+        ),
+        migrations.RunPython(install_view, uninstall_view),
+    ]
@@ -1,10 +1,16 @@
 # backend/transactions/models.py
-from django.db import models
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
+from .signals import SNAPSHOT_FIELDS, TransactionSnapshot, send_changes, snapshot
 
 
-class Transaction(models.Model):
+class TransactionFields(models.Model):
+    """The columns shared by Transaction, ArchivedTransaction and the AllTransaction view"""
     CATEGORY_CHOICES = [
         ('food', 'Food'),
         ('transport', 'Transport'),
@@ -22,16 +28,313 @@ class Transaction(models.Model):
         ('expense', 'Expense'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, default='expense')
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='other')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True)
     date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Position in the user's change sequence, stamped by sync.record_changes()
+    change_seq = models.BigIntegerField(default=0, editable=False)
     
     class Meta:
+        abstract = True
         ordering = ['-date', '-created_at']
     
     def __str__(self):
-        return f"{self.type} - {self.category} - {self.amount}"
\ No newline at end of file
+        return f"{self.type} - {self.category} - {self.amount}"
+
+
+class Transaction(TransactionFields):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
+    # Set on rows generated from a RecurringTransaction template
+    recurrence = models.ForeignKey(
+        'RecurringTransaction', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences'
+    )
+    
+    class Meta(TransactionFields.Meta):
+        constraints = [
+            # One row per template and date, so reruns of the materializer cannot duplicate
+            models.UniqueConstraint(fields=['recurrence', 'date'], name='unique_recurrence_date'),
+        ]
+        indexes = [
+            # Default list ordering for a single user
+            models.Index(fields=['user', '-date', '-created_at'], name='txn_user_date_created_idx'),
+            # ?type= and ?category= filters combined with a date range
+            models.Index(fields=['user', 'type', 'date'], name='txn_user_type_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='txn_user_category_date_idx'),
+            # Latest modification per user, for ETags
+            models.Index(fields=['user', 'updated_at'], name='txn_user_updated_idx'),
+            # Sync deltas, see sync.changes_since()
+            models.Index(fields=['user', 'change_seq'], name='txn_user_seq_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so save() can report what changed
+        if not instance.get_deferred_fields().intersection(SNAPSHOT_FIELDS):
+            instance._snapshot = snapshot(instance)
+        return instance
+    
+    def _stored_snapshot(self):
+        if self._state.adding:
+            return None
+        if hasattr(self, '_snapshot'):
+            return self._snapshot
+        row = type(self).objects.filter(pk=self.pk).values_list(*SNAPSHOT_FIELDS).first()
+        return TransactionSnapshot(*row) if row else None
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            old = self._stored_snapshot()
+            super().save(*args, **kwargs)
+            self._snapshot = snapshot(self)
+            send_changes([(old, self._snapshot)])
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            old = self._stored_snapshot() or snapshot(self)
+            result = super().delete(*args, **kwargs)
+            send_changes([(old, None)])
+        return result
+
+
+class ArchivedTransaction(TransactionFields):
+    """
+    Transactions older than the archive horizon, moved here by
+    `manage.py archive_transactions` with their ids and timestamps unchanged.
+    Moving rows is not a change to the data, so no transactions_changed is
+    sent either way: rollups and spend counters keep counting them, and sync
+    reads them through AllTransaction.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_transactions')
+    recurrence = models.ForeignKey(
+        'RecurringTransaction', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='archived_occurrences',
+    )
+    
+    class Meta(TransactionFields.Meta):
+        indexes = [
+            models.Index(fields=['user', 'date'], name='archived_user_date_idx'),
+            # Sync deltas, see sync.changes_since()
+            models.Index(fields=['user', 'change_seq'], name='archived_user_seq_idx'),
+        ]
+
+
+class AllTransaction(TransactionFields):
+    """Read-only view over Transaction UNION ALL ArchivedTransaction, see archive.install_view()"""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    recurrence = models.ForeignKey(
+        'RecurringTransaction', on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    
+    class Meta(TransactionFields.Meta):
+        managed = False
+        db_table = 'transactions_alltransaction'
+
+
+class RecurringTransaction(models.Model):
+    """
+    A template the `materialize_recurring` command turns into a Transaction
+    on every scheduled date: every `interval` days, weeks, months or years
+    from start_date. Monthly and yearly dates keep start_date's day of the
+    month, falling back to the last day in shorter months.
+    """
+    FREQUENCY_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_transactions')
+    type = models.CharField(max_length=10, choices=Transaction.TYPE_CHOICES, default='expense')
+    category = models.CharField(max_length=50, choices=Transaction.CATEGORY_CHOICES, default='other')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.TextField(blank=True)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='monthly')
+    interval = models.PositiveSmallIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    # First scheduled date not materialized yet, null once the schedule has ended
+    next_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['next_date', 'id']
+        indexes = [
+            # The materializer's scan: due templates within a user id range
+            models.Index(fields=['user', 'next_date'], name='recurring_user_next_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.category} every {self.interval} {self.frequency}: {self.amount}"
+
+
+class MonthlyRollup(models.Model):
+    """Running totals per user, month, category and type, kept in step with Transaction writes"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField()  # First day of the month
+    category = models.CharField(max_length=50)
+    type = models.CharField(max_length=10)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['month', 'category', 'type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'category', 'type'], name='unique_monthly_rollup'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.month:%Y-%m} - {self.category} - {self.type}: {self.total}"
+
+
+class Budget(models.Model):
+    """A spending limit for one expense category per week or month"""
+    PERIOD_CHOICES = [
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
+    category = models.CharField(max_length=50, choices=Transaction.CATEGORY_CHOICES)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='month')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Percentage of the amount at which the status turns to "warning"
+    alert_threshold = models.PositiveSmallIntegerField(default=80)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['category', 'period']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'period'], name='unique_budget'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.category}/{self.period}: {self.amount}"
+
+
+class BudgetSpend(models.Model):
+    """Running expense totals per user, period, category, kept in step with Transaction writes"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budget_spend')
+    period = models.CharField(max_length=10)
+    start = models.DateField()  # Monday of the week or first day of the month
+    category = models.CharField(max_length=50)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['start', 'period', 'category']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'period', 'start', 'category'], name='unique_budget_spend'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.period} {self.start} - {self.category}: {self.total}"
+
+
+class TransactionTombstone(models.Model):
+    """Marks a deleted transaction so sync clients can drop their copy"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transaction_tombstones')
+    transaction_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    change_seq = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='tombstone_user_seq_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.transaction_id} deleted {self.deleted_at}"
+
+
+class ChangeSequence(models.Model):
+    """
+    The last change_seq handed out per user. Writers bump it inside their DB
+    transaction and hold the row lock until commit, so a user's sequence
+    numbers become visible in order, see sync.next_seq()
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.value}"
+
+
+class JobFileStorage(FileSystemStorage):
+    """Uploaded imports and finished exports, kept under JOB_FILES_ROOT rather than MEDIA_ROOT"""
+
+    @property
+    def base_location(self):
+        return settings.JOB_FILES_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def job_storage():
+    return JobFileStorage()
+
+
+class Job(models.Model):
+    """
+    A CSV export or import run by the `run_jobs` worker instead of a request.
+    Both report progress as rows are written. An import checks every row
+    first, then commits every JOB_IMPORT_COMMIT_ROWS rows with its progress
+    so far in `result`, where a requeued attempt picks up.
+    """
+    KIND_CHOICES = [
+        ('export', 'Export'),
+        ('import', 'Import'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    params = models.JSONField(default=dict, blank=True)
+    input = models.FileField(upload_to='input/', storage=job_storage, blank=True)
+    artifact = models.FileField(upload_to='output/', storage=job_storage, blank=True)
+    processed = models.IntegerField(default=0)
+    total = models.IntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # The worker's claim query: oldest queued job first, running counts per user
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+            models.Index(fields=['user', 'status'], name='job_user_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.kind} #{self.pk}: {self.status}"
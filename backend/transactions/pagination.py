@@ -0,0 +1,174 @@
+# backend/transactions/pagination.py
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TransactionPagination(PageNumberPagination):
+    """
+    Page-number pagination for existing clients, keyset pagination on request.
+
+    Clients opt into keyset mode with ?pagination=cursor (first page) and then
+    follow the `next` link, which carries an opaque ?cursor= for
+    (date, created_at, id). Keyset pages never use OFFSET and only run a
+    COUNT(*) when ?include_count=true, so page N costs the same as page 1.
+    Keyset pages always come in that order: ?ordering= is ignored, and
+    ?ordering=relevance, which cannot be paged by position, is a 400.
+
+    Set `archive` to (archived_through, the same listing over AllTransaction)
+    to page a hot-table listing on into the archive: rows dated after
+    archived_through come from the hot table, and once a page passes it the
+    rest are read from the view.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'include_count'
+    ordering = ('-date', '-created_at', '-id')
+    archive = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.is_keyset_request(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.check_ordering(request)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = sum(part.count() for part in self.keyset_parts(queryset))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = []
+        for part in self.keyset_parts(queryset, self.get_position(request)):
+            if len(rows) > self.page_size:
+                break
+            rows.extend(part[:self.page_size + 1 - len(rows)])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views, same links and errors, via the async ORM"""
+        self.keyset = self.is_keyset_request(request)
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        if not self.keyset:
+            paginator = self.django_paginator_class(queryset, self.page_size)
+            # Paginator.count is a cached_property, fill it without a sync query
+            paginator.count = await queryset.acount()
+            page_number = self.get_page_number(request, paginator)
+            try:
+                self.page = paginator.page(page_number)
+            except InvalidPage as exc:
+                raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+            self.page.object_list = [row async for row in self.page.object_list]
+            return list(self.page)
+
+        self.check_ordering(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = sum([await part.acount() for part in self.keyset_parts(queryset)])
+
+        rows = []
+        for part in self.keyset_parts(queryset, self.get_position(request)):
+            if len(rows) > self.page_size:
+                break
+            rows.extend([row async for row in part[:self.page_size + 1 - len(rows)]])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        payload = {'next': self.get_next_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        # Only the first page pays for the count
+        url = remove_query_param(url, self.count_query_param)
+        url = replace_query_param(url, self.mode_query_param, 'cursor')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def is_keyset_request(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or self.cursor_query_param in params
+
+    def check_ordering(self, request):
+        if request.query_params.get('ordering') == 'relevance':
+            raise ParseError('ordering=relevance cannot be combined with cursor pagination')
+
+    def get_position(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        return self.decode_cursor(cursor) if cursor else None
+
+    def keyset_parts(self, queryset, position=None):
+        """The ordered querysets a keyset listing reads, one after the other, from `position` on"""
+        parts = [queryset.order_by(*self.ordering)]
+        if self.archive is not None:
+            through, archived = self.archive
+            archived = archived.filter(date__lte=through).order_by(*self.ordering)
+            if position is not None and position[0] <= through:
+                parts = [archived]
+            else:
+                parts = [parts[0].filter(date__gt=through), archived]
+        if position is not None:
+            parts = [part.filter(self.cursor_filter(position)) for part in parts]
+        return parts
+
+    def cursor_filter(self, position):
+        """Rows strictly after `position` in (-date, -created_at, -id) order"""
+        row_date, created_at, pk = position
+        return (
+            Q(date__lt=row_date)
+            | Q(date=row_date, created_at__lt=created_at)
+            | Q(date=row_date, created_at=created_at, id__lt=pk)
+        )
+
+    def encode_cursor(self, row):
+        if isinstance(row, dict):
+            # values() rows from the fast list path
+            position = [row['date'].isoformat(), row['created_at'].isoformat(), row['id']]
+        else:
+            position = [row.date.isoformat(), row.created_at.isoformat(), row.id]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            raw_date, raw_created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position = date.fromisoformat(raw_date), datetime.fromisoformat(raw_created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        # encode_cursor() only writes aware datetimes, a naive one would be compared in the wrong timezone
+        if timezone.is_naive(position[1]):
+            raise ParseError('Invalid cursor')
+        return position
@@ -0,0 +1,179 @@
+# backend/transactions/recurring.py
+import calendar
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Max, Min
+
+from .models import AllTransaction, RecurringTransaction, Transaction
+from .signals import send_changes, snapshot
+
+# Templates locked and materialized per DB transaction
+CHUNK_SIZE = 1000
+# Rows per INSERT, well under SQLite's bound parameter limit
+BATCH_SIZE = 500
+
+
+# --- Schedules ---------------------------------------------------------------
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(template, index):
+    """The index-th scheduled date, counting start_date as 0"""
+    step = index * template.interval
+    if template.frequency == 'daily':
+        return template.start_date + timedelta(days=step)
+    if template.frequency == 'weekly':
+        return template.start_date + timedelta(weeks=step)
+    if template.frequency == 'monthly':
+        return _add_months(template.start_date, step)
+    return _add_months(template.start_date, 12 * step)
+
+
+def first_index_on_or_after(template, day):
+    """Index of the first scheduled date on or after `day`"""
+    start = template.start_date
+    if day <= start:
+        return 0
+    if template.frequency in ('daily', 'weekly'):
+        period = template.interval * (7 if template.frequency == 'weekly' else 1)
+        return -(-(day - start).days // period)
+    months = (day.year - start.year) * 12 + day.month - start.month
+    index = months // (template.interval * (12 if template.frequency == 'yearly' else 1))
+    # Clamping to short months can put an occurrence before `day` in the same month
+    while occurrence(template, index) < day:
+        index += 1
+    return index
+
+
+def next_date_on_or_after(template, day):
+    """First scheduled date on or after `day`, or None once the schedule has ended"""
+    result = occurrence(template, first_index_on_or_after(template, day))
+    if template.end_date is not None and result > template.end_date:
+        return None
+    return result
+
+
+def due_dates(template, today):
+    """Scheduled dates from template.next_date up to today (and end_date)"""
+    if template.next_date is None:
+        return [], None
+    last = today if template.end_date is None else min(today, template.end_date)
+    index = first_index_on_or_after(template, template.next_date)
+    dates = []
+    while (day := occurrence(template, index)) <= last:
+        dates.append(day)
+        index += 1
+    if template.end_date is not None and day > template.end_date:
+        day = None
+    return dates, day
+
+
+# --- Materializer ------------------------------------------------------------
+
+def _materialize_chunk(templates, today, batch_size):
+    rows, pending = [], []
+    for template in templates:
+        dates, template.next_date = due_dates(template, today)
+        pending.extend((template, day) for day in dates)
+
+    # Rows already there (a template moved back in time), archived ones
+    # included, are skipped up front; one query over the view sees a row the
+    # archiver is moving in exactly one of the tables
+    existing = set()
+    if pending:
+        existing = set(
+            AllTransaction.objects.filter(
+                recurrence__in=templates, date__gte=min(day for _, day in pending),
+            ).values_list('recurrence_id', 'date')
+        )
+    for template, day in pending:
+        if (template.id, day) in existing:
+            continue
+        rows.append(Transaction(
+            user_id=template.user_id, type=template.type, category=template.category,
+            amount=template.amount, description=template.description, date=day, recurrence=template,
+        ))
+
+    # The unique (recurrence, date) key turns a row written concurrently since
+    # the check (e.g. a restore from the archive) into a skipped insert
+    Transaction.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    RecurringTransaction.objects.bulk_update(templates, ['next_date'], batch_size=batch_size)
+    created = _created(templates, rows)
+    # bulk_create skips save(), so report the new rows explicitly
+    send_changes([(None, snapshot(txn)) for txn in created])
+    return len(created)
+
+
+def _created(templates, rows):
+    """
+    The rows bulk_create(ignore_conflicts=True) actually inserted, read back
+    by (recurrence, date) and told apart from a conflicting row by created_at,
+    which bulk_create set on each instance
+    """
+    if not rows:
+        return []
+    stamps = {(txn.recurrence_id, txn.date): txn.created_at for txn in rows}
+    return [
+        txn for txn in Transaction.objects.filter(
+            recurrence__in=templates,
+            date__gte=min(txn.date for txn in rows),
+            created_at__gte=min(stamps.values()),
+        )
+        if stamps.get((txn.recurrence_id, txn.date)) == txn.created_at
+    ]
+
+
+def materialize(today, first_user=None, last_user=None, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE):
+    """
+    Create the transactions every due template in the user id range
+    [first_user, last_user] owes up to `today` and advance their next_date.
+
+    Templates are processed in id order, `chunk_size` per DB transaction.
+    Each chunk locks its templates, so two runs over the same users cannot
+    both materialize them, and a crash only loses the chunk in progress,
+    which the next run picks up again. Returns (templates, created).
+    """
+    due = RecurringTransaction.objects.filter(next_date__lte=today)
+    if first_user is not None:
+        due = due.filter(user_id__gte=first_user)
+    if last_user is not None:
+        due = due.filter(user_id__lte=last_user)
+
+    processed = created = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Re-checks next_date once a concurrent run holding the lock commits
+            templates = list(due.filter(id__gt=last_id).select_for_update().order_by('id')[:chunk_size])
+            if not templates:
+                break
+            created += _materialize_chunk(templates, today, batch_size)
+        processed += len(templates)
+        last_id = templates[-1].id
+    return processed, created
+
+
+def materialize_in_process(today, first_user, last_user, chunk_size, batch_size):
+    """materialize() for a process pool worker, with connections that belong to this process"""
+    close_old_connections()
+    try:
+        return materialize(today, first_user, last_user, chunk_size, batch_size)
+    finally:
+        close_old_connections()
+
+
+def user_ranges(today, parts):
+    """Split the users with due templates into at most `parts` contiguous id ranges"""
+    bounds = RecurringTransaction.objects.filter(next_date__lte=today).aggregate(
+        first=Min('user_id'), last=Max('user_id')
+    )
+    if bounds['first'] is None:
+        return []
+    first, last = bounds['first'], bounds['last']
+    size = -(-(last - first + 1) // parts)
+    return [(start, min(start + size - 1, last)) for start in range(first, last + 1, size)]
@@ -0,0 +1,260 @@
+# backend/transactions/rollups.py
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.dispatch import receiver
+
+from . import archive
+from .aggregation import ZERO, breakdown, summarize
+from .models import AllTransaction, MonthlyRollup
+from .signals import transactions_changed
+
+# group_by values that can be answered from the monthly rollup
+ROLLUP_GROUPS = ('category', 'type', 'month')
+# Counter rows per upsert statement, 6 parameters each, under SQLite's old 999 limit
+UPSERT_BATCH_SIZE = 150
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+# --- Incremental maintenance -------------------------------------------------
+
+def collect_deltas(changes):
+    """Fold (old, new) snapshot pairs into {(user_id, month, category, type): [amount, count]}"""
+    deltas = defaultdict(lambda: [ZERO, 0])
+    for old, new in changes:
+        if old is not None:
+            delta = deltas[(old.user_id, month_start(old.date), old.category, old.type)]
+            delta[0] -= Decimal(old.amount)
+            delta[1] -= 1
+        if new is not None:
+            delta = deltas[(new.user_id, month_start(new.date), new.category, new.type)]
+            delta[0] += Decimal(new.amount)
+            delta[1] += 1
+    # An edit that kept the row in the same bucket with the same amount is a no-op
+    return {key: value for key, value in deltas.items() if value != [ZERO, 0]}
+
+
+def increment(model, key_fields, deltas, batch_size=UPSERT_BATCH_SIZE):
+    """
+    Add {key: [amount, count]} deltas to the total/count columns of `model`,
+    whose unique key is `key_fields`, creating missing rows. One
+    INSERT ... ON CONFLICT DO UPDATE per batch (SQLite 3.24+, PostgreSQL)
+    instead of an UPDATE, and an INSERT for new rows, per key.
+    """
+    if not deltas:
+        return
+    meta, quote = model._meta, connection.ops.quote_name
+    fields = [meta.get_field(name) for name in key_fields] + [meta.get_field('total'), meta.get_field('count')]
+    table = quote(meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    conflict = ', '.join(quote(field.column) for field in fields[:-2])
+    total, count = quote('total'), quote('count')
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    # Sorted keys take row locks in the same order in every writer
+    rows = [
+        [field.get_db_prep_save(value, connection) for field, value in zip(fields, (*key, *delta))]
+        for key, delta in sorted(deltas.items())
+    ]
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([row] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET '
+                f'{total} = {table}.{total} + excluded.{total}, {count} = {table}.{count} + excluded.{count}',
+                [value for values in batch for value in values],
+            )
+
+
+def apply_deltas(deltas):
+    increment(MonthlyRollup, ('user', 'month', 'category', 'type'), deltas)
+
+
+@receiver(transactions_changed)
+def update_rollups(sender, changes, **kwargs):
+    apply_deltas(collect_deltas(changes))
+
+
+# --- Rebuild / verify --------------------------------------------------------
+
+def computed_rollups(user_ids=None):
+    """Rollup rows recomputed from raw transactions, archived ones included, keyed like collect_deltas()"""
+    queryset = AllTransaction.objects.order_by()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    rows = (
+        queryset.annotate(month=TruncMonth('date'))
+        .values('user_id', 'month', 'category', 'type')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    # SQLite sums REAL values, so round the float noise off to the column's cents
+    return {
+        (row['user_id'], row['month'], row['category'], row['type']): [round(row['total'], 2), row['count']]
+        for row in rows
+    }
+
+
+def stored_rollups(user_ids=None):
+    queryset = MonthlyRollup.objects.exclude(count=0)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return {
+        (row.user_id, row.month, row.category, row.type): [row.total, row.count]
+        for row in queryset
+    }
+
+
+def rebuild(user_ids):
+    """Replace the rollup rows of the given users with freshly computed ones"""
+    with transaction.atomic():
+        MonthlyRollup.objects.filter(user_id__in=user_ids).delete()
+        MonthlyRollup.objects.bulk_create([
+            MonthlyRollup(
+                user_id=user_id, month=month, category=category, type=txn_type,
+                total=total, count=count,
+            )
+            for (user_id, month, category, txn_type), (total, count) in computed_rollups(user_ids).items()
+        ], batch_size=1000)
+
+
+def verify(user_ids):
+    """Return {key: (stored, expected)} for every bucket that disagrees"""
+    expected = computed_rollups(user_ids)
+    stored = stored_rollups(user_ids)
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) != expected.get(key)
+    }
+
+
+# --- Reads -------------------------------------------------------------------
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def can_serve(params, group_by=None):
+    """Whether a summary request can be answered from the rollup table"""
+    if params.get('search'):
+        return False
+    if group_by and group_by not in ROLLUP_GROUPS:
+        return False
+    # Leave malformed dates to the raw path so errors stay the same
+    for name in ('start_date', 'end_date'):
+        if params.get(name) and _parse_date(params.get(name)) is None:
+            return False
+    return True
+
+
+def split_range(start, end):
+    """
+    Split [start, end] into whole months served by the rollup and partial edge
+    ranges served by raw rows. Returns (full_from, full_to, raw_ranges) where
+    the whole months are full_from <= month < full_to (None means unbounded).
+    """
+    full_from = start if start is None or start.day == 1 else next_month(start)
+    full_to = None if end is None else (
+        next_month(end) if next_month(end) - timedelta(days=1) == end else month_start(end)
+    )
+    if full_from is not None and full_to is not None and full_from >= full_to:
+        # Shorter than a month, raw rows are cheap
+        return None, None, [(start, end)]
+
+    raw_ranges = []
+    if start is not None and start != full_from:
+        raw_ranges.append((start, full_from - timedelta(days=1)))
+    if end is not None and full_to is not None and end >= full_to:
+        raw_ranges.append((full_to, end))
+    return full_from, full_to, raw_ranges
+
+
+def _merge(into, row):
+    into['total_income'] += row['total_income']
+    into['total_expense'] += row['total_expense']
+    into['count'] += row['count']
+
+
+def summarize_user(user_id, params, group_by=None, archived_through=False):
+    """
+    Same result as summarize()/breakdown() over the filtered transactions, but
+    whole months are read from MonthlyRollup and only the partial months at the
+    edges of the date range touch raw rows. Archived rows stay counted in the
+    rollups; edge ranges reaching the archive read them from AllTransaction.
+    Pass `archived_through` when the caller already knows it.
+    """
+    start, end = _parse_date(params.get('start_date')), _parse_date(params.get('end_date'))
+    full_from, full_to, raw_ranges = split_range(start, end)
+
+    filters = {}
+    if params.get('type'):
+        filters['type'] = params.get('type')
+    if params.get('category'):
+        filters['category'] = params.get('category')
+
+    parts = []
+    if start is None or end is None or full_from is not None or full_to is not None:
+        buckets = MonthlyRollup.objects.filter(user_id=user_id, **filters).exclude(count=0)
+        if full_from is not None:
+            buckets = buckets.filter(month__gte=full_from)
+        if full_to is not None:
+            buckets = buckets.filter(month__lt=full_to)
+        parts.append(_rollup_rows(buckets, group_by))
+    if raw_ranges and archived_through is False:
+        archived_through = archive.archived_through(user_id)
+    for range_start, range_end in raw_ranges:
+        raw = archive.model_for(user_id, range_start, archived_through).objects.filter(
+            user_id=user_id, date__gte=range_start, date__lte=range_end, **filters
+        )
+        parts.append(breakdown(raw, group_by) if group_by else [summarize(raw)])
+
+    empty = {'total_income': ZERO, 'total_expense': ZERO, 'count': 0}
+    if not group_by:
+        totals = dict(empty)
+        for part in parts:
+            for row in part:
+                _merge(totals, row)
+        totals['balance'] = totals['total_income'] - totals['total_expense']
+        return totals
+
+    groups = {}
+    for part in parts:
+        for row in part:
+            _merge(groups.setdefault(row[group_by], {group_by: row[group_by], **empty}), row)
+    rows = [groups[key] for key in sorted(groups)]
+    for row in rows:
+        row['balance'] = row['total_income'] - row['total_expense']
+    return rows
+
+
+def _rollup_rows(buckets, group_by):
+    key = {'month': 'month', 'category': 'category', 'type': 'type', None: None}[group_by]
+    income = Sum('total', filter=Q(type='income'), default=ZERO)
+    expense = Sum('total', filter=Q(type='expense'), default=ZERO)
+    count = Sum('count', default=0)
+    if key is None:
+        return [buckets.order_by().aggregate(total_income=income, total_expense=expense, count=count)]
+    rows = buckets.order_by().values(key).annotate(
+        total_income=income, total_expense=expense, count=count
+    )
+    return [
+        {group_by: row[key], 'total_income': row['total_income'],
+         'total_expense': row['total_expense'], 'count': row['count']}
+        for row in rows
+    ]
@@ -0,0 +1,201 @@
+# backend/transactions/search.py
+import re
+
+from django.db import DatabaseError, connections
+from django.db.models import BooleanField, F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+# Tables with a description index, the hot table first; the archive gets the
+# same index so a search means the same thing on either side of the cutoff
+TABLES = ('transactions_transaction', 'transactions_archivedtransaction')
+PG_INDEXES = {
+    'transactions_transaction': 'txn_description_tsv_idx',
+    'transactions_archivedtransaction': 'archived_description_tsv_idx',
+}
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def sqlite_fts_sql(table):
+    fts = fts_table(table)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            description,
+            content='{table}',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""",
+        # The triggers keep the index in sync for every write path, including
+        # bulk_create, queryset update()/delete() and moves to and from the archive
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, description) VALUES (new.id, new.description);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, description) VALUES ('delete', old.id, old.description);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF description ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, description) VALUES ('delete', old.id, old.description);
+            INSERT INTO {fts}(rowid, description) VALUES (new.id, new.description);
+        END""",
+    ]
+
+
+def sqlite_triggers(table):
+    return [f'{fts_table(table)}_ai', f'{fts_table(table)}_ad', f'{fts_table(table)}_au']
+
+
+def pg_vector(table):
+    return f"to_tsvector('simple', coalesce(\"{table}\".\"description\", ''))"
+
+
+# Search backend per database alias, detected on first use
+_backends = {}
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Some builds load FTS5 without the compile option being reported
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)')
+            cursor.execute('DROP TABLE temp._fts5_probe')
+            return True
+        except DatabaseError:
+            return False
+
+
+def install(connection, tables=TABLES):
+    """
+    Create the search index of each of `tables` that exists and, on SQLite,
+    the triggers that keep it in sync
+    """
+    tables = [table for table in tables if table in connection.introspection.table_names()]
+    if connection.vendor == 'sqlite':
+        if not sqlite_has_fts5(connection):
+            return
+        with connection.cursor() as cursor:
+            for table in tables:
+                triggers = sqlite_triggers(table)
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)", triggers
+                )
+                if len(cursor.fetchall()) == len(triggers):
+                    continue
+                for statement in sqlite_fts_sql(table):
+                    cursor.execute(statement)
+                # Rebuilding copes both with a fresh table and with triggers lost
+                # when a migration remade the indexed table
+                cursor.execute(f"INSERT INTO {fts_table(table)}({fts_table(table)}) VALUES ('rebuild')")
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {PG_INDEXES[table]} ON {table} "
+                    f"USING GIN ((to_tsvector('simple', coalesce(description, ''))))"
+                )
+    _backends.pop(connection.alias, None)
+
+
+def uninstall(connection, tables=TABLES):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for table in tables:
+                for trigger in sqlite_triggers(table):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts_table(table)}')
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(f'DROP INDEX IF EXISTS {PG_INDEXES[table]}')
+    _backends.pop(connection.alias, None)
+
+
+def get_backend(alias, tables=TABLES[:1]):
+    """'sqlite', 'postgresql' or None when full-text search is unavailable for any of `tables`"""
+    if alias not in _backends:
+        connection = connections[alias]
+        backend, indexed = None, set()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE name IN (%s, %s)", [fts_table(table) for table in TABLES]
+                )
+                names = {row[0] for row in cursor.fetchall()}
+            indexed = {table for table in TABLES if fts_table(table) in names}
+            backend = 'sqlite' if indexed else None
+        elif connection.vendor == 'postgresql':
+            # to_tsvector() works without the index, which only makes it fast
+            backend, indexed = 'postgresql', set(TABLES)
+        _backends[alias] = backend, indexed
+    backend, indexed = _backends[alias]
+    return backend if indexed.issuperset(tables) else None
+
+
+def _terms(search):
+    return re.findall(r'\w+', search.lower())
+
+
+def _category_matches(model, search):
+    # Categories are a fixed set, so the old substring match can be answered in Python
+    needle = search.lower()
+    return [value for value, _ in model.CATEGORY_CHOICES if needle in value]
+
+
+def _tables(model):
+    """The indexed tables holding the rows of `model`"""
+    from .models import AllTransaction
+
+    if model is AllTransaction:
+        return TABLES
+    return (model._meta.db_table,) if model._meta.db_table in TABLES else None
+
+
+def apply_search(queryset, search, ranked=False):
+    """
+    Filter by category substring or by description words, using the full-text index.
+
+    Every word must match the start of a word in the description ("gro" finds
+    "Groceries"). When `ranked` is set the rows are ordered by relevance first.
+    The archive has the same index, so AllTransaction searches both tables.
+    Falls back to the original icontains filter when no index is available.
+    """
+    terms = _terms(search)
+    tables = _tables(queryset.model)
+    backend = get_backend(queryset.db, tables) if tables else None
+    if backend is None or not terms:
+        return queryset.filter(Q(category__icontains=search) | Q(description__icontains=search))
+
+    categories = Q(category__in=_category_matches(queryset.model, search))
+    table = queryset.model._meta.db_table
+    if backend == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # Ids are unique across the hot table and the archive, so each index answers for its own rows
+        matches = Q()
+        ranks = []
+        for fts in map(fts_table, tables):
+            matches |= Q(id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [match]))
+            ranks.append(RawSQL(
+                f'SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND rowid = "{table}"."id"',
+                [match],
+                output_field=FloatField(),
+            ))
+        queryset = queryset.filter(categories | matches)
+    else:
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        vector = pg_vector(table)
+        queryset = queryset.filter(
+            categories
+            | Q(RawSQL(f"{vector} @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField()))
+        )
+        ranks = [RawSQL(f"ts_rank({vector}, to_tsquery('simple', %s))", [tsquery], output_field=FloatField())]
+
+    if ranked:
+        queryset = queryset.annotate(search_rank=Coalesce(*ranks, Value(0.0))).order_by(
+            F('search_rank').desc(), '-date', '-created_at'
+        )
+    return queryset
@@ -1,8 +1,217 @@
+import decimal
+from datetime import timedelta
+
+from django.db.models import Max
 from rest_framework import serializers
-from .models import Transaction
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+from .instrumentation import serializer_timer
+from .models import Budget, Job, RecurringTransaction, Transaction
+from . import recurring
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
 
 class TransactionSerializer(serializers.ModelSerializer):
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
     class Meta:
         model = Transaction
-        fields = ['id', 'user', 'type', 'category', 'amount', 'description', 'date', 'created_at']
-        read_only_fields = ['id', 'user', 'created_at']  # User is set automatically, not from request
\ No newline at end of file
+        list_serializer_class = TimedListSerializer
+        fields = [
+            'id', 'user', 'type', 'category', 'amount', 'description', 'date', 'recurrence', 'created_at', 'updated_at',
+        ]
+        # User is set automatically, recurrence by the materializer, not from request
+        read_only_fields = ['id', 'user', 'recurrence', 'created_at', 'updated_at']
+        # The (recurrence, date) key only concerns the materializer, the API never sets recurrence
+        validators = []
+
+
+def _field_encoder(field):
+    """
+    A function giving field.to_representation(value) for the plain values a
+    values() query returns, with the per-call setup DRF repeats done once.
+    """
+    if isinstance(field, serializers.DecimalField):
+        coerce = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if field.decimal_places is None or not coerce or field.normalize_output or field.localize:
+            return field.to_representation
+        quantum = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+        return lambda value: f'{value.quantize(quantum, rounding=rounding, context=context):f}'
+
+    if isinstance(field, serializers.DateTimeField):
+        if getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+            return field.to_representation
+        zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+        def encode_datetime(value):
+            if zone is None or value.tzinfo is None:
+                return field.to_representation(value)
+            text = value.astimezone(zone).isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return encode_datetime
+
+    if isinstance(field, serializers.DateField):
+        if getattr(field, 'format', api_settings.DATE_FORMAT).lower() != ISO_8601:
+            return field.to_representation
+        return lambda value: value.isoformat()
+
+    if isinstance(field, (serializers.CharField, serializers.ChoiceField, serializers.IntegerField,
+                          serializers.PrimaryKeyRelatedField)):
+        # Stored strings, choice keys and integer ids are already their representation
+        return None
+    return field.to_representation
+
+
+class TransactionRowSerializer:
+    """
+    Read-only fast path for lists: serializes values() rows into exactly the
+    dicts TransactionSerializer builds from model instances, for all fields
+    or a sparse subset (?fields=), in TransactionSerializer's field order.
+    """
+
+    # Always fetched: the keyset paginator builds its cursor from them
+    POSITION_FIELDS = ('id', 'date', 'created_at')
+
+    def __init__(self, fields=None):
+        declared = TransactionSerializer().fields
+        names = list(TransactionSerializer.Meta.fields)
+        if fields is not None:
+            unknown = sorted(set(fields) - set(names))
+            if unknown:
+                raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(names)}")
+            names = [name for name in names if name in fields]
+        self.encoders = [(name, _field_encoder(declared[name])) for name in names]
+        self.columns = names + [name for name in self.POSITION_FIELDS if name not in names]
+
+    @classmethod
+    def from_params(cls, params):
+        """Serializer for ?fields=a,b (all fields when absent); raises ValueError for unknown names"""
+        fields = params.get('fields', None)
+        if fields is None:
+            return cls()
+        return cls([name.strip() for name in fields.split(',') if name.strip()])
+
+    def serialize(self, rows):
+        encoders = self.encoders
+        results = []
+        with serializer_timer():
+            for row in rows:
+                item = {}
+                for name, encode in encoders:
+                    value = row[name]
+                    # None stays None, as Serializer.to_representation never calls the field for it
+                    item[name] = value if encode is None or value is None else encode(value)
+                results.append(item)
+        return results
+
+
+class JobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'params', 'processed', 'total', 'result', 'error',
+            'created_at', 'started_at', 'finished_at', 'download_url',
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, job):
+        if job.status != 'succeeded' or not job.artifact:
+            return None
+        path = f'/api/jobs/{job.pk}/download/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+
+
+class BudgetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Budget
+        fields = ['id', 'category', 'period', 'amount', 'alert_threshold', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Must be greater than zero.')
+        return value
+
+    def validate_alert_threshold(self, value):
+        if not 1 <= value <= 100:
+            raise serializers.ValidationError('Must be a percentage between 1 and 100.')
+        return value
+
+    def validate(self, attrs):
+        # One budget per category and period; the user is not a serializer field
+        category = attrs.get('category', getattr(self.instance, 'category', None))
+        period = attrs.get('period', getattr(self.instance, 'period', 'month'))
+        others = Budget.objects.filter(user_id=self.context['request'].user.id, category=category, period=period)
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise self.duplicate(attrs)
+        return attrs
+
+    def duplicate(self, attrs):
+        """The error validate() raises for a second budget on the same category and period"""
+        category = attrs.get('category', getattr(self.instance, 'category', None))
+        period = attrs.get('period', getattr(self.instance, 'period', 'month'))
+        return serializers.ValidationError(
+            {api_settings.NON_FIELD_ERRORS_KEY: [f'There is already a {period} budget for {category}.']}
+        )
+
+
+class RecurringTransactionSerializer(serializers.ModelSerializer):
+    # Changing any of these reschedules the template from its last materialized date
+    SCHEDULE_FIELDS = ('frequency', 'interval', 'start_date', 'end_date')
+
+    class Meta:
+        model = RecurringTransaction
+        fields = [
+            'id', 'type', 'category', 'amount', 'description', 'frequency', 'interval',
+            'start_date', 'end_date', 'next_date', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['id', 'next_date', 'created_at', 'updated_at']
+
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Must be at least 1.')
+        return value
+
+    def validate(self, attrs):
+        start = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start and end and end < start:
+            raise serializers.ValidationError({'end_date': ['Must not be before start_date.']})
+        return attrs
+
+    def create(self, validated_data):
+        template = RecurringTransaction(**validated_data)
+        template.next_date = recurring.next_date_on_or_after(template, template.start_date)
+        template.save()
+        return template
+
+    def update(self, instance, validated_data):
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        if set(validated_data) & set(self.SCHEDULE_FIELDS):
+            # Archived occurrences count too, or a reschedule would create them again
+            dates = [
+                occurrences.aggregate(last=Max('date'))['last']
+                for occurrences in (instance.occurrences, instance.archived_occurrences)
+            ]
+            last = max((day for day in dates if day is not None), default=None)
+            after = instance.start_date if last is None else max(instance.start_date, last + timedelta(days=1))
+            instance.next_date = recurring.next_date_on_or_after(instance, after)
+        instance.save()
+        return instance
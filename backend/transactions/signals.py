@@ -0,0 +1,30 @@
+# backend/transactions/signals.py
+from collections import namedtuple
+
+from django.dispatch import Signal
+
+# The fields derived data (rollups, caches, ...) depends on
+TransactionSnapshot = namedtuple(
+    'TransactionSnapshot', ['id', 'user_id', 'type', 'category', 'amount', 'date']
+)
+SNAPSHOT_FIELDS = TransactionSnapshot._fields
+
+
+def snapshot(txn):
+    # to_python() normalises values assigned as strings, e.g. date='2024-01-31'
+    meta = txn._meta
+    return TransactionSnapshot(*(
+        meta.get_field(field).to_python(getattr(txn, field)) for field in SNAPSHOT_FIELDS
+    ))
+
+
+# Sent once per write, or once per batch for bulk operations, inside the
+# writing DB transaction. `changes` is a list of (old, new) snapshots where
+# old is None for inserts and new is None for deletes.
+transactions_changed = Signal()
+
+
+def send_changes(changes):
+    if changes:
+        from .models import Transaction
+        transactions_changed.send(sender=Transaction, changes=changes)
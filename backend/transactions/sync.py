@@ -0,0 +1,171 @@
+# backend/transactions/sync.py
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AllTransaction, ChangeSequence, Transaction, TransactionTombstone
+from .signals import transactions_changed
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+# Ids per IN (...) list when stamping rows, well under SQLite's bound parameter limit
+STAMP_CHUNK_SIZE = 500
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenExpired(TokenError):
+    pass
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'TRANSACTION_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+# --- Change sequence ---------------------------------------------------------
+#
+# Positions are (change_seq, id) rather than (updated_at, id): a write that
+# stays open for a while can commit an updated_at older than a token already
+# handed out, but it cannot commit a change_seq lower than one already
+# visible, because the counter row stays locked until the writer commits.
+
+def next_seq(user_id):
+    """Bump the user's change counter and return the new value, call inside the writing transaction"""
+    quote = connection.ops.quote_name
+    table = quote(ChangeSequence._meta.db_table)
+    user, value = quote('user_id'), quote('value')
+    returning = f' RETURNING {value}' if connection.features.can_return_columns_from_insert else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user}, {value}) VALUES (%s, 1) '
+            f'ON CONFLICT ({user}) DO UPDATE SET {value} = {table}.{value} + 1{returning}',
+            [user_id],
+        )
+        if not returning:
+            cursor.execute(f'SELECT {value} FROM {table} WHERE {user} = %s', [user_id])
+        return cursor.fetchone()[0]
+
+
+def current_seq(user_id):
+    row = ChangeSequence.objects.filter(user_id=user_id).values_list('value', flat=True).first()
+    return row or 0
+
+
+@receiver(transactions_changed)
+def record_changes(sender, changes, **kwargs):
+    """Stamp written rows with the next change_seq and leave tombstones for deleted ones"""
+    written, deleted = defaultdict(list), defaultdict(list)
+    for old, new in changes:
+        if new is not None and new.id is not None:
+            written[new.user_id].append(new.id)
+        elif new is None and old.id is not None:
+            deleted[old.user_id].append(old.id)
+    now = timezone.now()
+    # Sorted users take the counter locks in the same order in every writer
+    for user_id in sorted(written.keys() | deleted.keys()):
+        seq = next_seq(user_id)
+        ids = written[user_id]
+        for offset in range(0, len(ids), STAMP_CHUNK_SIZE):
+            Transaction.objects.filter(id__in=ids[offset:offset + STAMP_CHUNK_SIZE]).update(change_seq=seq)
+        TransactionTombstone.objects.bulk_create([
+            TransactionTombstone(user_id=user_id, transaction_id=pk, deleted_at=now, change_seq=seq)
+            for pk in deleted[user_id]
+        ])
+
+
+# --- Tokens ------------------------------------------------------------------
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than the retention period, returns the number removed"""
+    cutoff = (now or timezone.now()) - retention()
+    deleted, _ = TransactionTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def encode_token(rows_position, tombstones_position, issued_at):
+    raw = [*rows_position, *tombstones_position, issued_at.isoformat()]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+
+
+def decode_token(token, now=None):
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if isinstance(raw, list) and len(raw) == 4:
+            # Issued before positions were change sequences, its updated_at positions mean nothing now
+            raise TokenExpired('Sync token expired, fetch everything again without since')
+        rows_seq, rows_id, tombs_seq, tombs_id, issued_at = raw
+        position = ((int(rows_seq), int(rows_id)), (int(tombs_seq), int(tombs_id)))
+        issued_at = datetime.fromisoformat(issued_at)
+        # encode_token() only writes aware datetimes, they cannot be compared with naive ones
+        if timezone.is_naive(issued_at):
+            raise ValueError('naive datetime')
+    except (TypeError, ValueError):
+        raise TokenError('Invalid sync token')
+    if issued_at < (now or timezone.now()) - retention():
+        # Tombstones this old may have been pruned, a delta could miss deletes
+        raise TokenExpired('Sync token expired, fetch everything again without since')
+    return position
+
+
+# --- Reads -------------------------------------------------------------------
+
+def _after(position):
+    seq, pk = position
+    return Q(change_seq__gt=seq) | Q(change_seq=seq, id__gt=pk)
+
+
+def _next_position(items, position, limit):
+    if len(items) > limit:
+        last = items[limit - 1]
+        return (last.change_seq, last.id), True
+    if items:
+        last = items[-1]
+        position = (last.change_seq, last.id)
+    return position, False
+
+
+def changes_since(user_id, token=None, limit=DEFAULT_LIMIT, now=None):
+    """
+    Rows created or updated and ids deleted after `token`, with the token to
+    continue from. Without a token every current row is returned (paged) and
+    no tombstones, which is how a client bootstraps. Rows are read through
+    AllTransaction, archived history is as much the user's data as hot rows.
+    A row changed again after a client fetched it comes back, so clients
+    must upsert by id.
+
+    Returns (rows, deleted_ids, next_token, has_more).
+    """
+    now = now or timezone.now()
+    if token:
+        rows_position, tombs_position = decode_token(token, now)
+    else:
+        # Read before the rows, anything committed after it is delivered as a delta
+        rows_position, tombs_position = (0, 0), (current_seq(user_id), 0)
+
+    rows = list(
+        AllTransaction.objects.filter(user_id=user_id)
+        .filter(_after(rows_position))
+        .order_by('change_seq', 'id')[:limit + 1]
+    )
+    tombstones = []
+    if token:
+        tombstones = list(
+            TransactionTombstone.objects.filter(user_id=user_id)
+            .filter(_after(tombs_position))
+            .order_by('change_seq', 'id')[:limit + 1]
+        )
+
+    rows_position, more_rows = _next_position(rows, rows_position, limit)
+    tombs_position, more_tombs = _next_position(tombstones, tombs_position, limit)
+    next_token = encode_token(rows_position, tombs_position, now)
+    deleted = [tombstone.transaction_id for tombstone in tombstones[:limit]]
+    return rows[:limit], deleted, next_token, more_rows or more_tombs
@@ -1,3 +1,1660 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from asgiref.sync import sync_to_async
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from google.auth import crypt, jwt
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import archive, benchmarking, budgets, caching, jobs, recurring, rollups, search, timeseries
+from .aggregation import breakdown, summarize
+from .authentication import user_cache
+from .filters import filter_transactions
+from .google_auth import GoogleTokenVerifier
+from .instrumentation import registry
+from .models import AllTransaction, ArchivedTransaction, Budget, Job, RecurringTransaction, Transaction, TransactionTombstone
+from .serializers import BudgetSerializer, TransactionRowSerializer, TransactionSerializer
+from .search import apply_search
+from .usernames import UsernameTaken, create_user, create_user_with_free_username, next_free_username
+
+
+def seed_transactions(user, count, start=date(2024, 1, 1)):
+    """Insert `count` transactions for `user` spread over consecutive days"""
+    categories = [choice for choice, _ in Transaction.CATEGORY_CHOICES]
+    Transaction.objects.bulk_create(
+        [
+            Transaction(
+                user=user,
+                type='income' if i % 5 == 0 else 'expense',
+                category=categories[i % len(categories)],
+                amount=Decimal('12.50') + i % 100,
+                description=f'transaction {i}',
+                date=start + timedelta(days=i % 365),
+            )
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+
+
+class TransactionsAPITestCase(APITestCase):
+    def setUp(self):
+        # User ids are reused between tests, so cached responses must not leak across them
+        caches['transactions'].clear()
+        user_cache.clear()
+
+
+class ExportCsvTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='exporter', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def _consume(self, response):
+        """Read a streaming response without keeping it in memory, return its size"""
+        return sum(len(block) for block in response.streaming_content)
+
+    def test_columns_and_filters_match_previous_layout(self):
+        Transaction.objects.create(
+            user=self.user, type='expense', category='food', amount=Decimal('9.99'),
+            description='Lunch, with "quotes"', date=date(2024, 3, 1),
+        )
+        Transaction.objects.create(
+            user=self.user, type='income', category='salary', amount=Decimal('1000.00'),
+            date=date(2024, 2, 1),
+        )
+
+        response = self.client.get('/api/transactions/export_csv/', {'type': 'expense'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows, [
+            ['Date', 'Type', 'Category', 'Amount', 'Description'],
+            ['2024-03-01', 'Expense', 'Food', '9.99', 'Lunch, with "quotes"'],
+        ])
+
+    def test_gzip_export(self):
+        seed_transactions(self.user, 50)
+
+        response = self.client.get('/api/transactions/export_csv/', {'compress': 'gzip'})
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual(len(content.splitlines()), 51)
+
+    def test_peak_memory_is_flat_as_rows_grow(self):
+        def peak_for(count):
+            Transaction.objects.all().delete()
+            seed_transactions(self.user, count)
+            tracemalloc.start()
+            try:
+                response = self.client.get('/api/transactions/export_csv/')
+                size = self._consume(response)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            return size, peak
+
+        small_size, small_peak = peak_for(5000)
+        large_size, large_peak = peak_for(25000)
+
+        # Five times the data must not cost anywhere near five times the memory
+        self.assertGreater(large_size, 4 * small_size)
+        self.assertLess(large_peak, 1.5 * small_peak)
+
+
+class ImportTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='importer', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def test_export_output_imports_back(self):
+        seed_transactions(self.user, 30)
+        exported = b''.join(self.client.get('/api/transactions/export_csv/').streaming_content)
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_authenticate(other)
+
+        response = self.client.post(
+            '/api/transactions/import/?batch_size=7', data=exported, content_type='text/csv'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 30)
+        fields = ('date', 'type', 'category', 'amount', 'description')
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=other).values_list(*fields)),
+            sorted(Transaction.objects.filter(user=self.user).values_list(*fields)),
+        )
+
+    def test_invalid_row_rolls_back_unless_partial(self):
+        rows = [
+            {'date': '2024-01-01', 'amount': '5.00'},
+            {'date': 'not a date', 'amount': 'abc', 'type': 'refund'},
+        ]
+
+        response = self.client.post('/api/transactions/import/', rows, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(set(response.data['errors'][0]['errors']), {'date', 'amount', 'type'})
+        self.assertFalse(Transaction.objects.exists())
+
+        response = self.client.post('/api/transactions/import/?partial=true', rows, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(Transaction.objects.get().type, 'expense')
+
+    def test_bad_batch_size_and_unreadable_csv_are_rejected(self):
+        rows = [{'date': '2024-01-01', 'amount': '5.00'}]
+        for batch_size in ('-5', '0', 'ten'):
+            response = self.client.post(f'/api/transactions/import/?batch_size={batch_size}', rows, format='json')
+            self.assertEqual(response.status_code, 400, batch_size)
+
+        header = b'Date,Type,Category,Amount,Description\n'
+        good = b'2024-01-01,Expense,Food,5.00,lunch\n'
+        for body, row in [
+            (header + good + b'2024-01-02,Expense,Food,6.00,caf\xe9\n', 2),
+            (header + good * 2 + b'2024-01-03,Expense,Food,7.00,"' + b'x' * 200000 + b'"\n', 3),
+        ]:
+            response = self.client.post(
+                '/api/transactions/import/?batch_size=1', data=body, content_type='text/csv'
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['row'], row)
+        self.assertFalse(Transaction.objects.exists())
+
+
+class FilterTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='filterer', password='pass12345')
+        self.client.force_authenticate(self.user)
+        seed_transactions(self.user, 100)
+        seed_transactions(User.objects.create_user(username='bystander', password='pass12345'), 20)
+
+    def test_params_narrow_the_results(self):
+        mine = Transaction.objects.filter(user=self.user)
+        for params, expected in [
+            ({}, mine),
+            ({'type': 'income'}, mine.filter(type='income')),
+            ({'category': 'food'}, mine.filter(category='food')),
+            ({'start_date': '2024-02-01', 'end_date': '2024-02-29'}, mine.filter(date__month=2)),
+            ({'type': 'expense', 'category': 'bills', 'end_date': '2024-03-01'},
+             mine.filter(type='expense', category='bills', date__lte=date(2024, 3, 1))),
+        ]:
+            response = self.client.get('/api/transactions/', {**params, 'page_size': 100})
+            self.assertEqual(response.data['count'], expected.count(), params)
+            self.assertEqual(
+                {row['id'] for row in response.data['results']}, set(expected.values_list('id', flat=True)), params
+            )
+            if params:
+                self.assertLess(expected.count(), 100, params)
+
+    def test_explain_shows_the_composite_indexes(self):
+        out = io.StringIO()
+        call_command('explain_transactions', '--user', str(self.user.id), stdout=out)
+        plans = out.getvalue()
+        self.assertIn('Database vendor: sqlite', plans)
+        # Listing pages walk (user, -date, -created_at) instead of sorting
+        first_page = plans.split('== list')[1].split('-- count')[0]
+        self.assertIn('txn_user_date_created_idx', first_page)
+        self.assertNotIn('TEMP B-TREE', first_page)
+
+
+class PaginationTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='pager', password='pass12345')
+        self.client.force_authenticate(self.user)
+        seed_transactions(self.user, 30, start=date(2024, 6, 1))
+        # Ties on (date, created_at) leave only the id to order by
+        Transaction.objects.filter(date__lte=date(2024, 6, 3)).update(date=date(2024, 6, 1))
+        Transaction.objects.update(created_at=timezone.now())
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_cursor_pages_continue_across_ties(self):
+        expected = list(Transaction.objects.order_by('-date', '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk('/api/transactions/?pagination=cursor&page_size=4'), expected)
+        # Any ?ordering= but relevance is ignored, keyset pages keep their own order
+        self.assertEqual(self.walk('/api/transactions/?pagination=cursor&page_size=7&ordering=amount'), expected)
+
+        response = self.client.get('/api/transactions/', {'pagination': 'cursor', 'ordering': 'relevance'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('not-base64!', base64.urlsafe_b64encode(b'[1, 2]').decode(),
+                       base64.urlsafe_b64encode(b'["2024-01-01", "yesterday", 1]').decode()):
+            self.assertEqual(self.client.get('/api/transactions/', {'cursor': cursor}).status_code, 404, cursor)
+
+    def test_cursor_with_a_naive_created_at_is_a_bad_request(self):
+        cursor = base64.urlsafe_b64encode(b'["2024-01-01", "2024-01-01T00:00:00", 1]').decode()
+        response = self.client.get('/api/transactions/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+    def test_page_size_cap_and_count(self):
+        seed_transactions(self.user, 120)
+        response = self.client.get('/api/transactions/', {'pagination': 'cursor', 'page_size': 500})
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(self.client.get('/api/transactions/', {'page_size': 500}).data['results']), 100)
+
+        response = self.client.get(
+            '/api/transactions/', {'pagination': 'cursor', 'page_size': 10, 'include_count': 'true'}
+        )
+        self.assertEqual(response.data['count'], 150)
+        # Only the first page pays for the count
+        self.assertNotIn('include_count', response.data['next'])
+        self.assertNotIn('count', self.client.get(response.data['next']).data)
+
+
+class SearchTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='searcher', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def _search(self, term, **params):
+        response = self.client.get('/api/transactions/', {'search': term, **params})
+        return [row['description'] for row in response.data['results']]
+
+    def test_prefix_and_category_matches(self):
+        Transaction.objects.create(user=self.user, amount=1, date=date(2024, 1, 1), description='Uber ride home')
+        Transaction.objects.create(
+            user=self.user, amount=1, date=date(2024, 1, 2), description='Naivas', category='food'
+        )
+
+        self.assertEqual(self._search('ube'), ['Uber ride home'])
+        self.assertEqual(self._search('foo'), ['Naivas'])
+        self.assertEqual(self._search('ride ho'), ['Uber ride home'])
+
+    def test_index_follows_bulk_and_queryset_writes(self):
+        def search(term, ranked=False):
+            queryset = apply_search(Transaction.objects.filter(user=self.user), term, ranked=ranked)
+            return list(queryset.values_list('description', flat=True))
+
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, amount=1, date=date(2024, 1, 1), description='uber eats'),
+            Transaction(user=self.user, amount=1, date=date(2024, 1, 2), description='uber uber pool'),
+        ])
+        self.assertEqual(search('uber', ranked=True), ['uber uber pool', 'uber eats'])
+
+        Transaction.objects.filter(description='uber eats').update(description='matatu')
+        self.assertEqual(search('uber'), ['uber uber pool'])
+
+        Transaction.objects.filter(description='uber uber pool').delete()
+        self.assertEqual(search('uber'), [])
+
+    def test_archived_rows_match_like_hot_ones(self):
+        for day, description in enumerate(['Café latte', 'uber uber pool', 'uber eats', 'Groceries', 'Tuber'], 1):
+            Transaction.objects.create(user=self.user, amount=1, date=date(2024, 1, day), description=description)
+        # Word prefixes, diacritics and relevance, which the icontains fallback would get wrong
+        queries = [('uber', {'ordering': 'relevance'}), ('cafe', {}), ('ocer', {}), ('uber', {})]
+        queries = [(term, {'start_date': '2024-01-01', **params}) for term, params in queries]
+        expected = [self._search(term, **params) for term, params in queries]
+        self.assertEqual(expected, [
+            ['uber uber pool', 'uber eats'], ['Café latte'], [], ['uber eats', 'uber uber pool'],
+        ])
+
+        archive.archive(date(2024, 1, 4))
+        self.assertEqual(search.get_backend('default', search.TABLES), search.get_backend('default'))
+        self.assertEqual([self._search(term, **params) for term, params in queries], expected)
+        self.assertEqual(list(apply_search(
+            AllTransaction.objects.filter(user=self.user), 'eats'
+        ).values_list('description', flat=True)), ['uber eats'])
+        archive.restore(ArchivedTransaction.objects.all())
+        self.assertEqual([self._search(term, **params) for term, params in queries], expected)
+
+
+class SummaryTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='summer', password='pass12345')
+        self.client.force_authenticate(self.user)
+        for txn_type, category, amount, day in [
+            ('income', 'salary', '1000.00', date(2024, 1, 25)),
+            ('expense', 'food', '12.50', date(2024, 1, 3)),
+            ('expense', 'food', '7.25', date(2024, 2, 4)),
+            ('expense', 'bills', '80.00', date(2024, 2, 1)),
+            ('income', 'other', '20.00', date(2024, 2, 9)),
+        ]:
+            Transaction.objects.create(
+                user=self.user, type=txn_type, category=category, amount=Decimal(amount), date=day
+            )
+
+    def test_totals_come_from_conditional_aggregates(self):
+        self.assertEqual(summarize(Transaction.objects.filter(user=self.user)), {
+            'total_income': Decimal('1020.00'), 'total_expense': Decimal('99.75'),
+            'balance': Decimal('920.25'), 'count': 5,
+        })
+        self.assertEqual(summarize(Transaction.objects.none()), {
+            'total_income': Decimal('0.00'), 'total_expense': Decimal('0.00'), 'balance': Decimal('0.00'), 'count': 0,
+        })
+
+    def test_breakdown_has_one_row_per_group(self):
+        queryset = Transaction.objects.filter(user=self.user)
+        self.assertEqual(breakdown(queryset, 'category'), [
+            {'category': 'bills', 'total_income': Decimal('0.00'), 'total_expense': Decimal('80.00'),
+             'balance': Decimal('-80.00'), 'count': 1},
+            {'category': 'food', 'total_income': Decimal('0.00'), 'total_expense': Decimal('19.75'),
+             'balance': Decimal('-19.75'), 'count': 2},
+            {'category': 'other', 'total_income': Decimal('20.00'), 'total_expense': Decimal('0.00'),
+             'balance': Decimal('20.00'), 'count': 1},
+            {'category': 'salary', 'total_income': Decimal('1000.00'), 'total_expense': Decimal('0.00'),
+             'balance': Decimal('1000.00'), 'count': 1},
+        ])
+        by_month = breakdown(queryset, 'month')
+        self.assertEqual([row['month'] for row in by_month], [date(2024, 1, 1), date(2024, 2, 1)])
+        self.assertEqual([row['balance'] for row in by_month], [Decimal('987.50'), Decimal('-67.25')])
+
+        # ?search keeps the request on the raw-row path
+        response = self.client.get('/api/transactions/summary/', {'group_by': 'type', 'search': 'food'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [(row['type'], row['total_expense']) for row in response.data['breakdown']],
+            [('expense', Decimal('19.75'))],
+        )
+
+    def test_unknown_group_by_is_rejected(self):
+        for params in ({'group_by': 'bogus'}, {'group_by': 'bogus', 'search': 'food'}):
+            response = self.client.get('/api/transactions/summary/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('group_by must be one of', response.data['error'])
+
+
+class RollupTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='rollup', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def test_rollups_follow_every_write_path(self):
+        seed_transactions(self.user, 10)  # bulk_create bypasses save(), rebuild covers it
+        rollups.rebuild([self.user.id])
+        txn = Transaction.objects.create(
+            user=self.user, amount=Decimal('5.00'), date=date(2024, 1, 31), category='food'
+        )
+        # Move the row to another month and category
+        self.client.patch(
+            f'/api/transactions/{txn.id}/', {'date': '2024-02-01', 'category': 'bills'}, format='json'
+        )
+        self.client.delete(f'/api/transactions/{Transaction.objects.last().id}/')
+        self.client.post(
+            '/api/transactions/import/', [{'date': '2024-03-15', 'amount': '7.25'}], format='json'
+        )
+
+        self.assertEqual(rollups.verify([self.user.id]), {})
+
+    def test_summary_from_rollups_matches_raw_aggregation(self):
+        seed_transactions(self.user, 400)
+        rollups.rebuild([self.user.id])
+
+        for params in [
+            {},
+            {'start_date': '2024-02-10', 'end_date': '2024-09-30'},
+            {'start_date': '2024-03-01', 'type': 'expense'},
+            {'end_date': '2024-05-17', 'category': 'food'},
+            {'start_date': '2024-04-03', 'end_date': '2024-04-20'},
+        ]:
+            for group_by in (None, 'category', 'type', 'month'):
+                queryset = filter_transactions(Transaction.objects.filter(user=self.user), params)
+                expected = breakdown(queryset, group_by) if group_by else summarize(queryset)
+                self.assertEqual(rollups.summarize_user(self.user.id, params, group_by), expected)
+
+
+class BatchMutationTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='batcher', password='pass12345')
+        self.other = User.objects.create_user(username='bystander', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def add(self, user, description, category='other', amount='10.00', day=date(2024, 3, 1)):
+        return Transaction.objects.create(
+            user=user, description=description, category=category, amount=Decimal(amount), date=day
+        )
+
+    def batch(self, *operations):
+        return self.client.post('/api/transactions/batch/', {'operations': list(operations)}, format='json')
+
+    def test_operations_apply_in_order_and_keep_derived_data_in_step(self):
+        rides = [self.add(self.user, f'Uber ride {i}') for i in range(3)]
+        lunch = self.add(self.user, 'Lunch', category='food')
+        coffee = self.add(self.user, 'Coffee', category='food')
+        theirs = self.add(self.other, 'Uber ride')
+        before = Transaction.objects.get(pk=lunch.pk).updated_at
+        invalidations = caching.stats.as_dict()['invalidations']
+
+        response = self.batch(
+            {'op': 'update', 'filter': {'search': 'uber'}, 'data': {'category': 'transport'}},
+            {'op': 'update', 'id': lunch.pk, 'data': {'amount': '12.50', 'date': '2024-04-02'}},
+            {'op': 'delete', 'id': rides[0].pk},
+            {'op': 'delete', 'id': theirs.pk},
+            {'op': 'delete', 'filter': {'category': 'food', 'search': 'coffee'}},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['status'], r['count']) for r in response.data['results']], [
+            ('updated', 3), ('updated', 1), ('deleted', 1), ('not_found', 0), ('deleted', 1),
+        ])
+        self.assertEqual((response.data['updated'], response.data['deleted']), (3, 2))
+        self.assertEqual(
+            set(Transaction.objects.filter(user=self.user, category='transport').values_list('id', flat=True)),
+            {rides[1].pk, rides[2].pk},
+        )
+        lunch.refresh_from_db()
+        self.assertEqual((lunch.amount, lunch.date), (Decimal('12.50'), date(2024, 4, 2)))
+        self.assertGreater(lunch.updated_at, before)
+        self.assertFalse(Transaction.objects.filter(pk__in=[rides[0].pk, coffee.pk]).exists())
+        self.assertEqual(Transaction.objects.get(pk=theirs.pk).category, 'other')
+        self.assertEqual(
+            set(TransactionTombstone.objects.values_list('transaction_id', flat=True)), {rides[0].pk, coffee.pk}
+        )
+        self.assertEqual(rollups.verify([self.user.id, self.other.id]), {})
+        # One cache invalidation for the whole batch
+        self.assertEqual(caching.stats.as_dict()['invalidations'], invalidations + 1)
+
+    def test_query_count_does_not_grow_with_matched_rows(self):
+        # Counter upserts scale with the (month, category, type) buckets touched, keep every row in one
+        def recategorize(count, category):
+            Transaction.objects.bulk_create(
+                [Transaction(user=self.user, description=f'Move to {category}', amount=Decimal('5.00'), date=date(2024, 2, 3))
+                 for i in range(count)]
+            )
+            rollups.rebuild([self.user.id])
+            budgets.rebuild([self.user.id])
+            with CaptureQueriesContext(connection) as context:
+                response = self.batch(
+                    {'op': 'update', 'filter': {'search': f'to {category}'}, 'data': {'category': category}},
+                )
+            self.assertEqual(response.data['updated'], count)
+            return len(context)
+
+        small = recategorize(20, 'bills')
+        self.assertEqual(recategorize(300, 'health'), small)
+
+    def test_invalid_operations_change_nothing(self):
+        txn = self.add(self.user, 'Keep me')
+        response = self.batch(
+            {'op': 'delete', 'id': txn.pk},
+            {'op': 'update', 'id': txn.pk, 'data': {'amount': 'lots'}},
+            {'op': 'update', 'filter': {}, 'data': {'category': 'food'}},
+            {'op': 'update', 'id': txn.pk, 'data': {'user': self.other.pk}},
+            {'op': 'merge', 'id': txn.pk},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3, 4])
+        self.assertTrue(Transaction.objects.filter(pk=txn.pk).exists())
+        self.assertEqual(self.client.post('/api/transactions/batch/', [], format='json').status_code, 400)
+
+
+class BudgetTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='budgeter', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def spend(self, amount, day, category='food', txn_type='expense'):
+        return Transaction.objects.create(
+            user=self.user, type=txn_type, category=category, amount=Decimal(amount), date=day
+        )
+
+    def test_counters_follow_every_write_path(self):
+        seed_transactions(self.user, 60)  # bulk_create bypasses save(), rebuild covers it
+        budgets.rebuild([self.user.id])
+        txn = self.spend('5.00', date(2024, 1, 31))
+        self.client.patch(f'/api/transactions/{txn.id}/', {'date': '2024-02-01', 'type': 'income'}, format='json')
+        self.client.patch(f'/api/transactions/{txn.id}/', {'type': 'expense', 'category': 'bills'}, format='json')
+        self.client.delete(f'/api/transactions/{Transaction.objects.last().id}/')
+        self.client.post('/api/transactions/import/', [{'date': '2024-03-15', 'amount': '7.25'}], format='json')
+        self.client.post('/api/transactions/batch/', {'operations': [
+            {'op': 'update', 'filter': {'category': 'food'}, 'data': {'amount': '1.00'}},
+            {'op': 'delete', 'filter': {'category': 'shopping'}},
+        ]}, format='json')
+
+        self.assertEqual(budgets.verify([self.user.id]), {})
+        call_command('reconcile_budgets', '--verify', '--user', str(self.user.id), stdout=io.StringIO())
+
+    def test_status_reports_spend_for_the_current_period(self):
+        monthly = self.client.post(
+            '/api/budgets/', {'category': 'food', 'amount': '100.00'}, format='json'
+        )
+        self.assertEqual(monthly.status_code, 201)
+        self.client.post('/api/budgets/', {'category': 'transport', 'period': 'week', 'amount': '20.00'}, format='json')
+        duplicate = self.client.post('/api/budgets/', {'category': 'food', 'amount': '50.00'}, format='json')
+        self.assertEqual(duplicate.status_code, 400)
+
+        self.spend('45.00', date(2024, 5, 2))
+        self.spend('40.00', date(2024, 5, 30))
+        self.spend('99.00', date(2024, 4, 30))  # previous month
+        self.spend('500.00', date(2024, 5, 3), txn_type='income')
+        self.spend('25.00', date(2024, 5, 13), category='transport')  # Monday
+        self.spend('9.00', date(2024, 5, 12), category='transport')  # the week before
+
+        with self.assertNumQueries(2):
+            status = budgets.status(self.user.id, date(2024, 5, 15))
+        by_category = {row['category']: row for row in status}
+        self.assertEqual(
+            {key: by_category['food'][key] for key in ('state', 'spent', 'remaining', 'period_start', 'period_end')},
+            {'state': 'warning', 'spent': Decimal('85.00'), 'remaining': Decimal('15.00'),
+             'period_start': date(2024, 5, 1), 'period_end': date(2024, 5, 31)},
+        )
+        self.assertEqual(
+            (by_category['transport']['state'], by_category['transport']['spent'], by_category['transport']['period_end']),
+            ('exceeded', Decimal('25.00'), date(2024, 5, 19)),
+        )
+
+        response = self.client.get('/api/budgets/status/', {'date': '2024-06-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['state'] for row in response.data], ['ok', 'ok'])
+        self.assertEqual(self.client.get('/api/budgets/status/', {'date': 'soon'}).status_code, 400)
+
+        other = User.objects.create_user(username='stranger', password='pass12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/budgets/status/').data, [])
+        self.assertEqual(self.client.get(f"/api/budgets/{monthly.data['id']}/").status_code, 404)
+
+    def test_duplicates_that_slip_past_validation_are_rejected(self):
+        food = self.client.post('/api/budgets/', {'category': 'food', 'amount': '100.00'}, format='json')
+        weekly = self.client.post('/api/budgets/', {'category': 'food', 'period': 'week', 'amount': '20.00'}, format='json')
+        expected = self.client.post('/api/budgets/', {'category': 'food', 'amount': '50.00'}, format='json').data
+
+        # A concurrent request saving between validate() and the INSERT hits the unique constraint instead
+        with mock.patch.object(BudgetSerializer, 'validate', lambda serializer, attrs: attrs):
+            created = self.client.post('/api/budgets/', {'category': 'food', 'amount': '50.00'}, format='json')
+            updated = self.client.patch(f"/api/budgets/{weekly.data['id']}/", {'period': 'month'}, format='json')
+        self.assertEqual((created.status_code, created.data), (400, expected))
+        self.assertEqual((updated.status_code, updated.data), (400, expected))
+        self.assertEqual(Budget.objects.get(pk=weekly.data['id']).period, 'week')
+        self.assertEqual(list(Budget.objects.filter(user=self.user).values_list('pk', flat=True).order_by('pk')),
+                         [food.data['id'], weekly.data['id']])
+
+
+class RecurringTransactionTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='regular', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def template(self, **fields):
+        response = self.client.post('/api/recurring/', {'amount': '100.00', **fields}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return RecurringTransaction.objects.get(pk=response.data['id'])
+
+    def materialize(self, day, *args):
+        out = io.StringIO()
+        call_command('materialize_recurring', '--date', day, *args, stdout=out)
+        return out.getvalue()
+
+    def test_schedules_keep_the_day_of_month(self):
+        def dates(count, **fields):
+            template = RecurringTransaction(interval=1, **fields)
+            return [recurring.occurrence(template, index) for index in range(count)]
+
+        self.assertEqual(
+            dates(4, frequency='monthly', start_date=date(2024, 1, 31)),
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)],
+        )
+        self.assertEqual(dates(2, frequency='yearly', start_date=date(2024, 2, 29))[1], date(2025, 2, 28))
+        template = RecurringTransaction(frequency='weekly', interval=2, start_date=date(2024, 1, 1))
+        self.assertEqual(recurring.next_date_on_or_after(template, date(2024, 1, 2)), date(2024, 1, 15))
+        template = RecurringTransaction(frequency='monthly', interval=1, start_date=date(2024, 1, 31))
+        self.assertEqual(recurring.next_date_on_or_after(template, date(2024, 4, 1)), date(2024, 4, 30))
+
+    def test_materializer_is_idempotent(self):
+        salary = self.template(type='income', category='salary', start_date='2024-01-25', amount='3000.00')
+        rent = self.template(category='bills', frequency='weekly', interval=2, start_date='2024-01-01',
+                             end_date='2024-02-28')
+        other = User.objects.create_user(username='irregular', password='pass12345')
+        RecurringTransaction.objects.create(
+            user=other, amount=Decimal('9.99'), category='entertainment', frequency='monthly',
+            start_date=date(2024, 1, 5), next_date=date(2024, 1, 5),
+        )
+
+        output = self.materialize('2024-03-31', '--chunk-size', '1')
+        self.assertIn('Materialized 11 transaction(s) from 3 template(s)', output)
+        self.assertEqual(
+            list(salary.occurrences.order_by('date').values_list('date', flat=True)),
+            [date(2024, 1, 25), date(2024, 2, 25), date(2024, 3, 25)],
+        )
+        self.assertEqual(rent.occurrences.count(), 5)  # Jan 1 to Feb 26, then the schedule ends
+        rent.refresh_from_db()
+        salary.refresh_from_db()
+        self.assertEqual((rent.next_date, salary.next_date), (None, date(2024, 4, 25)))
+        self.assertEqual(rollups.verify([self.user.id, other.id]), {})
+        self.assertEqual(budgets.verify([self.user.id, other.id]), {})
+
+        self.assertIn('Materialized 0 transaction(s)', self.materialize('2024-03-31'))
+        # A lost next_date update (e.g. a crash after commit) cannot duplicate rows
+        RecurringTransaction.objects.update(next_date=date(2024, 1, 1))
+        self.materialize('2024-04-30')
+        self.assertEqual(salary.occurrences.count(), 4)
+        self.assertEqual(rent.occurrences.count(), 5)
+        self.assertEqual(Transaction.objects.count(), 13)
+        self.assertEqual(rollups.verify([self.user.id, other.id]), {})
+
+    def test_rescheduling_continues_after_the_last_occurrence(self):
+        template = self.template(category='bills', start_date='2024-01-10')
+        self.materialize('2024-02-15')
+        response = self.client.patch(f'/api/recurring/{template.id}/', {'frequency': 'weekly'}, format='json')
+        self.assertEqual(response.data['next_date'], '2024-02-14')
+        response = self.client.patch(f'/api/recurring/{template.id}/', {'amount': '80.00'}, format='json')
+        self.assertEqual(response.data['next_date'], '2024-02-14')
+        bad = self.client.patch(f'/api/recurring/{template.id}/', {'end_date': '2023-12-31'}, format='json')
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/transactions/').data['results'][0]['recurrence'], template.id
+        )
+        self.assertEqual(recurring.user_ranges(date(2024, 3, 1), 4), [(self.user.id, self.user.id)])
+
+    def test_archived_and_concurrent_rows_are_not_created_or_counted_twice(self):
+        template = self.template(category='bills', start_date='2024-01-10')
+        self.materialize('2024-03-31')
+        archive.archive(date(2024, 3, 1))
+        template.refresh_from_db()
+        self.assertEqual(template.archived_occurrences.count(), 2)
+
+        # Moved back in time: the archived January and February rows are already there
+        RecurringTransaction.objects.filter(pk=template.pk).update(next_date=date(2024, 1, 10))
+        real_bulk_create = Transaction.objects.bulk_create
+
+        def racing_bulk_create(rows, **kwargs):
+            # Another writer inserts April's row between the existence check and the INSERT
+            Transaction.objects.create(
+                user=self.user, category='bills', amount=Decimal('100.00'), date=date(2024, 4, 10),
+                recurrence=template,
+            )
+            return real_bulk_create(rows, **kwargs)
+
+        with mock.patch.object(Transaction.objects, 'bulk_create', side_effect=racing_bulk_create):
+            output = self.materialize('2024-05-31')
+        self.assertIn('Materialized 1 transaction(s)', output)
+        self.assertEqual(
+            list(template.occurrences.order_by('date').values_list('date', flat=True)),
+            [date(2024, 3, 10), date(2024, 4, 10), date(2024, 5, 10)],
+        )
+        self.assertEqual(rollups.verify([self.user.id]), {})
+        self.assertEqual(budgets.verify([self.user.id]), {})
+
+
+class ArchiveTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='regular', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def archive(self, *args):
+        out = io.StringIO()
+        call_command('archive_transactions', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reads_include_the_archive_only_when_the_range_reaches_it(self):
+        seed_transactions(self.user, 365)  # one a day through 2024-12-30
+        rollups.rebuild([self.user.id])
+        budgets.rebuild([self.user.id])
+        ids = set(Transaction.objects.values_list('id', flat=True))
+        reads = [
+            ('/api/transactions/', {'page_size': 500, 'end_date': '2024-03-31'}),
+            ('/api/transactions/', {'page_size': 500, 'start_date': '2024-03-15', 'search': 'transaction 1'}),
+            ('/api/transactions/summary/', {}),
+            ('/api/transactions/summary/', {'start_date': '2024-03-15', 'group_by': 'category'}),
+            ('/api/transactions/timeseries/', {'interval': 'week', 'start_date': '2024-06-03', 'end_date': '2024-08-25'}),
+            ('/api/transactions/summary/', {'start_date': '2024-06-20', 'end_date': '2024-07-10'}),
+        ]
+        expected = [self.client.get(path, params).json() for path, params in reads]
+
+        output = self.archive('--before', '2024-07-01', '--batch-size', '50')
+        self.assertIn('Archived 182 transaction(s) dated before 2024-07-01', output)
+        self.assertIn('Archived 0 transaction(s)', self.archive('--before', '2024-07-01'))
+        self.assertEqual((Transaction.objects.count(), ArchivedTransaction.objects.count()), (183, 182))
+        archived_ids = set(ArchivedTransaction.objects.values_list('id', flat=True))
+        self.assertEqual(archived_ids | set(Transaction.objects.values_list('id', flat=True)), ids)
+
+        for (path, params), before in zip(reads, expected):
+            self.assertEqual(self.client.get(path, params).json(), before, (path, params))
+        with CaptureQueriesContext(connection) as context:
+            recent = self.client.get('/api/transactions/', {'start_date': '2024-08-01'})
+        self.assertEqual(recent.data['count'], 152)
+        self.assertFalse([query for query in context.captured_queries if archive.VIEW in query['sql']])
+
+        export = self.client.get('/api/transactions/export_csv/', {'start_date': '2024-06-15'})
+        self.assertEqual(len(b''.join(export.streaming_content).decode().splitlines()), 200)
+        archived = ArchivedTransaction.objects.first()
+        self.assertEqual(self.client.get(f'/api/transactions/{archived.id}/').data['id'], archived.id)
+        self.assertEqual(rollups.verify([self.user.id]), {})
+        self.assertEqual(budgets.verify([self.user.id]), {})
+
+    def test_open_ended_reads_stay_hot_until_keyset_pages_pass_the_archive(self):
+        seed_transactions(self.user, 120)  # one a day through 2024-04-29
+        expected = list(Transaction.objects.order_by('-date', '-created_at', '-id').values_list('id', flat=True))
+        archive.archive(date(2024, 3, 1))
+        # A row added later with an old date stays hot, but is paged in the archive's order
+        late = Transaction.objects.create(
+            user=self.user, type='expense', category='food', amount=Decimal('1.00'), date=date(2024, 2, 10)
+        )
+        expected.insert(expected.index(ArchivedTransaction.objects.get(date=date(2024, 2, 10)).id), late.id)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+        with CaptureQueriesContext(connection) as context:
+            default = self.client.get('/api/transactions/', {'page_size': 100})
+            export = b''.join(self.client.get('/api/transactions/export_csv/').streaming_content)
+            first = self.client.get('/api/transactions/', {'pagination': 'cursor', 'page_size': 50})
+        self.assertEqual(default.data['count'], 61)
+        self.assertEqual(len(export.decode().splitlines()), 62)
+        self.assertFalse([query for query in context.captured_queries if archive.VIEW in query['sql']])
+
+        for path in ('/api/transactions/', '/api/async/transactions/'):
+            ids, url = [], f'{path}?pagination=cursor&page_size=25&include_count=true'
+            while url:
+                response = self.client.get(url, **auth)
+                self.assertEqual(response.status_code, 200)
+                if 'include_count' in url:
+                    self.assertEqual(response.json()['count'], 121)
+                ids.extend(row['id'] for row in response.json()['results'])
+                url = response.json()['next']
+            self.assertEqual(ids, expected, path)
+        self.assertEqual([row['id'] for row in first.data['results']], expected[:50])
+
+        archived = ArchivedTransaction.objects.first()
+        self.assertEqual(self.client.get(f'/api/transactions/{archived.id}/').data['id'], archived.id)
+        self.assertEqual(self.client.get('/api/transactions/999999/').status_code, 404)
+
+    def test_writes_restore_archived_rows_first(self):
+        seed_transactions(self.user, 60)
+        rollups.rebuild([self.user.id])
+        budgets.rebuild([self.user.id])
+        archive.archive(date(2024, 2, 1), batch_size=7)
+        edited, deleted = ArchivedTransaction.objects.order_by('id')[:2]
+
+        response = self.client.patch(f'/api/transactions/{edited.id}/', {'amount': '1.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transaction.objects.get(pk=edited.id).amount, Decimal('1.00'))
+        self.assertEqual(self.client.delete(f'/api/transactions/{deleted.id}/').status_code, 204)
+        self.assertEqual(self.client.delete('/api/transactions/999999/').status_code, 404)
+        response = self.client.post('/api/transactions/batch/', {'operations': [
+            {'op': 'delete', 'filter': {'start_date': '2024-01-10', 'end_date': '2024-01-19'}},
+        ]}, format='json')
+        self.assertEqual(response.data['deleted'], 10)
+
+        self.assertFalse(ArchivedTransaction.objects.filter(id__in=[edited.id, deleted.id]).exists())
+        self.assertEqual(TransactionTombstone.objects.filter(transaction_id=deleted.id).count(), 1)
+        self.assertEqual(ArchivedTransaction.objects.count(), 31 - 2 - 10)
+        self.assertEqual(rollups.verify([self.user.id]), {})
+        self.assertEqual(budgets.verify([self.user.id]), {})
+
+        self.assertIn('Restored 19 transaction(s)', self.archive('--restore', '--before', '2024-01-01'))
+        self.assertEqual((Transaction.objects.count(), ArchivedTransaction.objects.count()), (49, 0))
+
+
+class TimeseriesTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='series', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def add(self, day, amount, type='expense', category='food'):
+        Transaction.objects.create(
+            user=self.user, type=type, category=category, amount=Decimal(amount), date=date.fromisoformat(day)
+        )
+
+    def test_buckets_are_gap_filled_per_type(self):
+        self.add('2024-01-05', '10.00')
+        self.add('2024-01-20', '5.50', category='transport')
+        self.add('2024-04-02', '1000.00', type='income', category='salary')
+
+        data = self.client.get('/api/transactions/timeseries/').json()
+        self.assertEqual(data['periods'], ['2024-01-01', '2024-02-01', '2024-03-01', '2024-04-01'])
+        self.assertEqual(data['series'], {'income': [0, 0, 0, 1000.0], 'expense': [15.5, 0, 0, 0]})
+
+        data = self.client.get('/api/transactions/timeseries/', {
+            'interval': 'week', 'metric': 'count', 'group_by': 'category',
+            'start_date': '2024-01-01', 'end_date': '2024-01-21',
+        }).json()
+        self.assertEqual(data['periods'], ['2024-01-01', '2024-01-08', '2024-01-15'])
+        self.assertEqual(data['series'], {'income': {}, 'expense': {'food': [1, 0, 0], 'transport': [0, 0, 1]}})
+
+    def test_rollup_series_matches_raw_rows(self):
+        seed_transactions(self.user, 500)
+        rollups.rebuild([self.user.id])
+        for params in [
+            {},
+            {'start_date': '2024-02-10', 'end_date': '2024-09-30', 'group_by': 'category'},
+            {'start_date': '2024-03-01', 'type': 'expense', 'metric': 'count'},
+            {'end_date': '2024-05-17', 'category': 'food'},
+            {'start_date': '2024-04-03', 'end_date': '2024-04-20'},
+        ]:
+            from_rollups = timeseries.timeseries(self.user.id, params)
+            with mock.patch.object(rollups, 'can_serve', return_value=False):
+                self.assertEqual(timeseries.timeseries(self.user.id, params), from_rollups, params)
+
+    def test_filters_and_errors(self):
+        self.add('2024-01-02', '3.00', category='food')
+        self.add('2024-01-03', '4.00', category='bills')
+        data = self.client.get('/api/transactions/timeseries/', {'interval': 'day', 'search': 'food'}).json()
+        self.assertEqual(data['series']['expense'], [3.0])
+
+        for params in [
+            {'interval': 'year'}, {'metric': 'avg'}, {'group_by': 'type'}, {'start_date': '2024-13-01'},
+            {'interval': 'day', 'start_date': '2000-01-01', 'end_date': '2030-01-01'},
+        ]:
+            response = self.client.get('/api/transactions/timeseries/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+
+class RowSerializerTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='rows', password='pass12345')
+        self.client.force_authenticate(self.user)
+        seed_transactions(self.user, 40)
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('0.10'), date=date(2024, 6, 1), description='',
+        )
+
+    def test_rows_render_byte_identical_to_the_model_serializer(self):
+        queryset = Transaction.objects.filter(user=self.user)
+        rows = TransactionRowSerializer()
+        expected = JSONRenderer().render(TransactionSerializer(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(rows.serialize(queryset.values(*rows.columns))), expected)
+
+        response = self.client.get('/api/transactions/', {'page_size': 100, 'type': 'expense'})
+        page = TransactionSerializer(queryset.filter(type='expense'), many=True).data
+        self.assertEqual(JSONRenderer().render(response.json()['results']), JSONRenderer().render(page))
+
+    def test_sparse_fieldsets(self):
+        response = self.client.get('/api/transactions/', {'fields': 'amount,id', 'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'amount'])
+        # The cursor still comes from (date, created_at, id), which were not requested
+        following = self.client.get(response.json()['next'])
+        self.assertEqual(list(following.json()['results'][0]), ['id', 'amount'])
+
+        response = self.client.get('/api/transactions/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown field(s): password', response.json()['error'])
+
+
+class ResponseCacheTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='cached', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def test_hits_until_a_write_bumps_the_generation(self):
+        Transaction.objects.create(user=self.user, amount=Decimal('10.00'), date=date(2024, 1, 1))
+
+        first = self.client.get('/api/transactions/summary/', {'type': '', 'category': ''})
+        second = self.client.get('/api/transactions/summary/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data['count'], 1)
+
+        self.client.post(
+            '/api/transactions/', {'amount': '5.00', 'date': '2024-01-02'}, format='json'
+        )
+        third = self.client.get('/api/transactions/summary/')
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.data['count'], 2)
+
+    def test_entries_are_per_user(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        Transaction.objects.create(user=other, amount=Decimal('10.00'), date=date(2024, 1, 1))
+        self.client.get('/api/transactions/')
+
+        self.client.force_authenticate(other)
+        response = self.client.get('/api/transactions/')
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 1)
+
+
+class ConditionalGetTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='etag', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.txn = Transaction.objects.create(user=self.user, amount=Decimal('10.00'), date=date(2024, 1, 1))
+
+    def test_not_modified_until_data_changes(self):
+        for url in ['/api/transactions/', '/api/transactions/summary/', f'/api/transactions/{self.txn.id}/']:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('Last-Modified', first)
+
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.status_code, 304)
+            self.assertEqual(again['ETag'], first['ETag'])
+
+    def test_etag_changes_on_edit_delete_and_filters(self):
+        etag = self.client.get('/api/transactions/')['ETag']
+        self.assertNotEqual(self.client.get('/api/transactions/', {'type': 'income'})['ETag'], etag)
+
+        self.client.patch(f'/api/transactions/{self.txn.id}/', {'description': 'edited'}, format='json')
+        edited = self.client.get('/api/transactions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited.status_code, 200)
+
+        Transaction.objects.create(user=self.user, amount=Decimal('1.00'), date=date(2023, 1, 1))
+        etag = self.client.get('/api/transactions/')['ETag']
+        # Deleting an older row leaves max(updated_at) alone, the row count still moves
+        self.client.delete(f'/api/transactions/{self.txn.id}/')
+        self.assertEqual(self.client.get('/api/transactions/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SyncTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='sync', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def _changes(self, since=None, **params):
+        if since:
+            params['since'] = since
+        return self.client.get('/api/transactions/changes/', params)
+
+    def test_delta_contains_only_churn(self):
+        keep = Transaction.objects.create(user=self.user, amount=Decimal('1.00'), date=date(2024, 1, 1))
+        doomed = Transaction.objects.create(user=self.user, amount=Decimal('2.00'), date=date(2024, 1, 2))
+        bootstrap = self._changes()
+        self.assertEqual({row['id'] for row in bootstrap.data['results']}, {keep.id, doomed.id})
+
+        self.client.patch(f'/api/transactions/{keep.id}/', {'description': 'edited'}, format='json')
+        self.client.delete(f'/api/transactions/{doomed.id}/')
+        added = Transaction.objects.create(user=self.user, amount=Decimal('3.00'), date=date(2024, 1, 3))
+        delta = self._changes(bootstrap.data['next_token'])
+
+        self.assertEqual(delta.status_code, 200)
+        self.assertEqual({row['id'] for row in delta.data['results']}, {keep.id, added.id})
+        self.assertEqual(delta.data['deleted'], [doomed.id])
+        self.assertFalse(delta.data['has_more'])
+
+        again = self._changes(delta.data['next_token'])
+        self.assertEqual((again.data['results'], again.data['deleted']), ([], []))
+
+    def test_rows_committed_with_an_old_updated_at_are_not_skipped(self):
+        Transaction.objects.create(user=self.user, amount=Decimal('2.00'), date=date(2024, 1, 2))
+        bootstrap = self._changes()
+        # A writer whose transaction opened before the token was issued commits after it
+        late = Transaction.objects.create(user=self.user, amount=Decimal('1.00'), date=date(2024, 1, 1))
+        Transaction.objects.filter(id=late.id).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        delta = self._changes(bootstrap.data['next_token'])
+        self.assertEqual([row['id'] for row in delta.data['results']], [late.id])
+
+    def test_bootstrap_includes_archived_rows(self):
+        old = Transaction.objects.create(user=self.user, amount=Decimal('1.00'), date=date(2020, 1, 1))
+        recent = Transaction.objects.create(user=self.user, amount=Decimal('2.00'), date=date(2024, 1, 1))
+        archive.archive(date(2023, 1, 1))
+        self.assertTrue(ArchivedTransaction.objects.filter(id=old.id).exists())
+
+        response = self._changes()
+        self.assertEqual({row['id'] for row in response.data['results']}, {old.id, recent.id})
+        self.assertFalse(response.data['has_more'])
+
+    def test_pages_with_limit(self):
+        seed_transactions(self.user, 5)
+        seen, token, has_more = [], None, True
+        while has_more:
+            response = self._changes(token, limit=2)
+            seen += [row['id'] for row in response.data['results']]
+            token, has_more = response.data['next_token'], response.data['has_more']
+        self.assertEqual(sorted(seen), sorted(Transaction.objects.values_list('id', flat=True)))
+
+    def test_expired_and_invalid_tokens(self):
+        token = self._changes().data['next_token']
+        with mock.patch('transactions.sync.timezone.now', return_value=timezone.now() + timedelta(days=31)):
+            self.assertEqual(self._changes(token).status_code, 410)
+        self.assertEqual(self._changes('not-a-token').status_code, 400)
+        naive = base64.urlsafe_b64encode(json.dumps([1, 1, 1, 1, '2024-01-01T00:00:00']).encode()).decode()
+        self.assertEqual(self._changes(naive).status_code, 400)
+        # Tokens with updated_at positions predate change sequences
+        legacy = base64.urlsafe_b64encode(
+            json.dumps(['2024-01-01T00:00:00+00:00', 1, '2024-01-01T00:00:00+00:00', 1]).encode()
+        ).decode()
+        self.assertEqual(self._changes(legacy).status_code, 410)
+
+
+class GoogleTokenVerifierTests(TransactionsAPITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import rsa
+        public, private = rsa.newkeys(1024)
+        cls.private_pem = private.save_pkcs1().decode()
+        cls.public_pem = public.save_pkcs1().decode()
+
+    def setUp(self):
+        super().setUp()
+        self.certs = {'key-1': self.public_pem}
+        self.session = mock.Mock()
+        self.session.get.side_effect = lambda url, timeout: mock.Mock(
+            json=lambda: dict(self.certs),
+            headers={'Cache-Control': 'public, max-age=3600'},
+            raise_for_status=lambda: None,
+        )
+        self.verifier = GoogleTokenVerifier(certs_url='https://certs.test', session=self.session)
+
+    def make_token(self, key_id='key-1', **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com', 'aud': 'client-id',
+            'iat': now, 'exp': now + 300, 'email': 'g@example.com', **claims,
+        }
+        signer = crypt.RSASigner.from_string(self.private_pem, key_id)
+        return jwt.encode(signer, payload, key_id=key_id).decode()
+
+    def test_certificates_are_fetched_once(self):
+        for _ in range(5):
+            claims = self.verifier.verify(self.make_token(), 'client-id')
+        self.assertEqual(claims['email'], 'g@example.com')
+        self.assertEqual(self.session.get.call_count, 1)
+
+    def test_unknown_key_id_refreshes_certificates(self):
+        self.verifier.verify(self.make_token(), 'client-id')
+        self.certs['key-2'] = self.public_pem
+        self.verifier._fetched_at -= 60
+        self.verifier.verify(self.make_token(key_id='key-2'), 'client-id')
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_invalid_tokens_are_rejected(self):
+        invalid = [
+            self.make_token(aud='other-client'),
+            self.make_token(iss='https://evil.example.com'),
+            self.make_token(iat=int(time.time()) - 3600, exp=int(time.time()) - 600),
+            self.make_token()[:-4] + 'AAAA',
+            'not-a-token',
+        ]
+        for token in invalid:
+            with self.assertRaises(ValueError):
+                self.verifier.verify(token, 'client-id')
+
+    def test_tokens_with_unexpected_json_shapes_are_rejected(self):
+        def segment(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+        header = {'alg': 'RS256', 'kid': 'key-1'}
+        shapes = [
+            f"{segment([])}.{segment({})}.c2ln",
+            f"{segment(header)}.{segment(['claims'])}.c2ln",
+            f"{segment({**header, 'kid': ['key-1']})}.{segment({})}.c2ln",
+        ]
+        for token in shapes:
+            with self.assertRaises(ValueError):
+                self.verifier.verify(token, 'client-id')
+        # Signed correctly, so only the claim types are wrong
+        for claims in ({'exp': 'x'}, {'iat': None}):
+            with self.assertRaises(ValueError):
+                self.verifier.verify(self.make_token(**claims), 'client-id')
+
+        with mock.patch('transactions.views.get_verifier', return_value=self.verifier), \
+                mock.patch.dict('os.environ', {'GOOGLE_CLIENT_ID': 'client-id'}):
+            for token in shapes + [self.make_token(exp='x')]:
+                response = self.client.post('/api/google-login/', {'credential': token}, format='json')
+                self.assertEqual(response.status_code, 400, token)
+
+    def test_google_login_uses_cached_verifier(self):
+        with mock.patch('transactions.views.get_verifier', return_value=self.verifier), \
+                mock.patch.dict('os.environ', {'GOOGLE_CLIENT_ID': 'client-id'}):
+            first = self.client.post('/api/google-login/', {'credential': self.make_token()}, format='json')
+            second = self.client.post('/api/google-login/', {'credential': self.make_token()}, format='json')
+            bad = self.client.post('/api/google-login/', {'credential': 'x.y.z'}, format='json')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['user']['id'], second.data['user']['id'])
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.session.get.call_count, 1)
+
+
+class StatelessAuthTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='stateless', password='pass12345')
+        tokens = self.client.post(
+            '/api/login/', {'username': 'stateless', 'password': 'pass12345'}, format='json'
+        ).data
+        self.refresh = tokens['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+    def user_queries(self, queries):
+        # Full User loads; the ETag version query only uses auth_user as its FROM row
+        return [q['sql'] for q in queries if '"auth_user"."password"' in q['sql']]
+
+    def test_warm_requests_do_not_query_users(self):
+        seed_transactions(self.user, 3)
+        self.assertEqual(self.client.get('/api/transactions/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/')
+            self.client.post('/api/transactions/', {
+                'type': 'expense', 'category': 'food', 'amount': '4.00', 'date': '2024-02-01',
+            }, format='json')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(self.user_queries(queries), [])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 4)
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/transactions/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/transactions/').status_code, 401)
+
+    def test_rotated_refresh_token_is_blacklisted(self):
+        first = self.client.post('/api/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(first.status_code, 200)
+        again = self.client.post('/api/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(again.status_code, 401)
+
+
+class UsernameAllocationTests(TransactionTestCase):
+    def test_next_suffix_is_found_in_one_query(self):
+        self.assertEqual(next_free_username('john'), 'john')
+        for name in ['john', 'john1', 'john7', 'johnny', 'john.doe', 'john12345678901', 'xjohn99']:
+            User.objects.create_user(username=name)
+        with self.assertNumQueries(1):
+            self.assertEqual(next_free_username('john'), 'john8')
+        self.assertEqual(next_free_username('john.'), 'john.')
+
+    def test_signups_that_lose_a_name_to_a_concurrent_one_retry(self):
+        User.objects.create_user(username='john')
+        # The name was free when looked up, then a concurrent signup took it
+        with mock.patch('transactions.usernames.next_free_username', side_effect=['john', 'john1']):
+            user = create_user_with_free_username('john', email='john@example.com')
+        self.assertEqual(user.username, 'john1')
+        with mock.patch('transactions.usernames.next_free_username', return_value='john'):
+            with self.assertRaises(UsernameTaken):
+                create_user_with_free_username('john')
+        self.assertEqual(User.objects.filter(username__startswith='john').count(), 2)
+
+    def test_registrations_with_one_username_leave_one_user(self):
+        self.assertEqual(create_user('alice', password='pass12345').username, 'alice')
+        with self.assertRaises(UsernameTaken):
+            create_user('alice', password='other12345')
+        self.assertEqual(User.objects.filter(username='alice').count(), 1)
+        self.assertTrue(User.objects.get(username='alice').check_password('pass12345'))
+        response = self.client.post('/api/register/', {'username': 'alice', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_passwords_are_hashed_outside_the_transaction(self):
+        in_transaction = []
+
+        def hash_password(password):
+            in_transaction.append(connection.in_atomic_block)
+            return make_password(password)
+
+        with mock.patch('transactions.usernames.make_password', side_effect=hash_password):
+            user = create_user('bob', password='pass12345', email='Bob@EXAMPLE.com')
+        self.assertEqual(in_transaction, [False])
+        user.refresh_from_db()
+        self.assertEqual(user.email, 'Bob@example.com')
+        self.assertTrue(user.check_password('pass12345'))
+
+
+class InstrumentationTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.user = User.objects.create_user(username='timed', password='pass12345')
+        self.client.force_authenticate(self.user)
+        seed_transactions(self.user, 5)
+
+    def test_server_timing_reports_queries_of_the_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/')
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    @override_settings(DEBUG=True)
+    def test_metrics_are_tagged_by_view(self):
+        self.client.get('/api/transactions/')
+        self.client.get('/api/transactions/summary/')
+        exported = b''.join(self.client.get('/api/transactions/export_csv/').streaming_content)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_requests_total{view="TransactionViewSet.list",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{view="TransactionViewSet.summary"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="TransactionViewSet.list",le="+Inf"} 1', body)
+        self.assertIn(f'http_response_bytes_total{{view="TransactionViewSet.export_csv"}} {len(exported)}', body)
+        self.assertIn('transactions_cache_misses_total', body)
+
+    @override_settings(DEBUG=True)
+    def test_unknown_methods_share_one_label(self):
+        for method in ('PROPFIND', 'BREW', 'X-RANDOM-1'):
+            self.client.generic(method, '/api/transactions/')
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_requests_total{view="TransactionViewSet.other",method="OTHER",status="405"} 3', body)
+        self.assertNotIn('PROPFIND', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_metrics_are_private_without_a_token_outside_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class QueryBudgetTests(TransactionsAPITestCase):
+    """
+    Fixed query budgets per endpoint, checked at two data volumes so per-row
+    queries (N+1) fail even when they would fit the budget on small data.
+    Cached responses are disabled so every request takes the full path.
+    """
+
+    BUDGETS = {
+        'list': 3,          # version, count, page
+        'list_cursor': 2,   # version, page
+        'retrieve': 2,      # version, row
+        'summary': 3,       # version, rollup totals, rollup breakdown
+        'timeseries': 2,    # version, rollup buckets
+        'export_csv': 2,    # version (archive check), one chunked cursor
+        # Writes include the savepoints; rollup, spend and change counters are one upsert each, new buckets included
+        'create': 7,        # savepoint, insert, change counter, change_seq stamp, rollup, spend, release
+        'update': 8,        # select, savepoint, update, change counter, change_seq stamp, rollup, spend, release
+        'destroy': 8,       # select, savepoint, delete, change counter, tombstone, rollup, spend, release
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='budget', password='pass12345')
+        other = User.objects.create_user(username='neighbour', password='pass12345')
+        seed_transactions(other, 300)
+        self.client.force_authenticate(self.user)
+
+    def seed(self, total):
+        seed_transactions(self.user, total - Transaction.objects.filter(user=self.user).count())
+        rollups.rebuild([self.user.id])
+        budgets.rebuild([self.user.id])
+
+    @contextmanager
+    def assertQueryBudget(self, endpoint, volume):
+        budget = self.BUDGETS[endpoint]
+        with CaptureQueriesContext(connection) as context:
+            yield
+        if len(context) > budget:
+            statements = '\n'.join(
+                f'  {number}. {query["sql"]}' for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(f'{endpoint} ran {len(context)} queries with {volume} rows, budget is {budget}:\n{statements}')
+
+    def requests(self):
+        row = Transaction.objects.filter(user=self.user).order_by('-id').first()
+        return {
+            'list': lambda: self.client.get('/api/transactions/?page_size=100'),
+            'list_cursor': lambda: self.client.get('/api/transactions/?pagination=cursor&page_size=100'),
+            'retrieve': lambda: self.client.get(f'/api/transactions/{row.pk}/'),
+            'summary': lambda: self.client.get('/api/transactions/summary/?group_by=category'),
+            'timeseries': lambda: self.client.get('/api/transactions/timeseries/?group_by=category'),
+            'export_csv': lambda: b''.join(self.client.get('/api/transactions/export_csv/').streaming_content),
+            'create': lambda: self.client.post('/api/transactions/', {
+                'type': 'expense', 'category': 'food', 'amount': '9.99', 'date': '2024-03-05',
+            }, format='json'),
+            'update': lambda: self.client.patch(
+                f'/api/transactions/{row.pk}/', {'amount': '1.00', 'category': 'bills'}, format='json'
+            ),
+            'destroy': lambda: self.client.delete(f'/api/transactions/{row.pk}/'),
+        }
+
+    @override_settings(TRANSACTIONS_CACHE_ENABLED=False)
+    def test_endpoints_stay_within_budget_as_data_grows(self):
+        for volume in (50, 1000):
+            self.seed(volume)
+            for endpoint, request in self.requests().items():
+                with self.subTest(endpoint=endpoint, volume=volume):
+                    with self.assertQueryBudget(endpoint, volume):
+                        response = request()
+                    if not isinstance(response, bytes):
+                        self.assertLess(response.status_code, 300)
+
+    @override_settings(TRANSACTIONS_CACHE_ENABLED=False)
+    def test_budget_failure_lists_the_offending_sql(self):
+        self.seed(5)
+        with self.assertRaises(AssertionError) as raised:
+            with self.assertQueryBudget('export_csv', 5):
+                for row in Transaction.objects.filter(user=self.user):
+                    row.user.username
+        self.assertIn('export_csv ran 6 queries with 5 rows, budget is 2', str(raised.exception))
+        self.assertIn('FROM "auth_user"', str(raised.exception))
+
+
+class BenchmarkCommandTests(TransactionsAPITestCase):
+    def test_seed_data_is_reproducible_and_consistent(self):
+        call_command('seed_data', users=2, transactions=300, seed=7, stdout=io.StringIO())
+        user = User.objects.get(username='bench0')
+        self.assertEqual(Transaction.objects.filter(user=user).count(), 300)
+        self.assertTrue(Transaction.objects.filter(user=user, category='salary', type='income').exists())
+        self.assertEqual(rollups.verify([user.id]), {})
+
+        rows = list(benchmarking.generate_transactions(1, 50, random.Random(3)))
+        again = list(benchmarking.generate_transactions(1, 50, random.Random(3)))
+        self.assertEqual([(r.category, r.amount, r.date) for r in rows], [(r.category, r.amount, r.date) for r in again])
+
+    def test_benchmark_reports_percentiles_as_json(self):
+        call_command('seed_data', users=1, transactions=120, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command(
+            'benchmark_api', requests=3, warmup=0, scenario=['list_first_page', 'summary', 'login'], stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['scenarios']), {'list_first_page', 'summary', 'login'})
+        for result in report['scenarios'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['requests'], 3)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['max'])
+        self.assertEqual(report['environment']['database'], connection.vendor)
+
+    def test_percentile_uses_nearest_rank(self):
+        ordered = list(range(1, 101))
+        self.assertEqual(benchmarking.percentile(ordered, 0.5), 50)
+        self.assertEqual(benchmarking.percentile(ordered, 0.99), 99)
+        self.assertEqual(benchmarking.percentile([7], 0.95), 7)
+
+
+class SQLiteTuningTests(TransactionsAPITestCase):
+    def test_connections_use_the_tuned_profile(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 600)
+
+
+class AsyncReadPathTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='async', password='pass12345')
+        other = User.objects.create_user(username='async-other', password='pass12345')
+        seed_transactions(self.user, 60)
+        seed_transactions(other, 10)
+        rollups.rebuild([self.user.id, other.id])
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.client.force_authenticate(self.user)
+
+    async def async_get(self, path, **headers):
+        return await self.async_client.get(path, headers={**self.auth, **headers})
+
+    async def test_list_and_summary_match_the_sync_endpoints(self):
+        for query in [
+            '?page_size=7&page=3', '?type=income&category=salary', '?search=transaction&ordering=relevance',
+            '?pagination=cursor&page_size=5&include_count=true', '?start_date=2024-01-10&end_date=2024-02-20',
+        ]:
+            sync = await sync_to_async(self.client.get)(f'/api/transactions/{query}')
+            response = await self.async_get(f'/api/async/transactions/{query}')
+            self.assertEqual(response.status_code, 200)
+            expected = sync.content.replace(b'/api/transactions/', b'/api/async/transactions/')
+            self.assertEqual(response.content, expected, query)
+
+        for query in ['', '?group_by=category', '?group_by=week&start_date=2024-01-10', '?group_by=bogus&search=x']:
+            sync = await sync_to_async(self.client.get)(f'/api/transactions/summary/{query}')
+            response = await self.async_get(f'/api/async/transactions/summary/{query}')
+            self.assertEqual(response.status_code, sync.status_code, query)
+            self.assertEqual(response.content, sync.content, query)
+
+    async def test_export_streams_the_same_csv(self):
+        def export():
+            return b''.join(self.client.get('/api/transactions/export_csv/?type=expense').streaming_content)
+        expected = await sync_to_async(export)()
+        response = await self.async_get('/api/async/transactions/export_csv/?type=expense')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), expected)
+
+    async def test_auth_errors_and_conditional_get(self):
+        anonymous = await self.async_client.get('/api/async/transactions/')
+        self.assertEqual(anonymous.status_code, 401)
+        self.assertEqual(anonymous.json(), {'detail': 'Authentication credentials were not provided.'})
+        bad = await self.async_client.get('/api/async/transactions/', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(bad.status_code, 401)
+        self.assertEqual(bad.json()['code'], 'token_not_valid')
+
+        first = await self.async_get('/api/async/transactions/summary/')
+        again = await self.async_get('/api/async/transactions/summary/', **{'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+
+
+class JobQueueTests(TransactionsAPITestCase):
+    def setUp(self):
+        super().setUp()
+        files = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, files, ignore_errors=True)
+        override = self.settings(JOB_FILES_ROOT=files, JOB_MAX_RUNNING=2, JOB_MAX_RUNNING_PER_USER=1)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username='jobs', password='pass12345')
+        self.client.force_authenticate(self.user)
+
+    def run_worker(self):
+        call_command('run_jobs', processes=0, once=True, stdout=io.StringIO())
+
+    def test_export_job_produces_the_export_csv_file(self):
+        seed_transactions(self.user, 120)
+        response = self.client.post('/api/jobs/', {'kind': 'export', 'type': 'expense', 'ignored': 'x'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(response.data['params'], {'type': 'expense'})
+
+        self.run_worker()
+
+        job = self.client.get(response['Location']).data
+        expenses = Transaction.objects.filter(user=self.user, type='expense').count()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual((job['processed'], job['total'], job['result']), (expenses, expenses, {'rows': expenses}))
+        download = self.client.get(job['download_url'])
+        self.assertEqual(download['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        expected = b''.join(self.client.get('/api/transactions/export_csv/?type=expense').streaming_content)
+        self.assertEqual(b''.join(download.streaming_content), expected)
+
+    def test_import_job_inserts_rows_and_reports_errors(self):
+        upload = SimpleUploadedFile(
+            'data.csv', b'Date,Type,Category,Amount,Description\n2024-01-02,Expense,Food,3.50,Tea\n'
+            b'not-a-date,Expense,Food,1,Bad\n', content_type='text/csv',
+        )
+        response = self.client.post('/api/jobs/', {'kind': 'import', 'partial': 'true', 'file': upload})
+        self.assertEqual(response.status_code, 202)
+
+        self.run_worker()
+
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual((job.result['created'], job.result['error_count'], job.processed), (1, 1, 2))
+        self.assertEqual(job.result['errors'][0]['row'], 2)
+        self.assertFalse(job.input)
+        self.assertTrue(Transaction.objects.filter(user=self.user, description='Tea').exists())
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/download/').status_code, 409)
+
+    def test_slow_import_keeps_beating_through_the_stale_window(self):
+        rows = b''.join(b'2024-01-%02d,Expense,Food,1.00,Row\n' % day for day in range(1, 9))
+        upload = SimpleUploadedFile(
+            'data.csv', b'Date,Type,Category,Amount,Description\n' + rows, content_type='text/csv'
+        )
+        response = self.client.post('/api/jobs/', {'kind': 'import', 'batch_size': '2', 'file': upload})
+        real_rows, beats = jobs.iter_csv_rows, []
+
+        def slow_rows(lines):
+            for row in real_rows(lines):
+                time.sleep(0.05)
+                yield row
+
+        def write(progress):
+            # Stands in for the heartbeat thread's UPDATE, which cannot see this test's transaction
+            beats.append((time.monotonic(), progress.processed))
+
+        stale_seconds = 0.15
+        with mock.patch.object(jobs, 'PROGRESS_INTERVAL', 0.02), \
+                mock.patch.object(jobs.Progress, 'write', autospec=True, side_effect=write), \
+                mock.patch.object(jobs, 'iter_csv_rows', slow_rows), self.settings(JOB_STALE_SECONDS=stale_seconds):
+            started = time.monotonic()
+            self.run_worker()
+            finished = time.monotonic()
+
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual((job.status, job.attempts, job.processed), ('succeeded', 1, 8))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 8)
+        # The run outlived the stale window, yet the job never went that long without a heartbeat
+        self.assertGreater(finished - started, stale_seconds * 2)
+        times = [started] + [at for at, _ in beats] + [finished]
+        self.assertLess(max(later - earlier for earlier, later in zip(times, times[1:])), stale_seconds)
+        self.assertIn(4, [processed for _, processed in beats])
+
+    def test_import_commits_in_batches_and_resumes_after_a_crash(self):
+        rows = b''.join(b'2024-01-%02d,Expense,Food,1.00,Row %d\n' % (day, day) for day in range(1, 9))
+        upload = SimpleUploadedFile(
+            'data.csv', b'Date,Type,Category,Amount,Description\n' + rows + b'bad,Expense,Food,1,Bad\n',
+            content_type='text/csv',
+        )
+        response = self.client.post('/api/jobs/', {'kind': 'import', 'partial': 'true', 'file': upload})
+        real_rows, passes = jobs.iter_csv_rows, []
+
+        def crashing_rows(lines):
+            passes.append(lines)
+            for number, row in enumerate(real_rows(lines), start=1):
+                if len(passes) == 2 and number == 5:
+                    raise RuntimeError('worker killed')
+                yield row
+
+        with mock.patch.object(jobs, 'iter_csv_rows', crashing_rows), self.settings(JOB_IMPORT_COMMIT_ROWS=3), \
+                self.assertLogs('transactions.jobs', 'ERROR'):
+            self.run_worker()
+        job = Job.objects.get(pk=response.data['id'])
+        # The first three rows were committed together with the checkpoint, the fourth rolled back
+        self.assertEqual(job.result, {'row': 3, 'created': 3, 'error_count': 0, 'errors': []})
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+        # As requeue_stale() leaves it for the next worker
+        Job.objects.filter(pk=job.pk).update(status='queued', worker='', processed=0, error='')
+        with self.settings(JOB_IMPORT_COMMIT_ROWS=3):
+            self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.processed), ('succeeded', 2, 9))
+        self.assertEqual((job.result['created'], job.result['error_count'], job.result['errors'][0]['row']), (8, 1, 9))
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list('description', flat=True)),
+            [f'Row {day}' for day in range(1, 9)],
+        )
+
+    def test_all_or_nothing_import_jobs_insert_nothing_when_a_late_row_is_bad(self):
+        rows = b''.join(b'2024-01-%02d,Expense,Food,1.00,Row\n' % day for day in range(1, 9))
+        upload = SimpleUploadedFile(
+            'data.csv', b'Date,Type,Category,Amount,Description\n' + rows + b'bad,Expense,Food,1,Bad\n',
+            content_type='text/csv',
+        )
+        response = self.client.post('/api/jobs/', {'kind': 'import', 'file': upload})
+        with self.settings(JOB_IMPORT_COMMIT_ROWS=3):
+            self.run_worker()
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual((job.status, job.result['created'], job.result['error_count']), ('failed', 0, 1))
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    def test_pool_loop_survives_a_locked_database(self):
+        response = self.client.post('/api/jobs/', {'kind': 'export'}, format='json')
+
+        class InlinePool:
+            # Runs jobs in this process, the spawned children could not see the test database
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def submit(self, func, job_id):
+                future = Future()
+                future.set_result(jobs.run_job(job_id))
+                return future
+
+            def shutdown(self, **kwargs):
+                pass
+
+        locked = OperationalError('database is locked')
+        with mock.patch('transactions.management.commands.run_jobs.ProcessPoolExecutor', InlinePool), \
+                mock.patch.object(jobs, 'heartbeat', side_effect=[locked, None]) as heartbeat, \
+                self.assertLogs('transactions.management.commands.run_jobs', 'WARNING') as logs:
+            call_command('run_jobs', processes=1, once=True, stdout=io.StringIO())
+
+        self.assertEqual(heartbeat.call_count, 2)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(Job.objects.get(pk=response.data['id']).status, 'succeeded')
+
+    def test_claims_respect_per_user_and_global_limits(self):
+        other = User.objects.create_user(username='jobs-other', password='pass12345')
+        third = User.objects.create_user(username='jobs-third', password='pass12345')
+        first, second = [jobs.enqueue(self.user.id, 'export', {}) for _ in range(2)]
+        other_job = jobs.enqueue(other.id, 'export', {})
+        third_job = jobs.enqueue(third.id, 'export', {})
+
+        # One job per user, two in total
+        self.assertEqual(jobs.claim_next('w1'), first.pk)
+        self.assertEqual(jobs.claim_next('w1'), other_job.pk)
+        self.assertIsNone(jobs.claim_next('w2'))
+
+        Job.objects.filter(pk=first.pk).update(status='succeeded')
+        self.assertEqual(jobs.claim_next('w2'), second.pk)
+        Job.objects.filter(pk=other_job.pk).update(status='failed')
+        self.assertEqual(jobs.claim_next('w2'), third_job.pk)
+        self.assertEqual(Job.objects.get(pk=third_job.pk).attempts, 1)
+
+    def test_abandoned_jobs_are_requeued_then_failed(self):
+        job = jobs.enqueue(self.user.id, 'export', {})
+        jobs.claim_next('gone')
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+
+        with self.settings(JOB_MAX_ATTEMPTS=2):
+            self.assertEqual(jobs.requeue_stale(), (1, 0))
+            self.assertEqual(jobs.claim_next('again'), job.pk)
+            Job.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+            self.assertEqual(jobs.requeue_stale(), (0, 1))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'failed')
+
+    def test_jobs_are_private_and_capped_per_user(self):
+        other = User.objects.create_user(username='jobs-other', password='pass12345')
+        hidden = jobs.enqueue(other.id, 'export', {})
+        self.assertEqual(self.client.get(f'/api/jobs/{hidden.pk}/').status_code, 404)
+        self.assertEqual(self.client.post('/api/jobs/', {'kind': 'import'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/jobs/', {'kind': 'backup'}).status_code, 400)
+
+        with self.settings(JOB_MAX_QUEUED_PER_USER=2):
+            for expected in (202, 202, 429):
+                self.assertEqual(self.client.post('/api/jobs/', {'kind': 'export'}).status_code, expected)
+        self.assertEqual(self.client.get('/api/jobs/').data['count'], 2)
@@ -0,0 +1,165 @@
+# backend/transactions/timeseries.py
+from datetime import date, timedelta
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from . import archive, rollups
+from .aggregation import ZERO
+from .filters import filter_transactions
+from .models import MonthlyRollup
+
+# Supported values for ?interval= and the expression each one truncates dates with
+INTERVALS = {
+    'day': F('date'),
+    'week': TruncWeek('date'),
+    'month': TruncMonth('date'),
+}
+METRICS = ('sum', 'count')
+TYPES = ('income', 'expense')
+# Longest series returned, about ten years of days
+MAX_BUCKETS = 3700
+
+
+def period_start(day, interval):
+    if interval == 'month':
+        return day.replace(day=1)
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def next_period(day, interval):
+    if interval == 'month':
+        return rollups.next_month(day)
+    return day + timedelta(days=7 if interval == 'week' else 1)
+
+
+def bucket_count(first, last, interval):
+    first, last = period_start(first, interval), period_start(last, interval)
+    if interval == 'month':
+        return max((last.year - first.year) * 12 + last.month - first.month + 1, 0)
+    return max((last - first).days // (7 if interval == 'week' else 1) + 1, 0)
+
+
+def _check_length(first, last, interval):
+    if bucket_count(first, last, interval) > MAX_BUCKETS:
+        raise ValueError(f'The date range spans more than {MAX_BUCKETS} {interval} buckets, narrow it')
+
+
+def periods(first, last, interval):
+    """Every bucket start from the bucket holding `first` to the one holding `last`"""
+    current, last = period_start(first, interval), period_start(last, interval)
+    result = []
+    while current <= last:
+        result.append(current)
+        current = next_period(current, interval)
+    return result
+
+
+def _raw_rows(queryset, interval, by_category):
+    keys = ['_period', 'type'] + (['category'] if by_category else [])
+    rows = (
+        queryset.order_by()
+        .annotate(_period=INTERVALS[interval])
+        .values(*keys)
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    for row in rows:
+        yield row['_period'], row['type'], row.get('category'), row['total'], row['count']
+
+
+def _rollup_rows(user_id, params, start, end, by_category, archived_through):
+    """Monthly rows with whole months read from MonthlyRollup, partial edge months from raw rows"""
+    full_from, full_to, raw_ranges = rollups.split_range(start, end)
+    filters = {name: params.get(name) for name in ('type', 'category') if params.get(name)}
+
+    if start is None or end is None or full_from is not None or full_to is not None:
+        buckets = MonthlyRollup.objects.filter(user_id=user_id, **filters).exclude(count=0)
+        if full_from is not None:
+            buckets = buckets.filter(month__gte=full_from)
+        if full_to is not None:
+            buckets = buckets.filter(month__lt=full_to)
+        keys = ['month', 'type'] + (['category'] if by_category else [])
+        for row in buckets.order_by().values(*keys).annotate(sum_total=Sum('total'), sum_count=Sum('count')):
+            yield row['month'], row['type'], row.get('category'), row['sum_total'], row['sum_count']
+    for range_start, range_end in raw_ranges:
+        raw = archive.model_for(user_id, range_start, archived_through).objects.filter(
+            user_id=user_id, date__gte=range_start, date__lte=range_end, **filters
+        )
+        yield from _raw_rows(raw, 'month', by_category)
+
+
+def timeseries(user_id, params, archived_through=False):
+    """
+    Per-type totals (?metric=sum) or row counts (?metric=count) for every
+    ?interval= bucket of the filtered transactions, with empty buckets
+    filled in. ?group_by=category splits each type by category. Monthly
+    series without ?search are served from the rollup table, archived rows
+    included; raw rows are read from the archive only when the range
+    explicitly reaches it. Pass `archived_through` when the caller already
+    knows it.
+    Raises ValueError for invalid parameters.
+    """
+    interval = params.get('interval', 'month')
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of: {', '.join(INTERVALS)}")
+    metric = params.get('metric', 'sum')
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    group_by = params.get('group_by', None)
+    if group_by not in (None, '', 'category'):
+        raise ValueError('group_by must be category')
+    by_category = group_by == 'category'
+
+    bounds = {}
+    for name in ('start_date', 'end_date'):
+        if params.get(name):
+            try:
+                bounds[name] = date.fromisoformat(params.get(name))
+            except ValueError:
+                raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+    if len(bounds) == 2:
+        _check_length(bounds['start_date'], bounds['end_date'], interval)
+
+    if archived_through is False:
+        archived_through = archive.archived_through(user_id)
+    if interval == 'month' and rollups.can_serve(params):
+        rows = list(_rollup_rows(
+            user_id, params, bounds.get('start_date'), bounds.get('end_date'), by_category, archived_through
+        ))
+    else:
+        model = archive.model_for(user_id, bounds.get('start_date'), archived_through, bounds.get('end_date'))
+        queryset = filter_transactions(model.objects.filter(user_id=user_id), params)
+        rows = list(_raw_rows(queryset, interval, by_category))
+
+    # Without an explicit range the series spans the first to the last bucket with data
+    seen = [row[0] for row in rows]
+    first = bounds.get('start_date') or (min(seen) if seen else None)
+    last = bounds.get('end_date') or (max(seen) if seen else None)
+    buckets = []
+    if first and last:
+        _check_length(first, last, interval)
+        buckets = periods(first, last, interval)
+
+    empty = ZERO if metric == 'sum' else 0
+    position = {bucket: index for index, bucket in enumerate(buckets)}
+    series = {txn_type: ({} if by_category else [empty] * len(buckets)) for txn_type in TYPES}
+    for period, txn_type, category, total, count in rows:
+        index = position.get(period)
+        if index is None or txn_type not in series:
+            continue
+        values = series[txn_type]
+        if by_category:
+            values = values.setdefault(category, [empty] * len(buckets))
+        values[index] += total if metric == 'sum' else count
+
+    if by_category:
+        series = {txn_type: dict(sorted(values.items())) for txn_type, values in series.items()}
+    return {
+        'interval': interval,
+        'metric': metric,
+        'periods': buckets,
+        'series': series,
+    }
@@ -0,0 +1,76 @@
+# backend/transactions/usernames.py
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Count, Max, Q
+from django.db.models.functions import Cast, Substr
+
+# Attempts before giving up when concurrent signups keep taking the same name
+MAX_ATTEMPTS = 5
+# Room left for the numeric suffix within User.username's 150 characters
+MAX_BASE_LENGTH = 140
+# Longer suffixes are ignored so the cast below can't overflow
+MAX_SUFFIX_DIGITS = 9
+
+_INVALID_CHARS = re.compile(r'[^\w.@+-]')
+
+
+class UsernameTaken(Exception):
+    pass
+
+
+def base_from_email(email):
+    """The email local part, reduced to characters Django accepts in usernames"""
+    base = _INVALID_CHARS.sub('', email.split('@')[0])[:MAX_BASE_LENGTH]
+    return base or 'user'
+
+
+def next_free_username(base):
+    """
+    `base` if it is free, otherwise base + (highest numeric suffix in use + 1),
+    found with one query instead of probing base1, base2, ... one by one.
+    """
+    taken = User.objects.filter(username__startswith=base).filter(
+        Q(username=base) | Q(username__regex=rf'^{re.escape(base)}[0-9]{{1,{MAX_SUFFIX_DIGITS}}}$')
+    ).aggregate(
+        exact=Count('pk', filter=Q(username=base)),
+        highest=Max(
+            Cast(Substr('username', len(base) + 1), BigIntegerField()),
+            filter=~Q(username=base),
+        ),
+    )
+    if not taken['exact']:
+        return base
+    return f"{base}{(taken['highest'] or 0) + 1}"
+
+
+def create_user(username, password=None, email=None, **fields):
+    """
+    Create a user with exactly `username`, relying on the unique constraint
+    instead of an exists() check that races with concurrent signups.
+
+    Same as User.objects.create_user(), but the password is hashed before the
+    transaction opens, so concurrent writers only wait for the INSERT.
+    """
+    user = User(
+        username=User.normalize_username(username), email=User.objects.normalize_email(email), **fields
+    )
+    user.password = make_password(password)
+    try:
+        with transaction.atomic():
+            user.save()
+    except IntegrityError:
+        raise UsernameTaken(username)
+    return user
+
+
+def create_user_with_free_username(base, **fields):
+    """Create a user named `base` or `base<N>`, retrying when a concurrent signup wins"""
+    for _ in range(MAX_ATTEMPTS):
+        try:
+            return create_user(next_free_username(base), **fields)
+        except UsernameTaken:
+            continue
+    raise UsernameTaken(base)
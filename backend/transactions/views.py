@@ -1,65 +1,59 @@
 # backend/transactions/views.py
 import os
-import json
-import csv
-from rest_framework import viewsets, permissions
+import logging
+from rest_framework import mixins, viewsets, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Transaction
-from .serializers import TransactionSerializer
-from django.db.models import Q
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from .authentication import StatelessJWTAuthentication
+from .models import ArchivedTransaction, Budget, Job, RecurringTransaction, Transaction
+from .serializers import (
+    BudgetSerializer, JobSerializer, RecurringTransactionSerializer, TransactionRowSerializer, TransactionSerializer,
+)
+from .aggregation import summarize, breakdown
+from . import archive, batch, budgets, caching, jobs, rollups, sync, timeseries
+from .caching import cached_response
+from .conditional import conditional_get, user_version
+from .filters import filter_transactions
+from .pagination import TransactionPagination
+from .exports import csv_export_response
+from .imports import (
+    CSVParser, DecodedLines, MAX_BATCH_SIZE, UnreadableCSV, import_rows, iter_csv_rows, iter_uploaded_csv,
+)
+from .google_auth import get_verifier
+from .usernames import UsernameTaken, base_from_email, create_user, create_user_with_free_username
+
+logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def google_login(request):
-    print("=== GOOGLE LOGIN DEBUG ===")
-    print("1. Request method:", request.method)
-    print("2. Request headers:", dict(request.headers))
-    print("3. Request body (raw):", request.body)
-    print("4. Request data:", request.data)
-    print("5. Content-Type:", request.content_type)
-    
     token = request.data.get('credential')
-    print("6. Extracted token:", token)
-    print("7. Token type:", type(token))
     
     if not token:
-        print("ERROR: No token found in request.data")
-        return Response({
-            'error': 'Missing Google credential',
-            'received_data': str(request.data),
-            'received_keys': list(request.data.keys()) if hasattr(request.data, 'keys') else 'N/A'
-        }, status=400)
+        return Response({'error': 'Missing Google credential'}, status=400)
     
     try:
         google_client_id = os.environ.get('GOOGLE_CLIENT_ID')
-        print("8. Google Client ID configured:", bool(google_client_id))
         
         if not google_client_id:
             return Response({'error': 'Google Client ID not configured on server'}, status=500)
         
-        # Verify the Google token
-        idinfo = id_token.verify_oauth2_token(
-            token, 
-            google_requests.Request(), 
-            google_client_id
-        )
-        
-        print("9. Token verified successfully!")
-        print("10. User info:", idinfo)
+        # Verify the Google token locally against the cached signing certificates
+        idinfo = get_verifier().verify(token, google_client_id)
         
         # Get user info from Google
         email = idinfo.get('email')
         first_name = idinfo.get('given_name', '')
         last_name = idinfo.get('family_name', '')
-        google_id = idinfo.get('sub')
         
         if not email:
             return Response({'error': 'Email not provided by Google'}, status=400)
@@ -67,29 +61,19 @@ def google_login(request):
         # Check if user exists, create if not
         try:
             user = User.objects.get(email=email)
-            print(f"11. Found existing user: {user.username}")
         except User.DoesNotExist:
             # Create username from email
-            username = email.split('@')[0]
-            counter = 1
-            original_username = username
-            while User.objects.filter(username=username).exists():
-                username = f"{original_username}{counter}"
-                counter += 1
-            
-            user = User.objects.create_user(
-                username=username,
+            user = create_user_with_free_username(
+                base_from_email(email),
                 email=email,
                 first_name=first_name,
                 last_name=last_name
             )
-            print(f"11. Created new user: {username}")
+            logger.info("Created user %s from Google login", user.username)
         
         # Generate JWT tokens
         refresh = RefreshToken.for_user(user)
         
-        print("12. Login successful!")
-        
         return Response({
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -101,94 +85,303 @@ def google_login(request):
         }, status=200)
         
     except ValueError as e:
-        print(f"ERROR: Token verification failed: {e}")
+        logger.info("Google token verification failed: %s", e)
         return Response({'error': f'Invalid Google token: {str(e)}'}, status=400)
     except Exception as e:
-        print(f"ERROR: Unexpected error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Google login failed")
         return Response({'error': f'Server error: {str(e)}'}, status=500)
 class TransactionViewSet(viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
+    # request.user is built from the token claims, no User query per request
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TransactionPagination
+    # Actions that only write to the hot table
+    WRITE_ACTIONS = ('update', 'partial_update', 'destroy')
     
     def get_queryset(self):
-        # Users only see their own transactions
-        queryset = Transaction.objects.filter(user=self.request.user)
-        
-        # Search by category or description
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(category__icontains=search) | Q(description__icontains=search)
+        # Users only see their own transactions, archived ones too when the date range reaches them
+        params = self.request.query_params
+        if self.action in self.WRITE_ACTIONS:
+            model = Transaction
+        else:
+            model = archive.model_for(
+                self.request.user.id, params.get('start_date'), self.archived_through(), params.get('end_date')
             )
-        
-        # Filter by type (income/expense)
-        transaction_type = self.request.query_params.get('type', None)
-        if transaction_type:
-            queryset = queryset.filter(type=transaction_type)
-        
-        # Filter by category
-        category = self.request.query_params.get('category', None)
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        if start_date:
-            queryset = queryset.filter(date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(date__lte=end_date)
-        
-        return queryset
+        queryset = model.objects.filter(user_id=self.request.user.id)
+        return filter_transactions(queryset, params)
+    
+    def archived_through(self):
+        # Comes with the conditional GET version query, so reads pay nothing extra
+        return user_version(self.request)[2]
+    
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Writes only touch the hot table: an archived row is moved back first
+            pk = str(self.kwargs.get(self.lookup_field, ''))
+            if not pk.isdigit():
+                raise
+            if self.action == 'retrieve':
+                # Archived rows stay readable by id, at the cost of one more primary key lookup
+                return get_object_or_404(ArchivedTransaction, user_id=self.request.user.id, pk=pk)
+            if self.action not in self.WRITE_ACTIONS:
+                raise
+            if not archive.restore(ArchivedTransaction.objects.filter(user_id=self.request.user.id, pk=pk)):
+                raise
+            return super().get_object()
+    
+    @conditional_get('list')
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, 'list', lambda: self._list(request))
+    
+    def _list(self, request):
+        # Read-only rows skip model instances and per-field serializer calls
+        try:
+            rows = TransactionRowSerializer.from_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        queryset = self.filter_queryset(self.get_queryset())
+        # Keyset pages of an open-ended listing continue into the archive
+        self.paginator.archive = archive.continuation(
+            request.user.id, queryset.model, request.query_params, self.archived_through(), rows.columns
+        )
+        page = self.paginate_queryset(queryset.values(*rows.columns))
+        if page is not None:
+            return self.get_paginated_response(rows.serialize(page))
+        return Response(rows.serialize(queryset))
+    
+    @conditional_get('retrieve')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         # Automatically set the user when creating
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.id)
     
     @action(detail=False, methods=['get'])
+    @conditional_get('summary')
     def summary(self, request):
-        """Get summary of transactions"""
-        transactions = self.get_queryset()
+        """Get summary of transactions, optionally broken down with ?group_by="""
+        return cached_response(request, 'summary', lambda: self._summary(request))
+    
+    def _summary(self, request):
+        params = request.query_params
+        group_by = params.get('group_by', None)
         
-        total_income = sum(t.amount for t in transactions if t.type == 'income')
-        total_expense = sum(t.amount for t in transactions if t.type == 'expense')
-        balance = total_income - total_expense
+        # Whole months come from the rollup table unless a filter needs raw rows
+        if rollups.can_serve(params, group_by):
+            through = self.archived_through()
+            data = rollups.summarize_user(request.user.id, params, archived_through=through)
+            if group_by:
+                data['breakdown'] = rollups.summarize_user(
+                    request.user.id, params, group_by, archived_through=through
+                )
+            return Response(data)
         
-        return Response({
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'balance': balance,
-            'count': transactions.count()
-        })
+        transactions = self.get_queryset()
+        data = summarize(transactions)
+        if group_by:
+            try:
+                data['breakdown'] = breakdown(transactions, group_by)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=400)
+        
+        return Response(data)
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Apply a list of update/delete operations, by id or by filter, in one DB transaction"""
+        try:
+            operations = batch.validate(request.data.get('operations') if isinstance(request.data, dict) else None)
+            results, updated, deleted = batch.apply(request.user.id, operations)
+        except batch.BatchError as e:
+            return Response({'error': 'Invalid operations, nothing was changed', 'errors': e.errors}, status=400)
+        return Response({'results': results, 'updated': updated, 'deleted': deleted})
+    
+    @action(detail=False, methods=['get'], url_path='timeseries')
+    @conditional_get('timeseries')
+    def timeseries(self, request):
+        """Gap-filled per-type series, ?interval=day|week|month&metric=sum|count, with the list filters"""
+        return cached_response(request, 'timeseries', lambda: self._timeseries(request))
+    
+    def _timeseries(self, request):
+        try:
+            return Response(timeseries.timeseries(
+                request.user.id, request.query_params, archived_through=self.archived_through()
+            ))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+    
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
-        """Export transactions as CSV"""
+        """Export transactions as CSV, streamed in chunks (?compress=gzip for a .csv.gz)"""
         # Use the same queryset logic (respects filters)
         transactions = self.get_queryset()
+        compress = request.query_params.get('compress', None) == 'gzip'
+        return csv_export_response(transactions, compress=compress)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Rows changed and ids deleted since ?since=<token>, for incremental client sync"""
+        try:
+            limit = min(int(request.query_params.get('limit', sync.DEFAULT_LIMIT)), sync.MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=400)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=400)
+        
+        try:
+            rows, deleted, token, has_more = sync.changes_since(
+                request.user.id, request.query_params.get('since', None), limit=limit
+            )
+        except sync.TokenExpired as e:
+            return Response({'error': str(e)}, status=410)
+        except sync.TokenError as e:
+            return Response({'error': str(e)}, status=400)
         
-        # Create the HttpResponse object with CSV header
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'deleted': deleted,
+            'next_token': token,
+            'has_more': has_more
+        })
+    
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[JSONParser, MultiPartParser, CSVParser],
+    )
+    def import_transactions(self, request):
+        """Bulk import transactions from CSV (export_csv columns) or a JSON array"""
+        if 'file' in request.FILES:
+            rows = iter_uploaded_csv(request.FILES['file'])
+        elif isinstance(request.data, list):
+            rows = request.data
+        elif isinstance(request.data, DecodedLines):
+            rows = iter_csv_rows(request.data)
+        else:
+            return Response({
+                'error': 'Send a JSON array, a text/csv body or a multipart "file" upload'
+            }, status=400)
         
-        # Create CSV writer
-        writer = csv.writer(response)
+        batch_size = None
+        if request.query_params.get('batch_size'):
+            try:
+                batch_size = int(request.query_params.get('batch_size'))
+            except ValueError:
+                return Response({'error': 'batch_size must be an integer'}, status=400)
+            if batch_size < 1:
+                return Response({'error': 'batch_size must be positive'}, status=400)
+            batch_size = min(batch_size, MAX_BATCH_SIZE)
+        allow_partial = request.query_params.get('partial', None) in ('1', 'true')
         
-        # Write header row
-        writer.writerow(['Date', 'Type', 'Category', 'Amount', 'Description'])
+        try:
+            created, error_count, errors = import_rows(
+                request.user, rows, batch_size=batch_size, allow_partial=allow_partial
+            )
+        except UnreadableCSV as e:
+            return Response({'error': str(e), 'row': e.row}, status=400)
+        status = 201 if created or not error_count else 400
+        return Response({
+            'created': created,
+            'error_count': error_count,
+            'errors': errors
+        }, status=status)
+
+class JobViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Background CSV exports and imports, run by `manage.py run_jobs`"""
+    serializer_class = JobSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    
+    def get_queryset(self):
+        return Job.objects.filter(user_id=self.request.user.id)
+    
+    def create(self, request):
+        """Queue an export (same filters as export_csv) or an import of an uploaded "file" """
+        kind = request.data.get('kind')
+        if kind == 'export':
+            allowed, upload = jobs.EXPORT_PARAMS, None
+        elif kind == 'import':
+            allowed, upload = jobs.IMPORT_PARAMS, request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'Import jobs need a multipart "file" upload'}, status=400)
+        else:
+            return Response({'error': 'kind must be "export" or "import"'}, status=400)
         
-        # Write data rows
-        for txn in transactions:
-            writer.writerow([
-                txn.date,
-                txn.type.capitalize(),
-                txn.category.capitalize(),
-                txn.amount,
-                txn.description or ''
-            ])
+        if jobs.active_count(request.user.id) >= settings.JOB_MAX_QUEUED_PER_USER:
+            return Response({'error': 'Too many unfinished jobs, wait for some to finish'}, status=429)
         
-        return response
+        params = {name: request.data[name] for name in allowed if request.data.get(name) not in (None, '')}
+        job = jobs.enqueue(request.user.id, kind, params, input_file=upload)
+        data = self.get_serializer(job).data
+        return Response(data, status=202, headers={'Location': f'/api/jobs/{job.pk}/'})
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """The finished export file"""
+        job = self.get_object()
+        if job.status != 'succeeded' or not job.artifact:
+            return Response({'error': 'This job has no file to download'}, status=409)
+        compressed = job.artifact.name.endswith('.gz')
+        return FileResponse(
+            job.artifact.open('rb'), as_attachment=True,
+            filename='transactions.csv.gz' if compressed else 'transactions.csv',
+            content_type='application/gzip' if compressed else 'text/csv',
+        )
+
+class BudgetViewSet(viewsets.ModelViewSet):
+    """Per-category weekly or monthly spending limits"""
+    serializer_class = BudgetSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Budget.objects.filter(user_id=self.request.user.id)
+    
+    def perform_create(self, serializer):
+        self.save_budget(serializer, user_id=self.request.user.id)
+
+    def perform_update(self, serializer):
+        self.save_budget(serializer)
+
+    def save_budget(self, serializer, **fields):
+        # validate() misses a concurrent request creating the same budget, the unique constraint does not
+        try:
+            with transaction.atomic():
+                serializer.save(**fields)
+        except IntegrityError:
+            raise serializer.duplicate(serializer.validated_data)
+    
+    @action(detail=False, methods=['get'])
+    def status(self, request):
+        """Spend against every budget for the current period, or the one holding ?date="""
+        try:
+            day = budgets.parse_day(request.query_params.get('date'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(budgets.status(request.user.id, day))
+
+class RecurringTransactionViewSet(viewsets.ModelViewSet):
+    """Templates `manage.py materialize_recurring` turns into transactions on schedule"""
+    serializer_class = RecurringTransactionSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return RecurringTransaction.objects.filter(user_id=self.request.user.id)
+    
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.id)
+
+# Response cache counters for this process
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response(caching.stats.as_dict())
 
 # Register endpoint
 @api_view(['POST'])
@@ -203,10 +396,10 @@ def register(request):
             'error': 'Username and password required'
         }, status=400)
     
-    if User.objects.filter(username=username).exists():
+    try:
+        user = create_user(username, email=email, password=password)
+    except UsernameTaken:
         return Response({'error': 'Username already exists'}, status=400)
-    
-    user = User.objects.create_user(username=username, email=email, password=password)
     refresh = RefreshToken.for_user(user)
     
     return Response({
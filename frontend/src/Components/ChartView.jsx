@@ -1,16 +1,36 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { Pie, Bar, Line } from "react-chartjs-2";
 import { Chart as ChartJS, ArcElement, BarElement, LineElement, CategoryScale, LinearScale, PointElement, Tooltip, Legend } from "chart.js";
+import api from "../services/api";
 
 ChartJS.register(ArcElement, BarElement, LineElement, CategoryScale, LinearScale, PointElement, Tooltip, Legend);
 
-function ChartView({ data }) {
+function ChartView({ summary, filters = {}, version = 0 }) {
   const [chartType, setChartType] = useState("pie");
+  const [bucket, setBucket] = useState("month");
+  const [series, setSeries] = useState(null);
 
-  const income = data.filter(txn => txn.type === "income")
-                     .reduce((sum, txn) => sum + Number(txn.amount), 0);
-  const expense = data.filter(txn => txn.type === "expense")
-                      .reduce((sum, txn) => sum + Number(txn.amount), 0);
+  // The trend is bucketed and gap-filled server-side by /transactions/timeseries/
+  useEffect(() => {
+    if (chartType !== "line") return;
+    const fetchSeries = async () => {
+      try {
+        const params = new URLSearchParams({ interval: bucket });
+        Object.entries(filters).forEach(([key, value]) => {
+          if (value) params.append(key, value);
+        });
+        const res = await api.get(`transactions/timeseries/?${params.toString()}`);
+        setSeries(res.data);
+      } catch (err) {
+        console.error("Timeseries fetch failed:", err);
+      }
+    };
+    fetchSeries();
+  }, [chartType, bucket, filters, version]);
+
+  // Totals are aggregated server-side by /transactions/summary/
+  const income = Number(summary.total_income);
+  const expense = Number(summary.total_expense);
 
   const chartData = {
     labels: ["Income", "Expense"],
@@ -22,24 +42,55 @@ function ChartView({ data }) {
     }],
   };
 
+  const trendData = {
+    labels: series ? series.periods : [],
+    datasets: [
+      {
+        label: "Income",
+        data: series ? series.series.income.map(Number) : [],
+        borderColor: "#22c55e",
+        backgroundColor: "#4ade80",
+      },
+      {
+        label: "Expense",
+        data: series ? series.series.expense.map(Number) : [],
+        borderColor: "#ef4444",
+        backgroundColor: "#f87171",
+      },
+    ],
+  };
+
   return (
     <div className="bg-white dark:bg-gray-800 p-4 rounded-lg shadow">
       <div className="flex justify-between items-center mb-4">
         <h2 className="text-lg font-semibold text-gray-800 dark:text-gray-100">Income vs Expense</h2>
-        <select
-          value={chartType}
-          onChange={(e) => setChartType(e.target.value)}
-          className="text-sm bg-gray-200 dark:bg-gray-700 text-gray-800 dark:text-gray-100 rounded px-2 py-1"
-        >
-          <option value="pie">Pie</option>
-          <option value="bar">Bar</option>
-          <option value="line">Line</option>
-        </select>
+        <div className="flex gap-2">
+          {chartType === "line" && (
+            <select
+              value={bucket}
+              onChange={(e) => setBucket(e.target.value)}
+              className="text-sm bg-gray-200 dark:bg-gray-700 text-gray-800 dark:text-gray-100 rounded px-2 py-1"
+            >
+              <option value="day">Daily</option>
+              <option value="week">Weekly</option>
+              <option value="month">Monthly</option>
+            </select>
+          )}
+          <select
+            value={chartType}
+            onChange={(e) => setChartType(e.target.value)}
+            className="text-sm bg-gray-200 dark:bg-gray-700 text-gray-800 dark:text-gray-100 rounded px-2 py-1"
+          >
+            <option value="pie">Pie</option>
+            <option value="bar">Bar</option>
+            <option value="line">Trend</option>
+          </select>
+        </div>
       </div>
 
       {chartType === "pie" && <Pie data={chartData} />}
       {chartType === "bar" && <Bar data={chartData} />}
-      {chartType === "line" && <Line data={chartData} />}
+      {chartType === "line" && <Line data={trendData} />}
     </div>
   );
 }
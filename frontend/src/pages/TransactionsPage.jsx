@@ -44,9 +44,11 @@ const handleLogout = () => {
    //Filter transactions and pagination and infinite scroll
 const [filters, setFilters] = useState({ type: "", category: "", start_date: "", end_date: "",search: ""});
 const [page, setPage] = useState(1);
-const [totalPages, setTotalPages] = useState(1);
+const [nextCursor, setNextCursor] = useState(null);
 const [isLoading, setIsLoading] = useState(false);
 const [hasMore, setHasMore] = useState(true);
+const [summary, setSummary] = useState({ total_income: 0, total_expense: 0, balance: 0 });
+const [summaryVersion, setSummaryVersion] = useState(0);
 // 🔁 Infinite scroll trigger
 const loadMore = () => {
   if (!isLoading && hasMore) {
@@ -59,6 +61,7 @@ const loadMore = () => {
 
 useEffect(() => {
   setPage(1);
+  setNextCursor(null);
   setHasMore(true);
 }, [filters]);
 
@@ -68,9 +71,11 @@ useEffect(() => {
     if (isLoading || !hasMore) return;
     setIsLoading(true);
     try {
-      let query = `transactions/?page=${page}`;
+      // Keyset pagination: deep pages cost the same as the first one
+      let query = `transactions/?pagination=cursor`;
       const params = [];
       
+      if (page > 1 && nextCursor) params.push(`cursor=${encodeURIComponent(nextCursor)}`);
       if (filters.type) params.push(`type=${filters.type}`);
       if (filters.category) params.push(`category=${filters.category}`);
       if (filters.start_date) params.push(`start_date=${filters.start_date}`);
@@ -84,7 +89,7 @@ useEffect(() => {
       const res = await api.get(query);
       const newTxns = res.data.results;
       setTransactions((prev) => page === 1 ? newTxns : [...prev, ...newTxns]);
-      setTotalPages(Math.ceil(res.data.count / 10));
+      setNextCursor(res.data.next ? new URL(res.data.next).searchParams.get("cursor") : null);
       setHasMore(res.data.next !== null);
     } catch (err) {
       console.error("Fetch failed:", err);
@@ -95,9 +100,27 @@ useEffect(() => {
   fetchTransactions();
 }, [page, filters]);
 
+// 💰 Refresh summary totals whenever filters change or a transaction is written
+useEffect(() => {
+  const fetchSummary = async () => {
+    try {
+      const params = new URLSearchParams();
+      Object.entries(filters).forEach(([key, value]) => {
+        if (value) params.append(key, value);
+      });
+      const res = await api.get(`transactions/summary/?${params.toString()}`);
+      setSummary(res.data);
+    } catch (err) {
+      console.error("Summary fetch failed:", err);
+    }
+  };
+  fetchSummary();
+}, [filters, summaryVersion]);
+
   // ➕ Add new transaction
   const handleNewTransaction = (txn) => {
     setTransactions((prev) => [txn, ...prev]);
+    setSummaryVersion((v) => v + 1);
   };
 
   // 🗑 Trigger delete confirmation
@@ -111,6 +134,7 @@ useEffect(() => {
     try {
       await api.delete(`transactions/${deleteId}/`);
       setTransactions((prev) => prev.filter((txn) => txn.id !== deleteId));
+      setSummaryVersion((v) => v + 1);
     } catch (err) {
       console.error("Delete failed:", err);
     } finally {
@@ -131,19 +155,12 @@ useEffect(() => {
       prev.map((txn) => (txn.id === updatedTxn.id ? updatedTxn : txn))
     );
     setIsEditModalOpen(false);
+    setSummaryVersion((v) => v + 1);
   };
  
 
-  // 💰 Calculations
-  const totalIncome = transactions
-    .filter((txn) => txn.type === "income")
-    .reduce((sum, txn) => sum + Number(txn.amount), 0);
-
-  const totalExpense = transactions
-    .filter((txn) => txn.type === "expense")
-    .reduce((sum, txn) => sum + Number(txn.amount), 0);
-
-  const balance = totalIncome - totalExpense;
+  // 💰 Totals come from the server so they cover every page, not just the loaded ones
+  const { total_income: totalIncome, total_expense: totalExpense, balance } = summary;
 
   const toggleDarkMode = () => setDarkMode((prev) => !prev);
   
@@ -226,7 +243,7 @@ useEffect(() => {
 
     {/* Right: ChartView */}
     <div>
-      <ChartView data={transactions} />
+      <ChartView summary={summary} filters={filters} version={summaryVersion} />
     </div>
   </div>
 </div>